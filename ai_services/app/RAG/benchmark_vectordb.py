@@ -0,0 +1,99 @@
+"""
+Module: Vector Backend Benchmark
+==============================
+
+So sánh latency / QPS giữa `LocalVectorDB` (in-process) và Qdrant server trên catalogue
+tổng hợp nhiều kích thước.
+
+Chạy (từ thư mục `ai_services`):
+    python -m app.RAG.benchmark_vectordb --sizes 1000,100000,1000000 --dtype float16
+    python -m app.RAG.benchmark_vectordb --sizes 1000,100000 --qdrant-url http://localhost:6333
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from .vectordb import LocalVectorDB, RecipeVectorDB
+
+DIM = 768
+
+
+def _synthetic(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, DIM), dtype=np.float32)
+    payloads = [{"recipe_id": f"recipe-{i}", "ten_mon": f"Món {i}", "nguyen_lieu_search": ""} for i in range(n)]
+    return vectors, payloads
+
+
+def _measure(search, queries, limit: int) -> tuple[float, float, float]:
+    search(queries[0], limit)
+    latencies = []
+    start = time.perf_counter()
+    for q in queries:
+        t = time.perf_counter()
+        search(q, limit)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return (
+        latencies[len(latencies) // 2] * 1000,
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        len(queries) / elapsed,
+    )
+
+
+def _qdrant_store(url: str, vectors, payloads, batch: int = 1024) -> RecipeVectorDB:
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+
+    store = RecipeVectorDB(url=url, collection=f"bench_recipes_{len(vectors)}")
+    if store.client.collection_exists(store.collection):
+        store.client.delete_collection(store.collection)
+    store.client.create_collection(
+        collection_name=store.collection,
+        vectors_config=VectorParams(size=DIM, distance=Distance.COSINE)
+    )
+    for start in range(0, len(vectors), batch):
+        store.client.upsert(
+            collection_name=store.collection,
+            points=[
+                PointStruct(id=start + i, vector=v.tolist(), payload=p)
+                for i, (v, p) in enumerate(zip(vectors[start:start + batch], payloads[start:start + batch]))
+            ]
+        )
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local vs Qdrant vector search")
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--qdrant-url", default=None, help="Bỏ trống để chỉ đo backend local")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((args.queries, DIM), dtype=np.float32)
+
+    print(f"{'backend':<8} {'size':>9} {'p50 ms':>9} {'p99 ms':>9} {'QPS':>9}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        vectors, payloads = _synthetic(n)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            local = LocalVectorDB.build(tmp, vectors, payloads, dtype=args.dtype)
+            p50, p99, qps = _measure(local.search, queries, args.limit)
+            print(f"{'local':<8} {n:>9} {p50:>9.3f} {p99:>9.3f} {qps:>9.1f}")
+            del local
+
+        if args.qdrant_url:
+            store = _qdrant_store(args.qdrant_url, vectors, payloads)
+            p50, p99, qps = _measure(lambda q, k: store.search(q.tolist(), k), queries, args.limit)
+            print(f"{'qdrant':<8} {n:>9} {p50:>9.3f} {p99:>9.3f} {qps:>9.1f}")
+            store.client.delete_collection(store.collection)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,68 @@
+import os
+import threading
+
 from sentence_transformers import SentenceTransformer
 
+from app.cache import TTLLRUCache
+from .embedding_cache import EmbeddingDiskStore, canonicalize_ingredients
+
+EMBEDDING_MODEL = "intfloat/multilingual-e5-base"
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+# Đặt EMBEDDING_CACHE_DIR để giữ embedding qua các lần restart
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR")
+
 class EmbeddingService:
     """
     Service tạo vector embedding cho văn bản.
     Sử dụng model: intfloat/multilingual-e5-base (768-dims).
+
+    Embedding của tập nguyên liệu được memoize theo tập đã chuẩn hóa (không phụ thuộc thứ tự):
+    LRU trong bộ nhớ, sau đó (tùy chọn) store trên đĩa, cuối cùng mới chạy model.
     """
-    def __init__(self):
+    def __init__(self, cache_size: int = EMBEDDING_CACHE_SIZE, cache_dir: str | None = EMBEDDING_CACHE_DIR):
         self.model = SentenceTransformer(
-            "intfloat/multilingual-e5-base"
+            EMBEDDING_MODEL
+        )
+        self.cache = TTLLRUCache(max_items=cache_size, sizeof=lambda v: 8 * len(v))
+        self.disk_store = (
+            EmbeddingDiskStore(cache_dir, EMBEDDING_MODEL, self.model.get_sentence_embedding_dimension())
+            if cache_dir else None
         )
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.computed = 0
 
     def embed_ingredients(self, ingredients: list[str]) -> list[float]:
         """
         Chuyển danh sách nguyên liệu thành vector 768-dims.
         """
-        text = "query: " + ", ".join(ingredients)
-        return self.model.encode(text).tolist()
+        key = ", ".join(canonicalize_ingredients(ingredients))
+
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+
+        stored = self.disk_store.get(key) if self.disk_store else None
+        if stored is not None:
+            vector = stored.tolist()
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            encoded = self.model.encode("query: " + key)
+            vector = encoded.tolist()
+            with self._lock:
+                self.computed += 1
+            if self.disk_store:
+                self.disk_store.put(key, encoded)
+
+        self.cache.set(key, vector)
+        return vector
+
+    def stats(self) -> dict:
+        data = self.cache.stats()
+        lookups = data["hits"] + data["misses"]
+        data["disk_hits"] = self.disk_hits
+        data["disk_items"] = len(self.disk_store) if self.disk_store else None
+        data["computed"] = self.computed
+        data["total_hit_rate"] = (data["hits"] + self.disk_hits) / lookups if lookups else 0.0
+        return data
@@ -0,0 +1,176 @@
+"""
+Module: Embedding Cache
+=====================
+
+Lưu trữ embedding của các tập nguyên liệu đã tính, để không chạy lại transformer:
+- `canonicalize_ingredients`: chuẩn hóa tập nguyên liệu (bỏ trùng, sắp xếp) -> không phụ thuộc thứ tự.
+- `EmbeddingDiskStore`: ma trận float32 memory-mapped + file index key (append-only),
+  giữ lại embedding qua các lần restart.
+
+Cấu trúc thư mục store:
+    meta.json     {"model": ..., "dim": ...}  (khác model/dim -> store bị reset)
+    keys.jsonl    mỗi dòng một key, dòng thứ i ứng với hàng thứ i của vectors.f32
+    vectors.f32   ma trận float32 [N, dim] dạng raw
+    .lock         khóa `flock` khi ghi: nhiều worker process dùng chung một store
+
+Mỗi process đọc thêm các key do process khác ghi (phần cuối keys.jsonl) trước khi ghi, nên hàng của
+vector mới luôn bằng số key đã có trong file, không phụ thuộc index trong bộ nhớ của từng process.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: chỉ khóa giữa các thread trong process
+    fcntl = None
+
+
+def canonicalize_ingredients(ingredients: list[str]) -> tuple[str, ...]:
+    """
+    Chuẩn hóa danh sách nguyên liệu: strip, lowercase, bỏ trùng, sắp xếp.
+    [a, b] và [b, a, a] cho cùng một kết quả.
+    """
+    return tuple(sorted({i.strip().lower() for i in ingredients if i and i.strip()}))
+
+
+class EmbeddingDiskStore:
+    """
+    Store embedding trên đĩa dạng append-only, đọc qua `np.memmap`.
+    """
+    def __init__(self, directory, model_name: str, dim: int):
+        self.directory = Path(directory)
+        self.model_name = model_name
+        self.dim = dim
+
+        self._keys_path = self.directory / "keys.jsonl"
+        self._vectors_path = self.directory / "vectors.f32"
+        self._meta_path = self.directory / "meta.json"
+        self._lock_path = self.directory / ".lock"
+
+        self._lock = threading.Lock()
+        self._index = {}
+        self._rows = 0
+        self._keys_offset = 0
+        self._mmap = None
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock, self._file_lock():
+            self._load()
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._index.get(key)
+            if row is None:
+                return None
+            if self._mmap is None or row >= self._mmap.shape[0]:
+                self._remap()
+            return np.array(self._mmap[row])
+
+    def put(self, key: str, vector):
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Expected vector of dim {self.dim}, got {vector.shape[0]}")
+
+        with self._lock:
+            if key in self._index:
+                return
+            with self._file_lock():
+                self._sync()
+                if key in self._index:
+                    return
+                # Ghi vector trước rồi mới ghi key: nếu crash giữa chừng, vector thừa bị cắt ở lần ghi sau
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vector.tobytes())
+                with open(self._keys_path, "ab") as f:
+                    f.write((json.dumps(key, ensure_ascii=False) + "\n").encode("utf-8"))
+                    self._keys_offset = f.tell()
+                self._index[key] = self._rows
+                self._rows += 1
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Khóa ghi giữa các process dùng chung thư mục store.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync(self):
+        """
+        Nạp các key process khác đã ghi sau lần đọc trước, rồi cắt phần ghi dở (crash) để keys và
+        vectors luôn khớp. Gọi khi đang giữ `_file_lock`.
+        """
+        with open(self._keys_path, "r+b") as f:
+            f.seek(self._keys_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Dòng key ghi dở
+                    f.truncate(self._keys_offset)
+                    break
+                self._index.setdefault(json.loads(line), self._rows)
+                self._rows += 1
+                self._keys_offset += len(line)
+
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self._vectors_path)
+        if size < self._rows * row_bytes:
+            # Key không có vector (file vectors bị cắt): bỏ các key đó
+            valid = size // row_bytes
+            with open(self._keys_path, "r+b") as f:
+                for _ in range(valid):
+                    f.readline()
+                self._keys_offset = f.tell()
+                f.truncate(self._keys_offset)
+            self._index = {key: row for key, row in self._index.items() if row < valid}
+            self._rows = valid
+        if size != self._rows * row_bytes:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(self._rows * row_bytes)
+
+    def _load(self):
+        meta = {"model": self.model_name, "dim": self.dim}
+        if self._meta_path.exists():
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored != meta:
+                self._reset()
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        if not self._keys_path.exists() or not self._vectors_path.exists():
+            self._reset()
+            return
+
+        self._sync()
+        self._remap()
+
+    def _remap(self):
+        rows = os.path.getsize(self._vectors_path) // (self.dim * 4)
+        self._mmap = (
+            np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            if rows else None
+        )
+
+    def _reset(self):
+        self._index = {}
+        self._rows = 0
+        self._keys_offset = 0
+        self._mmap = None
+        open(self._keys_path, "w").close()
+        open(self._vectors_path, "wb").close()
@@ -0,0 +1,81 @@
+"""
+Module: Inverted Ingredient Index
+===============================
+
+Chỉ mục ngược nguyên liệu -> danh sách recipe (posting list) cho toàn bộ catalogue.
+
+Điểm khớp nguyên liệu (giao / số nguyên liệu của món, như `ingredient_match_score`) được tính
+cho mọi món trong một phép toán vector: nối các posting list của nguyên liệu truy vấn rồi
+`np.bincount`, chia cho số nguyên liệu của từng món.
+"""
+
+import numpy as np
+
+from .embedding_cache import canonicalize_ingredients
+
+
+def parse_ingredients(nguyen_lieu_search: str | None) -> set[str]:
+    """
+    Tách chuỗi `nguyen_lieu_search` thành tập nguyên liệu chuẩn hóa.
+    """
+    return {i.strip().lower() for i in (nguyen_lieu_search or "").split(",") if i.strip()}
+
+
+class IngredientIndex:
+    """
+    Inverted index trên catalogue công thức.
+
+    Args:
+        rows (list[dict]): Các dòng có `id`, `ten_mon`, `nguyen_lieu_search`.
+        version: Version catalogue tại thời điểm build (để biết khi nào cần build lại).
+    """
+    def __init__(self, rows: list[dict], version=None):
+        self.version = version
+        self.recipe_ids = [row["id"] for row in rows]
+        self.names = [row.get("ten_mon", "") for row in rows]
+        self.row_of = {r_id: i for i, r_id in enumerate(self.recipe_ids)}
+
+        postings = {}
+        self.ingredient_sets = []
+        sizes = np.zeros(len(rows), dtype=np.float32)
+        for i, row in enumerate(rows):
+            ingredients = parse_ingredients(row.get("nguyen_lieu_search"))
+            self.ingredient_sets.append(frozenset(ingredients))
+            sizes[i] = len(ingredients)
+            for name in ingredients:
+                postings.setdefault(name, []).append(i)
+
+        self.postings = {name: np.asarray(rows_, dtype=np.int32) for name, rows_ in postings.items()}
+        # Món không có nguyên liệu: chia cho inf -> điểm 0
+        self.sizes = np.where(sizes > 0, sizes, np.inf).astype(np.float32)
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def ingredients_of(self, recipe_id) -> frozenset[str] | None:
+        """
+        Tập nguyên liệu chuẩn hóa (`nguyen_lieu_search`) của một món; None nếu món không có trong index.
+        """
+        row = self.row_of.get(recipe_id)
+        return self.ingredient_sets[row] if row is not None else None
+
+    def match_scores(self, ingredients: list[str]) -> np.ndarray:
+        """
+        Điểm khớp nguyên liệu của truy vấn với TẤT CẢ công thức, dạng mảng float32 [n_recipes].
+        """
+        lists = [self.postings[name] for name in canonicalize_ingredients(ingredients) if name in self.postings]
+        if not lists:
+            return np.zeros(len(self.recipe_ids), dtype=np.float32)
+        overlap = np.bincount(np.concatenate(lists), minlength=len(self.recipe_ids))
+        return overlap / self.sizes
+
+    def top_matches(self, ingredients: list[str], limit: int, min_score: float = 0.2) -> list[tuple[str, float]]:
+        """
+        Các công thức có điểm khớp cao nhất (>= min_score) trên toàn catalogue.
+        """
+        scores = self.match_scores(ingredients)
+        candidates = np.flatnonzero(scores >= min_score)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.recipe_ids[i], float(scores[i])) for i in candidates]
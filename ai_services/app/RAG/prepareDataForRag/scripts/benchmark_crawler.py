@@ -0,0 +1,134 @@
+"""
+Chạy crawler hoàn toàn offline: HTTP server giả (trang kiểu dienmayxanh, có độ trễ) + LLM giả.
+
+So sánh cấu hình tuần tự (1 fetch worker, 1 LLM worker) với cấu hình song song, cùng quota:
+    python -m app.RAG.prepareDataForRag.scripts.benchmark_crawler --dishes 40 --rpm 120
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.RAG.prepareDataForRag.scripts.crawler import Crawler, RateLimiter, RateLimitError
+from app.RAG.prepareDataForRag.scripts.data_generator import estimate_request_tokens, extract_recipe_text, slugify
+
+PAGE_TEMPLATE = """<html><body>
+<div class="staple">Nguyên liệu: 500g {dish}, 1 nhánh gừng, 2 thìa nước mắm</div>
+<div class="method">Bước 1: Sơ chế {dish}.<div class="note">quảng cáo</div>
+Bước 2: Nấu {dish} trong 30 phút.</div>
+</body></html>"""
+
+
+def start_stub_server(latency: float) -> ThreadingHTTPServer:
+    """
+    /recipe/<dish>  -> trang hợp lệ
+    /broken/<dish>  -> trang thiếu div.method (parse trả về None)
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            dish = self.path.rsplit("/", 1)[-1]
+            if self.path.startswith("/recipe/"):
+                body = PAGE_TEMPLATE.format(dish=dish)
+            else:
+                body = f"<html><body><div class='staple'>{dish}</div></body></html>"
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class FakeLLM:
+    """
+    LLM giả: trả JSON công thức sau `latency` giây, cứ mỗi `rate_limit_every` lời gọi thì ném RateLimitError.
+    """
+    def __init__(self, latency: float, rate_limit_every: int = 0):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+
+    async def __call__(self, html_text, dish):
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(self.latency)
+        if self.rate_limit_every and call % self.rate_limit_every == 0:
+            raise RateLimitError("429 ResourceExhausted (fake)")
+        return {
+            "ten_mon": dish,
+            "mo_ta": f"Món {dish}",
+            "nguyen_lieu_search": "thịt gà, gừng",
+            "cach_lam": [line for line in html_text.splitlines() if line.startswith("Bước")]
+        }
+
+
+def run(dishes: list[str], base_url: str, args, fetch_concurrency: int, llm_concurrency: int) -> dict:
+    saved = {}
+
+    def search(dish):
+        return [f"{base_url}/broken/{dish}", f"{base_url}/recipe/{dish}"]
+
+    def on_result(dish, data):
+        data["id"] = slugify(data["ten_mon"])
+        if data["id"] in saved:
+            return False
+        saved[data["id"]] = data
+        return True
+
+    crawler = Crawler(
+        search=search,
+        parse=extract_recipe_text,
+        extract=FakeLLM(args.llm_latency, args.rate_limit_every),
+        on_result=on_result,
+        limiter=RateLimiter(rpm=args.rpm, tpm=args.tpm),
+        fetch_concurrency=fetch_concurrency,
+        llm_concurrency=llm_concurrency,
+        backoff=args.backoff,
+        token_estimator=estimate_request_tokens
+    )
+    stats = asyncio.run(crawler.run(dishes))
+    assert stats.saved == len(saved), "on_result and stats disagree"
+    return stats.as_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline crawler benchmark")
+    parser.add_argument("--dishes", type=int, default=40)
+    parser.add_argument("--page-latency", type=float, default=0.3, help="Độ trễ mỗi trang (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Độ trễ mỗi lời gọi LLM (s)")
+    parser.add_argument("--rpm", type=float, default=120)
+    parser.add_argument("--tpm", type=float, default=1_000_000)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Giả lập 429 mỗi N lời gọi (0 = tắt)")
+    parser.add_argument("--backoff", type=float, default=1.0)
+    parser.add_argument("--fetch-concurrency", type=int, default=8)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.page_latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    dishes = [f"mon-{i}" for i in range(args.dishes)]
+
+    try:
+        results = {
+            "sequential": run(dishes, base_url, args, 1, 1),
+            "concurrent": run(dishes, base_url, args, args.fetch_concurrency, args.llm_concurrency)
+        }
+    finally:
+        server.shutdown()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
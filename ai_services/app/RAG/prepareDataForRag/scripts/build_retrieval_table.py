@@ -0,0 +1,54 @@
+"""
+Tính trước bảng retrieval cho từ vựng nguyên liệu của YOLO.
+
+Chạy lại sau mỗi lần ingest catalogue (fromJsonToVectordb.py), vì bảng lưu thứ hạng công thức
+(API bỏ qua bảng khi version catalogue đã khác version lúc build):
+    python -m app.RAG.prepareDataForRag.scripts.build_retrieval_table --max-size 2
+"""
+
+import argparse
+import time
+
+from app import db
+from app.config import YOLO_CLASS_TO_VI
+from app.config.paths import RETRIEVAL_TABLE_PATH
+from app.RAG.rag_service import RecipeRAGService
+from app.RAG.retrieval_table import build_retrieval_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build precomputed retrieval table")
+    parser.add_argument("--max-size", type=int, default=2, help="Kích thước tối đa của tổ hợp nguyên liệu")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output", default=str(RETRIEVAL_TABLE_PATH))
+    args = parser.parse_args()
+
+    rag = RecipeRAGService(use_retrieval_table=False)
+    vocab = sorted(set(YOLO_CLASS_TO_VI.values()))
+
+    def progress(done, total):
+        if done % 100 == 0 or done == total:
+            print(f"[{done}/{total}] combos processed")
+
+    # Đọc version trước khi build: catalogue đổi giữa chừng thì bảng bị coi là cũ
+    catalogue_version = db.catalogue_version()
+    start = time.perf_counter()
+    table = build_retrieval_table(
+        lambda ingredients, top_k: rag.retrieve(ingredients, top_k=top_k),
+        vocab,
+        max_size=args.max_size,
+        top_k=args.top_k,
+        progress=progress,
+        catalogue_version=catalogue_version
+    )
+    table.save(args.output)
+
+    print(
+        f"Đã lưu {len(table.keys)} tổ hợp ({len(table.postings)} postings, "
+        f"{len(table.recipe_ids)} món, catalogue version {catalogue_version}) vào {args.output} "
+        f"sau {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
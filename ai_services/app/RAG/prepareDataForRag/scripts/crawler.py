@@ -0,0 +1,270 @@
+"""
+Crawler bất đồng bộ cho pipeline sinh dataset (data_generator.py).
+
+Hai giai đoạn nối với nhau bằng một hàng đợi giới hạn (backpressure):
+1. Fetch: `fetch_concurrency` worker tìm link, tải trang song song trên một `aiohttp.ClientSession`
+   dùng chung rồi parse (chạy trong thread).
+2. Extract: `llm_concurrency` worker gọi LLM, đi qua `RateLimiter` (token bucket theo RPM và TPM).
+   Lỗi 429 tạm dừng toàn bộ limiter (backoff) thay vì `time.sleep` trong từng request.
+
+Mọi phụ thuộc bên ngoài (search, parse, extract, on_result) được truyền vào, nên có thể chạy
+offline với HTTP server giả và LLM giả (xem benchmark_crawler.py).
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+import aiohttp
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+class RateLimitError(Exception):
+    """
+    LLM trả về 429 / hết quota.
+    """
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Ước lượng số token (tiếng Việt ~3 ký tự/token), đủ dùng cho việc giữ quota TPM.
+    """
+    return len(text) // 3 + 1
+
+
+class TokenBucket:
+    """
+    Token bucket nạp `rate_per_minute` token mỗi phút, tối đa `capacity`.
+
+    `reserve` cho phép số dư âm (đặt trước): lời gọi sau phải chờ lâu hơn, nên request lớn hơn
+    capacity vẫn được phục vụ thay vì chờ mãi.
+    """
+    def __init__(self, rate_per_minute: float, capacity: float | None = None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Trừ `amount` token, trả về số giây cần chờ trước khi được dùng.
+        """
+        self._refill()
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """
+    Giới hạn đồng thời requests/phút và tokens/phút của LLM.
+    """
+    def __init__(self, rpm: float, tpm: float, clock=time.monotonic):
+        self.requests = TokenBucket(rpm, clock=clock)
+        self.tokens = TokenBucket(tpm, clock=clock)
+        self.clock = clock
+        self.blocked_until = 0.0
+        self.waited = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int = 1):
+        async with self._lock:
+            wait = max(
+                self.requests.reserve(1),
+                self.tokens.reserve(tokens),
+                self.blocked_until - self.clock()
+            )
+        if wait > 0:
+            self.waited += wait
+            await asyncio.sleep(wait)
+
+    def penalize(self, seconds: float):
+        """
+        Chặn mọi request trong `seconds` giây (sau khi bị 429).
+        """
+        self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+
+
+@dataclass
+class CrawlItem:
+    dish: str
+    texts: list[str]
+
+
+@dataclass
+class CrawlStats:
+    dishes: int = 0
+    pages_fetched: int = 0
+    pages_valid: int = 0
+    llm_calls: int = 0
+    rate_limited: int = 0
+    saved: int = 0
+    failed: list[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "dishes": self.dishes,
+            "pages_fetched": self.pages_fetched,
+            "pages_valid": self.pages_valid,
+            "llm_calls": self.llm_calls,
+            "rate_limited": self.rate_limited,
+            "saved": self.saved,
+            "failed": len(self.failed),
+            "elapsed_s": round(self.elapsed, 2),
+            "dishes_per_min": round(self.dishes / self.elapsed * 60, 1) if self.elapsed else 0.0
+        }
+
+
+class Crawler:
+    """
+    Args:
+        search: `dish -> list[url]` (đồng bộ, chạy trong thread).
+        parse: `html bytes -> text | None` (đồng bộ, chạy trong thread).
+        extract: `async (text, dish) -> dict | None`, raise `RateLimitError` khi bị 429.
+        on_result: `(dish, data) -> bool`; False (vd. trùng id) -> thử trang tiếp theo.
+        limiter (RateLimiter): Quota LLM.
+    """
+    def __init__(self, search, parse, extract, on_result, limiter: RateLimiter,
+                 fetch_concurrency: int = 8, llm_concurrency: int = 2, queue_size: int = 16,
+                 max_retries: int = 5, backoff: float = 20.0, request_timeout: float = 10.0,
+                 headers: dict | None = None, token_estimator=estimate_tokens):
+        self.search = search
+        self.parse = parse
+        self.extract = extract
+        self.on_result = on_result
+        self.limiter = limiter
+        self.fetch_concurrency = fetch_concurrency
+        self.llm_concurrency = llm_concurrency
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.request_timeout = request_timeout
+        self.headers = headers or DEFAULT_HEADERS
+        self.token_estimator = token_estimator
+        self.stats = CrawlStats()
+
+    async def run(self, dishes: list[str], session: aiohttp.ClientSession | None = None) -> CrawlStats:
+        self.stats = CrawlStats()
+        start = time.perf_counter()
+
+        own_session = session is None
+        if own_session:
+            session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+                connector=aiohttp.TCPConnector(limit=self.fetch_concurrency * 4)
+            )
+
+        dish_queue = asyncio.Queue()
+        for dish in dishes:
+            dish_queue.put_nowait(dish)
+        llm_queue = asyncio.Queue(maxsize=self.queue_size)
+
+        try:
+            fetchers = [
+                asyncio.create_task(self._fetch_worker(session, dish_queue, llm_queue))
+                for _ in range(self.fetch_concurrency)
+            ]
+            extractors = [
+                asyncio.create_task(self._llm_worker(llm_queue))
+                for _ in range(self.llm_concurrency)
+            ]
+            await asyncio.gather(*fetchers)
+            for _ in extractors:
+                await llm_queue.put(None)
+            await asyncio.gather(*extractors)
+        finally:
+            if own_session:
+                await session.close()
+
+        self.stats.elapsed = time.perf_counter() - start
+        return self.stats
+
+    async def _fetch_worker(self, session, dish_queue: asyncio.Queue, llm_queue: asyncio.Queue):
+        while True:
+            try:
+                dish = dish_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            self.stats.dishes += 1
+
+            links = await asyncio.to_thread(self.search, dish)
+            if not links:
+                print(f" Không tìm thấy link nào cho '{dish}'.")
+                self.stats.failed.append(dish)
+                continue
+
+            pages = await asyncio.gather(*(self._fetch(session, link) for link in links))
+            texts = []
+            for html in pages:
+                if html is None:
+                    continue
+                text = await asyncio.to_thread(self.parse, html)
+                if text:
+                    texts.append(text)
+            self.stats.pages_valid += len(texts)
+
+            if not texts:
+                print(f" Không có trang hợp lệ cho '{dish}'.")
+                self.stats.failed.append(dish)
+                continue
+            # Chờ khi hàng đợi LLM đầy -> fetch không chạy quá xa so với quota LLM
+            await llm_queue.put(CrawlItem(dish, texts))
+
+    async def _fetch(self, session, url: str) -> bytes | None:
+        try:
+            async with session.get(url) as resp:
+                if resp.status != 200:
+                    return None
+                body = await resp.read()
+            self.stats.pages_fetched += 1
+            return body
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    async def _llm_worker(self, llm_queue: asyncio.Queue):
+        while True:
+            item = await llm_queue.get()
+            if item is None:
+                return
+            saved = False
+            try:
+                for text in item.texts:
+                    data = await self._extract(text, item.dish)
+                    if data and self.on_result(item.dish, data):
+                        saved = True
+                        break
+            except Exception as e:
+                # Worker chết thì fetcher bị kẹt ở `llm_queue.put` khi hàng đợi đầy: ghi nhận lỗi và làm tiếp
+                print(f"❌ Lỗi khi xử lý '{item.dish}': {e}")
+                self.stats.failed.append(item.dish)
+                continue
+            if saved:
+                self.stats.saved += 1
+            else:
+                print(f" Không lấy được nội dung hoặc bị trùng cho '{item.dish}'.")
+                self.stats.failed.append(item.dish)
+
+    async def _extract(self, text: str, dish: str) -> dict | None:
+        wait = self.backoff
+        for attempt in range(self.max_retries):
+            await self.limiter.acquire(self.token_estimator(text))
+            self.stats.llm_calls += 1
+            try:
+                return await self.extract(text, dish)
+            except RateLimitError:
+                self.stats.rate_limited += 1
+                print(f"⏳ Hết quota (429). Tạm dừng {wait:.0f}s... (Lần {attempt + 1}/{self.max_retries})")
+                self.limiter.penalize(wait)
+                wait *= 1.5
+        print(f"❌ Bỏ qua '{dish}' sau nhiều lần retry thất bại.")
+        return None
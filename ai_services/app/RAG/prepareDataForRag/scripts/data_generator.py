@@ -1,30 +1,37 @@
+"""
+Sinh dataset công thức: DuckDuckGo -> trang dienmayxanh -> LLM trích xuất JSON.
+
+Chạy crawler bất đồng bộ (xem crawler.py), quota LLM cấu hình qua LLM_RPM / LLM_TPM.
+Kết quả ghi nối vào smartchef_dataset.jsonl (dataset_store.py); `dataset_store to-json` để xuất mảng JSON.
+    python -m app.RAG.prepareDataForRag.scripts.data_generator --fetch-concurrency 8
+"""
 
 import google.generativeai as genai
-import requests
 from bs4 import BeautifulSoup, Comment
+import argparse
+import asyncio
 import json
-import time
 import os
 import re
 from dotenv import load_dotenv
 from ddgs import DDGS
 
+from app.config.paths import RECIPES_JSON_PATH, RECIPES_JSONL_PATH
+from app.RAG.prepareDataForRag.scripts.dataset_store import DatasetStore
+from app.RAG.prepareDataForRag.scripts.crawler import Crawler, RateLimiter, RateLimitError, estimate_tokens
+
 load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
 MODEL_NAME = "gemma-3-27b-it" 
 
-if not API_KEY:
-    print("❌ Lỗi: Chưa tìm thấy API KEY trong file .env")
-    exit()
-
-try:
-    genai.configure(api_key=API_KEY)
-    model = genai.GenerativeModel(MODEL_NAME)
-except Exception as e:
-    print(f"❌ Lỗi cấu hình Gemini: {e}")
-    exit()
+# Quota của model (30 RPM / 15k TPM)
+LLM_RPM = float(os.getenv("LLM_RPM", "30"))
+LLM_TPM = float(os.getenv("LLM_TPM", "15000"))
+# Token của phần prompt cố định + output, cộng thêm vào ước lượng theo văn bản nguồn
+PROMPT_OVERHEAD_TOKENS = 1500
 
-DB_FILE = os.path.join(os.path.dirname(__file__), "../smartchef_dataset.json")
+DB_FILE = str(RECIPES_JSONL_PATH)
+LEGACY_DB_FILE = str(RECIPES_JSON_PATH)
 
 # === HARDCODED MENU LIST (150+ Món) ===
 MENU_LIST = [
@@ -85,11 +92,12 @@ def find_dmx_links(dish_name):
         print(f"⚠️ Lỗi DuckDuckGo: {e}")
     return links
 
-def get_html_strict(url):
-    headers = {'User-Agent': 'Mozilla/5.0'}
+def extract_recipe_text(html):
+    """
+    Lấy phần nguyên liệu + cách làm từ HTML trang dienmayxanh (None nếu không đúng cấu trúc).
+    """
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(resp.content, 'html.parser')
+        soup = BeautifulSoup(html, 'html.parser')
         
         content_parts = []
         
@@ -111,10 +119,8 @@ def get_html_strict(url):
     except Exception:
         return None
 
-def process_to_json(html_text, original_name):
-    # print(f"🤖 Đang phân tích...")
-    
-    prompt = f"""
+def build_prompt(html_text, original_name):
+    return f"""
     Bạn là chuyên gia dữ liệu ẩm thực Việt Nam. Nhiệm vụ: Trích xuất công thức từ văn bản raw bên dưới thành JSON chuẩn.
     
     TÊN MÓN GỐC: "{original_name}"
@@ -144,57 +150,39 @@ def process_to_json(html_text, original_name):
     }}
     Nếu không tìm thấy công thức, trả về: {{}}
     """
-    
-    # Retry logic cho rate limit (30 RPM / 15k TPM)
-    max_retries = 5
-    wait_time = 20
 
-    for attempt in range(max_retries):
+def parse_llm_json(text):
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:-3].strip()
+    elif text.startswith("```"):
+        text = text[3:-3].strip()
+    return json.loads(text)
+
+def create_extractor(model_name=MODEL_NAME):
+    """
+    Tạo hàm `async (html_text, dish) -> dict | None` gọi Gemini.
+    """
+    if not API_KEY:
+        raise RuntimeError("Chưa tìm thấy GOOGLE_API_KEY trong file .env")
+    genai.configure(api_key=API_KEY)
+    model = genai.GenerativeModel(model_name)
+
+    async def extract(html_text, original_name):
         try:
-            response = model.generate_content(prompt)
-            text = response.text.strip()
-            if text.startswith("```json"):
-                text = text[7:-3].strip()
-            elif text.startswith("```"):
-                text = text[3:-3].strip()
-                
-            data = json.loads(text)
-            print(data)
-            return data
-            
+            response = await model.generate_content_async(build_prompt(html_text, original_name))
+            return parse_llm_json(response.text)
         except Exception as e:
             error_msg = str(e)
             if "429" in error_msg or "ResourceExhausted" in error_msg:
-                print(f"⏳ Hết quota (429). Đợi {wait_time}s rồi thử lại... (Lần {attempt+1}/{max_retries})")
-                time.sleep(wait_time)
-                wait_time *= 1.5 
-            else:
-                print(f"⚠️ Lỗi Parse/Gen AI: {e}")
-                return None
-    
-    print("❌ Bỏ qua món này sau nhiều lần retry thất bại.")
-    return None
+                raise RateLimitError(error_msg) from e
+            print(f"⚠️ Lỗi Parse/Gen AI: {e}")
+            return None
 
-def save_append(data):
-    current_data = []
-    # Đọc data cũ
-    if os.path.exists(DB_FILE):
-        try:
-            with open(DB_FILE, 'r', encoding='utf-8') as f:
-                current_data = json.loads(f.read())
-        except: pass
-
-    # Check trùng
-    for item in current_data:
-        if item.get('id') == data.get('id'):
-            print(f"⏩ Đã có: {data.get('ten_mon')}")
-            return
-
-    # Lưu mới 
-    current_data.append(data)
-    with open(DB_FILE, 'w', encoding='utf-8') as f:
-        json.dump(current_data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Đã lưu: {data.get('ten_mon')} (Tổng: {len(current_data)})")
+    return extract
+
+def estimate_request_tokens(html_text):
+    return estimate_tokens(html_text) + PROMPT_OVERHEAD_TOKENS
 
 import unicodedata
 
@@ -205,17 +193,47 @@ def slugify(value):
     value = re.sub(r'[^\w\s-]', '', value.lower())
     return re.sub(r'[-\s]+', '-', value).strip('-')
 
-def load_existing_ids():
-    if not os.path.exists(DB_FILE):
-        return set()
-    try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return set(item.get('id') for item in data)
-    except:
-        return set()
+def open_store():
+    """
+    Mở dataset JSONL; lần đầu nạp lại dữ liệu từ file JSON cũ nếu có.
+    """
+    migrate = not os.path.exists(DB_FILE) and os.path.exists(LEGACY_DB_FILE)
+    store = DatasetStore(DB_FILE)
+    if migrate:
+        print(f"Chuyển {LEGACY_DB_FILE} sang {DB_FILE}: {store.import_json(LEGACY_DB_FILE)} món")
+    return store
+
+def make_saver(store):
+    """
+    Callback lưu kết quả của crawler: gán id từ tên món, bỏ qua món đã có.
+    """
+    def on_result(dish, data):
+        parsed_name = data.get("ten_mon")
+        if not parsed_name:
+            return False
+        final_id = slugify(parsed_name)
+        if not final_id:
+            # Tên món chỉ gồm ký tự đặc biệt: không tạo được id
+            print(f" Bỏ qua (Không tạo được id): {parsed_name}")
+            return False
+        data['id'] = final_id
+
+        if not store.add(data):
+            print(f" Bỏ qua (Đã có trong DB): {parsed_name} [{final_id}]")
+            return False
+
+        print(f"💾 Đã lưu: {parsed_name} (Tổng: {len(store)})")
+        return True
+
+    return on_result
 
 def main():
+    parser = argparse.ArgumentParser(description="Crawl công thức và sinh dataset")
+    parser.add_argument("--fetch-concurrency", type=int, default=8, help="Số worker tải trang song song")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="Số request LLM đồng thời")
+    parser.add_argument("--queue-size", type=int, default=16, help="Số món chờ LLM tối đa")
+    args = parser.parse_args()
+
     dish_list_path = os.path.join(os.path.dirname(__file__), "scripts/dish_list.txt") 
     if not os.path.exists(dish_list_path):
         dish_list_path = os.path.join(os.path.dirname(__file__), "dish_list.txt")
@@ -230,47 +248,23 @@ def main():
 
     print(f"Tải {len(dishes)} món từ danh sách.")
     
-    existing_ids = load_existing_ids()
-    print(f" Database hiện có {len(existing_ids)} món. Chế độ: Incremental Update (Chỉ thêm mới).")
-
-    for i, dish in enumerate(dishes):
-        print(f"\n--- [{i+1}/{len(dishes)}] Crawling: {dish} ---")
-        
-        links = find_dmx_links(dish)
-        if not links:
-            print(" Không tìm thấy link nào trên DuckDuckGo.")
-            continue
-        
-        found_valid_content = False
-        
-        for link in links:
-            html = get_html_strict(link)
-            
-            if html:
-                print(f"Link phù hợp: {link}")
-                
-                data = process_to_json(html, dish)
-                
-                if data and data.get("ten_mon"):
-                    parsed_name = data.get("ten_mon")
-                    final_id = slugify(parsed_name)
-                    data['id'] = final_id
-                    
-                    if final_id in existing_ids:
-                        print(f" Bỏ qua (Đã có trong DB): {parsed_name} [{final_id}]")
-                        continue
-
-                    save_append(data)
-                    existing_ids.add(final_id)
-                    found_valid_content = True
-                    break 
-            else:
-                pass 
-        
-        if not found_valid_content:
-            print(f" Không lấy được nội dung hoặc bị trùng cho '{dish}'.")
-            
-        time.sleep(15)
+    store = open_store()
+    print(f" Database hiện có {len(store)} món. Chế độ: Incremental Update (Chỉ thêm mới).")
+
+    crawler = Crawler(
+        search=find_dmx_links,
+        parse=extract_recipe_text,
+        extract=create_extractor(),
+        on_result=make_saver(store),
+        limiter=RateLimiter(rpm=LLM_RPM, tpm=LLM_TPM),
+        fetch_concurrency=args.fetch_concurrency,
+        llm_concurrency=args.llm_concurrency,
+        queue_size=args.queue_size,
+        token_estimator=estimate_request_tokens
+    )
+    with store:
+        stats = asyncio.run(crawler.run(dishes))
+    print(f"Hoàn tất: {stats.as_dict()}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
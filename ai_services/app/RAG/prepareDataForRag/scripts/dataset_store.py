@@ -0,0 +1,189 @@
+"""
+Dataset công thức dạng JSON Lines, chỉ ghi nối (append-only).
+
+- Mỗi dòng là một công thức; index `id -> offset` giữ trong bộ nhớ -> kiểm tra trùng O(1).
+- Mỗi lần `add` ghi một dòng rồi `fsync`: crash chỉ có thể để lại dòng cuối dở dang,
+  dòng đó bị cắt bỏ khi mở lại store.
+- `compact` ghi lại file (bỏ dòng hỏng / id trùng) qua file tạm + `os.replace`.
+- `to_json` / `import_json` chuyển qua lại với định dạng mảng JSON cũ (smartchef_dataset.json).
+
+    python -m app.RAG.prepareDataForRag.scripts.dataset_store compact
+    python -m app.RAG.prepareDataForRag.scripts.dataset_store to-json --output smartchef_dataset.json
+    python -m app.RAG.prepareDataForRag.scripts.dataset_store import-json --input smartchef_dataset.json
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+from app.config.paths import RECIPES_JSON_PATH, RECIPES_JSONL_PATH
+from app.RAG.prepareDataForRag.scripts.recipe_io import iter_recipes
+
+
+class DatasetStore:
+    """
+    Args:
+        path: File .jsonl (tạo mới nếu chưa có).
+    """
+    def __init__(self, path=RECIPES_JSONL_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.offsets = {}
+        self.corrupt_lines = 0
+        self._load()
+        self._file = open(self.path, "ab")
+
+    def _load(self):
+        if not self.path.exists():
+            return
+
+        with open(self.path, "r+b") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Dòng cuối ghi dở (crash giữa chừng): cắt bỏ
+                    f.truncate(offset)
+                    break
+                try:
+                    record_id = json.loads(line).get("id")
+                except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+                    record_id = None
+                if record_id is None:
+                    self.corrupt_lines += 1
+                else:
+                    self.offsets.setdefault(record_id, offset)
+                offset += len(line)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, record_id):
+        return record_id in self.offsets
+
+    def ids(self) -> set:
+        return set(self.offsets)
+
+    def get(self, record_id) -> dict | None:
+        offset = self.offsets.get(record_id)
+        if offset is None:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def add(self, record: dict) -> bool:
+        """
+        Ghi nối một công thức. Trả về False nếu `id` đã có.
+        """
+        record_id = record.get("id")
+        if not record_id:
+            raise ValueError("record has no id")
+        if record_id in self.offsets:
+            return False
+
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        offset = self._file.seek(0, os.SEEK_END)
+        self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.offsets[record_id] = offset
+        return True
+
+    def __iter__(self):
+        """
+        Duyệt các công thức hợp lệ (bản đầu tiên của mỗi id) theo thứ tự ghi.
+        """
+        with open(self.path, "rb") as f:
+            for offset in sorted(self.offsets.values()):
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def compact(self) -> dict:
+        """
+        Ghi lại file chỉ gồm các dòng hợp lệ, không trùng id.
+        """
+        before = self.path.stat().st_size
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        offsets = {}
+        with open(tmp_path, "wb") as out:
+            for record in self:
+                offsets[record["id"]] = out.tell()
+                out.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            out.flush()
+            os.fsync(out.fileno())
+
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        _fsync_dir(self.path.parent)
+        self._file = open(self.path, "ab")
+        self.offsets = offsets
+        self.corrupt_lines = 0
+        return {"records": len(offsets), "bytes_before": before, "bytes_after": self.path.stat().st_size}
+
+    def to_json(self, output) -> int:
+        """
+        Xuất ra mảng JSON (định dạng smartchef_dataset.json), ghi streaming từng phần tử.
+        """
+        output = Path(output)
+        tmp_path = output.with_suffix(output.suffix + ".tmp")
+        count = 0
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("[")
+            for record in self:
+                f.write(",\n  " if count else "\n  ")
+                f.write(json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+                count += 1
+            f.write("\n]\n" if count else "]\n")
+        os.replace(tmp_path, output)
+        return count
+
+    def import_json(self, path) -> int:
+        """
+        Nạp các công thức từ file JSON/JSONL khác (bỏ qua id đã có).
+        """
+        return sum(self.add(record) for record in iter_recipes(path) if record.get("id"))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _fsync_dir(directory: Path):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quản lý dataset JSONL")
+    parser.add_argument("--store", default=str(RECIPES_JSONL_PATH))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("compact", help="Bỏ dòng hỏng / id trùng")
+    to_json = sub.add_parser("to-json", help="Xuất ra mảng JSON")
+    to_json.add_argument("--output", default=str(RECIPES_JSON_PATH))
+    import_json = sub.add_parser("import-json", help="Nạp từ file JSON/JSONL")
+    import_json.add_argument("--input", default=str(RECIPES_JSON_PATH))
+    args = parser.parse_args()
+
+    with DatasetStore(args.store) as store:
+        if args.command == "compact":
+            print(f"Compacted {args.store}: {store.compact()}")
+        elif args.command == "to-json":
+            print(f"Đã xuất {store.to_json(args.output)} món vào {args.output}")
+        elif args.command == "import-json":
+            print(f"Đã nạp {store.import_json(args.input)} món mới (tổng {len(store)})")
+
+
+if __name__ == "__main__":
+    main()
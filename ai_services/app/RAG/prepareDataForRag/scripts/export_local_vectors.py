@@ -0,0 +1,48 @@
+"""
+Xuất collection Qdrant `recipes` sang store vector nhúng (`LocalVectorDB`).
+
+    python -m app.RAG.prepareDataForRag.scripts.export_local_vectors --dtype float16
+Sau đó chạy API với VECTOR_BACKEND=local.
+"""
+
+import argparse
+
+from qdrant_client import QdrantClient
+
+from app.config.paths import LOCAL_VECTOR_DIR
+from app.RAG.vectordb import LocalVectorDB
+
+COLLECTION_NAME = "recipes"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Qdrant collection to a local vector store")
+    parser.add_argument("--output", default=str(LOCAL_VECTOR_DIR))
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    args = parser.parse_args()
+
+    qdrant = QdrantClient(host="localhost", port=6333, check_compatibility=False)
+
+    vectors = []
+    payloads = []
+    offset = None
+    while True:
+        points, offset = qdrant.scroll(
+            collection_name=COLLECTION_NAME,
+            limit=1024,
+            offset=offset,
+            with_vectors=True,
+            with_payload=True
+        )
+        for point in points:
+            vectors.append(point.vector)
+            payloads.append(point.payload)
+        if offset is None:
+            break
+
+    store = LocalVectorDB.build(args.output, vectors, payloads, dtype=args.dtype)
+    print(f"Đã xuất {len(store)} vector ({args.dtype}) vào {args.output}")
+
+
+if __name__ == "__main__":
+    main()
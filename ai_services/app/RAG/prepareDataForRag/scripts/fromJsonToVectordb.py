@@ -1,45 +1,73 @@
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
-import psycopg2
-import json
+"""
+Ingest dataset công thức vào Qdrant (vector) và Postgres (chi tiết).
 
+Pipeline streaming theo batch:
+1. Đọc công thức từ file JSON/JSONL theo từng phần tử (không nạp cả file).
+2. Embedding theo batch (`--embed-batch-size`).
+3. Upsert Qdrant một lần mỗi batch; ghi Postgres bằng `execute_values`, một transaction mỗi batch.
 
+Incremental (mặc định, `--full` để tắt):
+- Point id tất định: uuid5(recipe["id"]) -> chạy lại không nhân bản vector.
+- `content_hash` (hash của `build_embedding_text`) lưu trong payload Qdrant: chỉ embed lại món mới/đổi nội dung.
+- `record_hash` (hash toàn bộ bản ghi) lưu trong Postgres: chỉ ghi lại dòng đã thay đổi.
+- Món không còn trong dataset bị xóa khỏi Qdrant và Postgres; point cũ (uuid4, trùng lặp) cũng bị dọn.
 
+    python -m app.RAG.prepareDataForRag.scripts.fromJsonToVectordb --batch-size 256
+"""
 
+from sentence_transformers import SentenceTransformer
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    VectorParams, Distance, PointStruct, FieldCondition, Filter, MatchAny, PointIdsList
+)
+from psycopg2.extras import execute_values
+import psycopg2
+import argparse
+import hashlib
+import json
+import time
 import uuid
 
+from app.config.paths import RECIPES_JSON_PATH, RECIPES_JSONL_PATH
+from app.db import bump_catalogue_version
+from app.RAG.prepareDataForRag.scripts.recipe_io import batched, iter_recipes
+
 COLLECTION_NAME = "recipes"
 EMBEDDING_MODEL = "intfloat/multilingual-e5-base"
-model = SentenceTransformer(EMBEDDING_MODEL)
-from app.config.paths import RECIPES_JSON_PATH
-qdrant = QdrantClient(
-    host="localhost",
-    port=6333,
-    check_compatibility=False
-)
+# Namespace cố định cho uuid5(recipe id) -> point id
+POINT_NAMESPACE = uuid.UUID("6f1c7f0e-3b2a-5d8e-9a41-2c5e8b7d9f10")
 
-if not qdrant.collection_exists(COLLECTION_NAME):
-    qdrant.create_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config=VectorParams(
-            size=768,
-            distance=Distance.COSINE
-        )
+RECIPES_DDL = """
+    CREATE TABLE IF NOT EXISTS recipes (
+        id TEXT PRIMARY KEY,
+        ten_mon TEXT,
+        mo_ta TEXT,
+        nguyen_lieu_search TEXT,
+        nguyen_lieu_chi_tiet JSONB,
+        cach_lam JSONB,
+        thoi_gian_nau TEXT,
+        gia_vi JSONB
+    );
+    ALTER TABLE recipes ADD COLUMN IF NOT EXISTS record_hash TEXT;
+"""
+
+UPSERT_RECIPES_SQL = """
+    INSERT INTO recipes (
+        id, ten_mon, mo_ta, nguyen_lieu_search,
+        nguyen_lieu_chi_tiet, cach_lam, thoi_gian_nau, gia_vi, record_hash
     )
-    print(f"Đã tạo collection mới: {COLLECTION_NAME}")
-else:
-    print(f" Collection '{COLLECTION_NAME}' đã tồn tại -> Chế độ Incremental Upsert.")
-
-conn = psycopg2.connect(
-    dbname="smartchef_db",
-    user="admin",
-    password="admin",
-    host="localhost",
-    port=5432
-)
+    VALUES %s
+    ON CONFLICT (id) DO UPDATE SET
+        ten_mon = EXCLUDED.ten_mon,
+        mo_ta = EXCLUDED.mo_ta,
+        nguyen_lieu_search = EXCLUDED.nguyen_lieu_search,
+        nguyen_lieu_chi_tiet = EXCLUDED.nguyen_lieu_chi_tiet,
+        cach_lam = EXCLUDED.cach_lam,
+        thoi_gian_nau = EXCLUDED.thoi_gian_nau,
+        gia_vi = EXCLUDED.gia_vi,
+        record_hash = EXCLUDED.record_hash
+"""
 
-cursor = conn.cursor()
 
 def build_embedding_text(recipe):
     gia_vi_str = ", ".join(recipe.get('gia_vi', []))
@@ -50,60 +78,136 @@ def build_embedding_text(recipe):
         f"Gia vị: {gia_vi_str}"
     )
 
-def insert_recipe(recipe):
-    text = build_embedding_text(recipe)
 
-    vector = model.encode(f"passage: {text}").tolist()
-    point_id = str(uuid.uuid4())
-    
+def point_id(recipe_id: str) -> str:
+    return str(uuid.uuid5(POINT_NAMESPACE, recipe_id))
+
+
+def content_hash(recipe: dict) -> str:
+    """
+    Hash của nội dung được embedding (kèm tên model: đổi model -> embed lại toàn bộ).
+    """
+    text = f"{EMBEDDING_MODEL}\n{build_embedding_text(recipe)}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def record_hash(recipe: dict) -> str:
+    data = json.dumps(recipe, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def connect():
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    qdrant = QdrantClient(
+        host="localhost",
+        port=6333,
+        check_compatibility=False
+    )
+    conn = psycopg2.connect(
+        dbname="smartchef_db",
+        user="admin",
+        password="admin",
+        host="localhost",
+        port=5432
+    )
+    return model, qdrant, conn
+
+
+def ensure_schema(qdrant, conn):
+    if not qdrant.collection_exists(COLLECTION_NAME):
+        qdrant.create_collection(
+            collection_name=COLLECTION_NAME,
+            vectors_config=VectorParams(
+                size=768,
+                distance=Distance.COSINE
+            )
+        )
+        print(f"Đã tạo collection mới: {COLLECTION_NAME}")
+    else:
+        print(f" Collection '{COLLECTION_NAME}' đã tồn tại -> Chế độ Incremental Upsert.")
+
+    with conn.cursor() as cursor:
+        cursor.execute(RECIPES_DDL)
+    conn.commit()
+
+
+def load_vector_state(qdrant) -> tuple[dict, list]:
+    """
+    Đọc payload hiện có trong Qdrant.
+
+    Returns:
+        tuple: (recipe_id -> content_hash của point tất định, list point id lạc hậu cần xóa).
+    """
+    hashes = {}
+    stale = []
+    offset = None
+    while True:
+        points, offset = qdrant.scroll(
+            collection_name=COLLECTION_NAME,
+            limit=1024,
+            offset=offset,
+            with_payload=["recipe_id", "content_hash"],
+            with_vectors=False
+        )
+        for point in points:
+            recipe_id = point.payload.get("recipe_id")
+            if recipe_id is not None and str(point.id) == point_id(recipe_id):
+                hashes[recipe_id] = point.payload.get("content_hash")
+            else:
+                stale.append(point.id)
+        if offset is None:
+            break
+    return hashes, stale
+
+
+def load_row_state(conn) -> dict:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT id, record_hash FROM recipes")
+        return dict(cursor.fetchall())
+
+
+def delete_removed(qdrant, conn, removed_ids: list[str], stale_points: list):
+    if stale_points:
+        qdrant.delete(collection_name=COLLECTION_NAME, points_selector=PointIdsList(points=stale_points))
+    if removed_ids:
+        qdrant.delete(
+            collection_name=COLLECTION_NAME,
+            points_selector=Filter(must=[FieldCondition(key="recipe_id", match=MatchAny(any=removed_ids))])
+        )
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM recipes WHERE id = ANY(%s)", (removed_ids,))
+        conn.commit()
+
+
+def embed_batch(model, recipes: list[dict], batch_size: int):
+    texts = [f"passage: {build_embedding_text(recipe)}" for recipe in recipes]
+    return model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+
+
+def upsert_vectors(qdrant, recipes: list[dict], vectors):
     qdrant.upsert(
         collection_name=COLLECTION_NAME,
         points=[
             PointStruct(
-                id=point_id,
-                vector=vector,
+                id=point_id(recipe["id"]),
+                vector=vector.tolist(),
                 payload={
                     "recipe_id": recipe.get("id"),
                     "ten_mon": recipe.get("ten_mon"),
                     "nguyen_lieu_search": recipe.get("nguyen_lieu_search"),
-                    "gia_vi": recipe.get("gia_vi", [])
+                    "gia_vi": recipe.get("gia_vi", []),
+                    "content_hash": content_hash(recipe)
                 }
             )
+            for recipe, vector in zip(recipes, vectors)
         ]
     )
 
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS recipes (
-            id TEXT PRIMARY KEY,
-            ten_mon TEXT,
-            mo_ta TEXT,
-            nguyen_lieu_search TEXT,
-            nguyen_lieu_chi_tiet JSONB,
-            cach_lam JSONB,
-            thoi_gian_nau TEXT,
-            gia_vi JSONB
-        );
-    """)
-    
-    conn.commit()
 
-    cursor.execute(
-        """
-        INSERT INTO recipes (
-            id, ten_mon, mo_ta, nguyen_lieu_search,
-            nguyen_lieu_chi_tiet, cach_lam, thoi_gian_nau, gia_vi
-        )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (id) DO UPDATE SET
-            ten_mon = EXCLUDED.ten_mon,
-            mo_ta = EXCLUDED.mo_ta,
-            nguyen_lieu_search = EXCLUDED.nguyen_lieu_search,
-            nguyen_lieu_chi_tiet = EXCLUDED.nguyen_lieu_chi_tiet,
-            cach_lam = EXCLUDED.cach_lam,
-            thoi_gian_nau = EXCLUDED.thoi_gian_nau,
-            gia_vi = EXCLUDED.gia_vi
-        """,
-        (
+def upsert_rows(conn, recipes: list[dict]):
+    # Bỏ trùng id trong cùng batch (ON CONFLICT không cho phép 2 dòng cùng id trong một lệnh)
+    rows = {
+        recipe.get("id"): (
             recipe.get("id"),
             recipe.get("ten_mon"),
             recipe.get("mo_ta"),
@@ -111,21 +215,116 @@ def insert_recipe(recipe):
             json.dumps(recipe.get("nguyen_lieu_chi_tiet", [])),
             json.dumps(recipe.get("cach_lam", [])),
             recipe.get("thoi_gian_nau"),
-            json.dumps(recipe.get("gia_vi", []))
+            json.dumps(recipe.get("gia_vi", [])),
+            record_hash(recipe)
         )
+        for recipe in recipes
+    }
+    with conn.cursor() as cursor:
+        execute_values(cursor, UPSERT_RECIPES_SQL, list(rows.values()), page_size=len(rows))
+    conn.commit()
+
+
+def ingest(recipes, model, qdrant, conn, batch_size: int = 256, embed_batch_size: int = 64,
+           vector_state: dict | None = None, row_state: dict | None = None) -> dict:
+    """
+    Ingest các công thức theo batch.
+
+    Args:
+        vector_state (dict | None): recipe_id -> content_hash đang có trong Qdrant (None = embed tất cả).
+        row_state (dict | None): recipe_id -> record_hash đang có trong Postgres (None = ghi tất cả).
+
+    Returns:
+        dict: Thống kê (seen, embedded, written, seen_ids).
+    """
+    stats = {"seen": 0, "embedded": 0, "written": 0, "seen_ids": set()}
+    start = time.perf_counter()
+    timings = {"embed": 0.0, "qdrant": 0.0, "postgres": 0.0}
+
+    for batch in batched(recipes, batch_size):
+        batch = [recipe for recipe in batch if recipe.get("id")]
+        stats["seen"] += len(batch)
+        stats["seen_ids"].update(recipe["id"] for recipe in batch)
+
+        to_embed = [
+            recipe for recipe in batch
+            if vector_state is None or vector_state.get(recipe["id"]) != content_hash(recipe)
+        ]
+        to_write = [
+            recipe for recipe in batch
+            if row_state is None or row_state.get(recipe["id"]) != record_hash(recipe)
+        ]
+
+        if to_embed:
+            t = time.perf_counter()
+            vectors = embed_batch(model, to_embed, embed_batch_size)
+            timings["embed"] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            upsert_vectors(qdrant, to_embed, vectors)
+            timings["qdrant"] += time.perf_counter() - t
+            stats["embedded"] += len(to_embed)
+
+        if to_write:
+            t = time.perf_counter()
+            upsert_rows(conn, to_write)
+            timings["postgres"] += time.perf_counter() - t
+            stats["written"] += len(to_write)
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {stats['seen']} món | embed {stats['embedded']} | ghi {stats['written']} | "
+            f"{stats['seen'] / elapsed:.1f} món/s"
+        )
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Tổng: {stats['seen']} món trong {elapsed:.1f}s "
+        f"({stats['seen'] / elapsed if elapsed else 0:.1f} món/s) | "
+        + " | ".join(f"{stage} {seconds:.1f}s" for stage, seconds in timings.items())
     )
+    return stats
 
-with open(RECIPES_JSON_PATH, "r", encoding="utf-8") as f:
-    recipes_data = json.load(f)
 
-print(f"Đang reset collection '{COLLECTION_NAME}' và nạp {len(recipes_data)} món ăn...")
+def main():
+    parser = argparse.ArgumentParser(description="Ingest recipes into Qdrant + Postgres")
+    # Dataset JSONL của data_generator là nguồn chính; file JSON cũ chỉ dùng khi chưa có JSONL
+    default_input = RECIPES_JSONL_PATH if RECIPES_JSONL_PATH.exists() else RECIPES_JSON_PATH
+    parser.add_argument("--input", default=str(default_input), help="Dataset .json (mảng) hoặc .jsonl")
+    parser.add_argument("--batch-size", type=int, default=256, help="Số món mỗi batch upsert/transaction")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="Batch size khi encode")
+    parser.add_argument("--full", action="store_true", help="Embed và ghi lại toàn bộ, bỏ qua content hash")
+    args = parser.parse_args()
 
-for recipe in recipes_data:
-    insert_recipe(recipe)
+    model, qdrant, conn = connect()
+    ensure_schema(qdrant, conn)
 
-conn.commit()
-print(" Ingest xong dữ liệu! (DB Cleaned & Updated)")
+    vector_state, stale_points = load_vector_state(qdrant)
+    row_state = load_row_state(conn)
+    print(
+        f"Hiện có {len(vector_state)} vector, {len(row_state)} dòng Postgres, "
+        f"{len(stale_points)} point lạc hậu/trùng lặp."
+    )
+
+    print(f"Đang nạp món ăn từ {args.input} vào collection '{COLLECTION_NAME}'...")
+    stats = ingest(
+        iter_recipes(args.input), model, qdrant, conn, args.batch_size, args.embed_batch_size,
+        vector_state=None if args.full else vector_state,
+        row_state=None if args.full else row_state
+    )
 
+    removed_ids = sorted((set(vector_state) | set(row_state)) - stats["seen_ids"])
+    delete_removed(qdrant, conn, removed_ids, stale_points)
+    print(f"Đã xóa {len(removed_ids)} món không còn trong dataset, {len(stale_points)} point lạc hậu.")
 
+    if stats["embedded"] or stats["written"] or removed_ids or stale_points:
+        # Báo cho các API process xóa cache công thức
+        with conn.cursor() as cursor:
+            bump_catalogue_version(cursor)
+        conn.commit()
+    conn.close()
+    print(" Ingest xong dữ liệu! (DB Cleaned & Updated)")
 
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Đọc dataset công thức theo kiểu streaming (không nạp cả file vào bộ nhớ).
+"""
+
+import json
+
+_DECODER = json.JSONDecoder()
+
+
+def iter_json_array(path, chunk_size: int = 1 << 16):
+    """
+    Duyệt từng phần tử của một file JSON dạng mảng `[ {...}, {...} ]`, đọc file theo chunk.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        started = False
+        eof = False
+
+        while True:
+            if not eof and len(buffer) < chunk_size:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    if eof:
+                        return
+                    continue
+                if buffer[0] != "[":
+                    raise ValueError(f"{path} is not a JSON array")
+                buffer = buffer[1:]
+                started = True
+                continue
+
+            if buffer.startswith(","):
+                buffer = buffer[1:]
+                continue
+            if buffer.startswith("]"):
+                return
+            if not buffer:
+                if eof:
+                    raise ValueError(f"Unexpected end of file in {path}")
+                continue
+
+            try:
+                item, end = _DECODER.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Phần tử chưa đọc đủ: đọc thêm chunk rồi thử lại
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            if not eof and not buffer[end:].lstrip().startswith((",", "]")):
+                # Chưa thấy dấu phân cách sau phần tử: số / true / false / null có thể còn tiếp ở chunk sau
+                # ("-0" của "-0.5", "1" của "1e5")
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+
+            yield item
+            buffer = buffer[end:]
+
+
+def iter_jsonl(path):
+    """
+    Duyệt từng dòng của file JSON Lines (bỏ qua dòng trống, dòng hỏng và dòng cuối ghi dở),
+    giống cách `DatasetStore` nạp file.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for number, line in enumerate(f, 1):
+            if not line.endswith("\n"):
+                return
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Bỏ qua dòng hỏng {number} trong {path}: {e}")
+                continue
+            if not isinstance(record, dict):
+                print(f"Bỏ qua dòng {number} trong {path}: không phải object JSON")
+                continue
+            yield record
+
+
+def iter_recipes(path):
+    """
+    Duyệt các công thức trong dataset (.json dạng mảng hoặc .jsonl).
+    """
+    if str(path).endswith(".jsonl"):
+        yield from iter_jsonl(path)
+    else:
+        yield from iter_json_array(path)
+
+
+def batched(iterable, size: int):
+    """
+    Gom phần tử của `iterable` thành list có tối đa `size` phần tử.
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
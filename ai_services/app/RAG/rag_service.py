@@ -1,15 +1,91 @@
+import asyncio
+import os
+import time
 from .embedding import EmbeddingService
-from .vectordb import RecipeVectorDB
+from .vectordb import create_vector_db
+from .retrieval_table import RetrievalTable
+from .ingredient_index import IngredientIndex, parse_ingredients
+from .recipe_selection import select_recipe
 from app import db
+from app.config import paths
+
+RETRIEVAL_TABLE_PATH = os.getenv("RETRIEVAL_TABLE_PATH", str(paths.RETRIEVAL_TABLE_PATH))
+# Sau một lần build inverted index lỗi, chờ ngần này giây mới thử lại
+INDEX_RETRY_INTERVAL = float(os.getenv("INGREDIENT_INDEX_RETRY_INTERVAL", "30"))
 
 class RecipeRAGService:
     """
     Service quản lý việc truy xuất công thức nấu ăn (Retrieval-Augmented Generation).
     """
-    def __init__(self):
+    def __init__(self, use_retrieval_table: bool = True):
         self.embedding = EmbeddingService()
-        self.vectordb = RecipeVectorDB()
+        self.vectordb = create_vector_db()
+        self.retrieval_table = self._load_retrieval_table() if use_retrieval_table else None
+        self._stale_table_version = None
+        self.ingredient_index = None
+        self._index_failed_at = None
+        self._refresh_index(db.catalogue_version())
+
+    def _index_due(self, version) -> bool:
+        """
+        Cần build lại inverted index: chưa có hoặc version catalogue đã đổi, và không vừa build lỗi
+        (tránh mỗi request đều quét lại toàn bộ catalogue khi Postgres đang lỗi).
+        """
+        if self.ingredient_index is not None and self.ingredient_index.version == version:
+            return False
+        return self._index_failed_at is None or time.monotonic() - self._index_failed_at >= INDEX_RETRY_INTERVAL
+
+    def _refresh_index(self, version):
+        """
+        Build lại inverted index nếu chưa có hoặc version catalogue đã đổi.
+        """
+        if not self._index_due(version):
+            return
+        try:
+            self.ingredient_index = IngredientIndex(db.get_recipe_ingredients(), version)
+            self._index_failed_at = None
+            print(f"Built ingredient index: {len(self.ingredient_index)} recipes")
+        except Exception as e:
+            self._index_failed_at = time.monotonic()
+            print(f"Error building ingredient index: {e}")
 
+    async def _arefresh_index(self, version):
+        if not self._index_due(version):
+            return
+        try:
+            self.ingredient_index = IngredientIndex(await db.aget_recipe_ingredients(), version)
+            self._index_failed_at = None
+            print(f"Built ingredient index: {len(self.ingredient_index)} recipes")
+        except Exception as e:
+            self._index_failed_at = time.monotonic()
+            print(f"Error building ingredient index: {e}")
+
+    def _load_retrieval_table(self):
+        """
+        Nạp bảng retrieval tính trước (xem `scripts/build_retrieval_table.py`) nếu có.
+        """
+        if not os.path.exists(RETRIEVAL_TABLE_PATH):
+            return None
+        try:
+            table = RetrievalTable.load(RETRIEVAL_TABLE_PATH)
+            print(f"Loaded retrieval table: {len(table.keys)} entries (max size {table.max_size})")
+            return table
+        except Exception as e:
+            print(f"Error loading retrieval table: {e}")
+            return None
+
+    async def astart(self):
+        """
+        Mở sẵn pool Postgres async (gọi từ FastAPI lifespan).
+        """
+        await db.get_async_pool()
+
+    async def aclose(self):
+        """
+        Đóng pool Postgres và vector backend khi shutdown.
+        """
+        await db.close_pools()
+        await self.vectordb.aclose()
 
     def ingredient_match_score(self, recipe_ingredients, query_ingredients):
         """
@@ -24,35 +100,157 @@ class RecipeRAGService:
         intersection = recipe_set & query_set
         return len(intersection) / len(recipe_set)
 
+    def select_recipe(self, ingredients: list[str], recipes: list[dict]):
+        """
+        Chọn một món để hướng dẫn trong kết quả retrieval, không cần LLM (xem `recipe_selection`).
+        Nguyên liệu chính của món lấy từ inverted index nếu có.
+
+        Returns:
+            RecipeSelection: Món được chọn (hoặc None), lý do và các món bị loại.
+        """
+        index = self.ingredient_index
+        return select_recipe(ingredients, recipes, index.ingredients_of if index is not None else None)
+
     def retrieve(self, ingredients: list[str], top_k=5):
         """
         Tìm kiếm công thức phù hợp dựa trên danh sách nguyên liệu.
         Kết hợp Semantic Search (Vector) và Keyword Matching.
+        Tập nguyên liệu có trong bảng tính trước sẽ bỏ qua embedding + Qdrant + rerank.
         """
+        version = db.catalogue_version()
+        entries = self._table_lookup(ingredients, top_k, version)
+        if entries is not None:
+            db_recipes = db.get_recipes_by_ids([r_id for r_id, _, _ in entries])
+            return self._from_table(entries, db_recipes)
+
+        self._refresh_index(version)
+
         query_vector = self.embedding.embed_ingredients(ingredients)
         hits = self.vectordb.search(query_vector, limit=top_k * 2)
         print(f"Vector Hits: {len(hits)}")
 
+        # Bổ sung các món khớp nguyên liệu tốt trên toàn catalogue nhưng nằm ngoài tập vector hit
+        extra_ids = self._index_candidates(ingredients, hits, top_k)
+        if extra_ids:
+            hits = list(hits) + list(self.vectordb.search_ids(query_vector, extra_ids))
+
         if not hits:
             return []
 
         hit_ids = [hit.payload["recipe_id"] for hit in hits]
         db_recipes = db.get_recipes_by_ids(hit_ids)
-        
+
+        return self._rank(hits, db_recipes, ingredients, top_k)
+
+    async def aretrieve(self, ingredients: list[str], top_k=5, executor=None):
+        """
+        Phiên bản async của `retrieve`: embedding và tìm kiếm vector cục bộ (CPU-bound) chạy trên
+        `executor`, Qdrant và Postgres dùng client async.
+        """
+        version = await db.acatalogue_version()
+        entries = self._table_lookup(ingredients, top_k, version)
+        if entries is not None:
+            db_recipes = await db.aget_recipes_by_ids([r_id for r_id, _, _ in entries])
+            return self._from_table(entries, db_recipes)
+
+        await self._arefresh_index(version)
+
+        loop = asyncio.get_running_loop()
+        query_vector = await loop.run_in_executor(
+            executor, self.embedding.embed_ingredients, ingredients
+        )
+        hits = await self.vectordb.asearch(query_vector, limit=top_k * 2, executor=executor)
+        print(f"Vector Hits: {len(hits)}")
+
+        extra_ids = self._index_candidates(ingredients, hits, top_k)
+        if extra_ids:
+            hits = list(hits) + list(await self.vectordb.asearch_ids(query_vector, extra_ids, executor=executor))
+
+        if not hits:
+            return []
+
+        hit_ids = [hit.payload["recipe_id"] for hit in hits]
+        db_recipes = await db.aget_recipes_by_ids(hit_ids)
+
+        return self._rank(hits, db_recipes, ingredients, top_k)
+
+    def _table_lookup(self, ingredients: list[str], top_k: int, version):
+        """
+        Tra bảng retrieval tính trước; None nếu không có bảng, tập nguyên liệu không được bao phủ,
+        hoặc bảng được build từ version catalogue khác (thứ hạng cũ, có thể trỏ tới món đã bị xóa).
+        """
+        table = self.retrieval_table
+        if table is None:
+            return None
+        if table.catalogue_version != version:
+            if self._stale_table_version != version:
+                self._stale_table_version = version
+                print(
+                    f"Retrieval table built for catalogue version {table.catalogue_version}, "
+                    f"current version {version}: skipping table"
+                )
+            return None
+        return table.lookup(ingredients, top_k)
+
+    def _index_candidates(self, ingredients: list[str], hits, top_k: int) -> list[str]:
+        """
+        Các recipe id có điểm khớp nguyên liệu cao nhất toàn catalogue mà chưa có trong `hits`.
+        """
+        if self.ingredient_index is None:
+            return []
+        hit_ids = {hit.payload["recipe_id"] for hit in hits}
+        return [
+            r_id for r_id, _ in self.ingredient_index.top_matches(ingredients, limit=top_k * 2)
+            if r_id not in hit_ids
+        ]
+
+    def _from_table(self, entries, db_recipes: dict):
+        """
+        Dựng kết quả từ các entry (recipe_id, match_score, semantic_score) của bảng tính trước.
+        Entry không còn trong Postgres (món đã bị xóa) bị bỏ qua.
+        """
         results = []
+        for r_id, match_score, semantic_score in entries:
+            recipe_detail = db_recipes.get(r_id)
+            if recipe_detail is None:
+                continue
+            results.append({
+                "id": r_id,
+                "ten_mon": recipe_detail.get("ten_mon", ""),
+                "match_score": match_score,
+                "semantic_score": semantic_score,
+                "nguyen_lieu_chi_tiet": recipe_detail.get("nguyen_lieu_chi_tiet", []),
+                "gia_vi": recipe_detail.get("gia_vi", []),
+                "cach_lam": recipe_detail.get("cach_lam", []),
+                "mo_ta": recipe_detail.get("mo_ta", "")
+            })
+        return results
+
+    def _rank(self, hits, db_recipes: dict, ingredients: list[str], top_k: int):
+        """
+        Rerank các vector hit theo điểm khớp nguyên liệu, sau đó theo điểm semantic.
+        """
+        index = self.ingredient_index
+        index_scores = index.match_scores(ingredients) if index is not None else None
+
+        results = []
+        seen = set()
         for hit in hits:
             payload = hit.payload
             r_id = payload["recipe_id"]
+            if r_id in seen:
+                continue
+            seen.add(r_id)
             
             recipe_detail = db_recipes.get(r_id, {})
             
-            recipe_ingredients_str = payload.get("nguyen_lieu_search", "")
-            recipe_ingredients = [i.strip().lower() for i in recipe_ingredients_str.split(",")]
-            
-            match_score = self.ingredient_match_score(
-                recipe_ingredients,
-                ingredients
-            )
+            if index_scores is not None and r_id in index.row_of:
+                match_score = float(index_scores[index.row_of[r_id]])
+            else:
+                match_score = self.ingredient_match_score(
+                    parse_ingredients(payload.get("nguyen_lieu_search", "")),
+                    ingredients
+                )
 
             print(f"--- Đánh giá món: {payload.get('ten_mon')} ---")
             print(f"Điểm Match: {match_score:.2f}")
@@ -0,0 +1,119 @@
+"""
+Module: Deterministic Recipe Selection
+====================================
+
+Chọn món để hướng dẫn từ danh sách công thức đã retrieve, không cần LLM (RECIPE_SELECTION=local):
+
+1. Xác định nhóm nguyên liệu chính (thịt bò, thịt heo, thịt gà, cá, tôm, ...) của người dùng và của
+   từng món, theo tập nguyên liệu chuẩn hóa của món (`IngredientIndex`) hoặc `nguyen_lieu_chi_tiet`.
+2. Loại món cần nguyên liệu chính mà người dùng không có (cùng quy tắc "món cần Thịt bò mà người dùng
+   chỉ có Thịt heo -> loại" trong prompt gợi ý).
+3. Chọn món còn lại đứng đầu theo thứ hạng retrieval (match_score, rồi semantic_score).
+
+LLM sau đó chỉ nhận món đã chọn để viết hướng dẫn (xem `LLMService`).
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+# Nhóm nguyên liệu chính -> các tên (tiền tố của tên nguyên liệu) thuộc nhóm
+MAIN_INGREDIENT_GROUPS = {
+    "thịt bò": ("thịt bò", "bò", "bắp bò", "gân bò", "nạm bò", "sườn bò"),
+    "thịt heo": ("thịt heo", "thịt lợn", "heo", "lợn", "ba chỉ", "ba rọi", "sườn", "chân giò", "giò heo",
+                 "nạc vai", "thịt nạc", "thịt băm"),
+    "thịt gà": ("thịt gà", "gà", "cánh gà", "đùi gà", "ức gà", "chân gà"),
+    "thịt vịt": ("thịt vịt", "vịt"),
+    "thịt cừu": ("thịt cừu", "cừu", "thịt dê", "dê"),
+    "cá": ("thịt cá", "cá", "phi lê cá"),
+    "tôm": ("tôm",),
+    "mực": ("mực",),
+    "cua": ("cua", "ghẹ"),
+}
+
+# Số lượng / đơn vị ở đầu một dòng `nguyen_lieu_chi_tiet` ("500g thịt gà ta", "2 thìa nước mắm")
+_QUANTITY = re.compile(
+    r"^[\d\s.,/½¼¾-]*(?:kg|gr|g|ml|lít|l|muỗng|thìa|quả|trái|củ|cây|con|miếng|lát|chén|bát|gói|hộp|nhánh|tép|"
+    r"bó|nắm|ít|chút)?\s+(?=\D)",
+    re.IGNORECASE
+)
+
+
+def _strip_quantity(text: str) -> str:
+    text = unicodedata.normalize("NFC", text).strip().lower()
+    return _QUANTITY.sub("", text, count=1) if text[:1].isdigit() else text
+
+
+def main_groups(names) -> set[str]:
+    """
+    Các nhóm nguyên liệu chính xuất hiện trong `names` (tên nguyên liệu, có thể kèm số lượng).
+    """
+    groups = set()
+    for name in names:
+        name = _strip_quantity(name)
+        for group, prefixes in MAIN_INGREDIENT_GROUPS.items():
+            if any(name == p or name.startswith(p + " ") for p in prefixes):
+                groups.add(group)
+                break
+    return groups
+
+
+@dataclass
+class RecipeSelection:
+    """
+    Kết quả chọn món.
+
+    Attributes:
+        recipe (dict | None): Món được chọn; None nếu mọi món đều bị loại (hoặc không có món nào).
+        reason (str): Lý do chọn (đưa vào prompt và trả về cho client).
+        excluded (list[dict]): Các món bị loại, kèm nguyên liệu chính còn thiếu.
+    """
+    recipe: dict | None
+    reason: str
+    excluded: list[dict] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "recipe_id": self.recipe.get("id") if self.recipe else None,
+            "ten_mon": self.recipe.get("ten_mon") if self.recipe else None,
+            "reason": self.reason,
+            "excluded": self.excluded,
+        }
+
+
+def select_recipe(ingredients: list[str], recipes: list[dict], recipe_ingredients=None) -> RecipeSelection:
+    """
+    Chọn món tốt nhất trong `recipes` (đã xếp hạng) cho nguyên liệu `ingredients`.
+
+    Args:
+        ingredients (list[str]): Nguyên liệu người dùng có.
+        recipes (list[dict]): Kết quả retrieval (`id`, `ten_mon`, `match_score`, `semantic_score`,
+            `nguyen_lieu_chi_tiet`).
+        recipe_ingredients: Hàm recipe id -> tập nguyên liệu chuẩn hóa (hoặc None), ví dụ
+            `IngredientIndex.ingredients_of`; không có thì dùng `nguyen_lieu_chi_tiet`.
+    """
+    available = main_groups(ingredients)
+    ranked = sorted(
+        recipes, key=lambda r: (r.get("match_score", 0.0), r.get("semantic_score", 0.0)), reverse=True
+    )
+
+    excluded = []
+    for recipe in ranked:
+        names = recipe_ingredients(recipe.get("id")) if recipe_ingredients else None
+        if names is None:
+            names = recipe.get("nguyen_lieu_chi_tiet", [])
+        missing = sorted(main_groups(names) - available)
+        if missing:
+            excluded.append({"recipe_id": recipe.get("id"), "ten_mon": recipe.get("ten_mon"), "missing": missing})
+            continue
+
+        reason = f"độ khớp nguyên liệu cao nhất ({recipe.get('match_score', 0.0):.2f})"
+        if excluded:
+            reason += "; đã loại " + ", ".join(
+                f"{e['ten_mon']} (cần {', '.join(e['missing'])})" for e in excluded
+            )
+        return RecipeSelection(recipe, reason, excluded)
+
+    if not recipes:
+        return RecipeSelection(None, "không tìm thấy công thức phù hợp")
+    return RecipeSelection(None, "mọi công thức đều cần nguyên liệu chính người dùng không có", excluded)
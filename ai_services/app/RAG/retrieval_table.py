@@ -0,0 +1,208 @@
+"""
+Module: Precomputed Retrieval Table
+=================================
+
+Nguyên liệu đầu vào chỉ đến từ từ vựng đóng của YOLO (`YOLO_CLASS_TO_VI`), nên có thể tính trước
+kết quả `RecipeRAGService.retrieve` cho mọi tập nguyên liệu kích thước <= k.
+
+Mỗi tập nguyên liệu được mã hóa thành bitmask uint64 trên từ vựng; bảng lưu danh sách
+(recipe, match_score, semantic_score) đã xếp hạng. Lookup = `np.searchsorted` trên mảng key đã sắp xếp.
+
+Bảng ghi lại version catalogue (`db.catalogue_version()`) lúc build; `RecipeRAGService` bỏ qua bảng
+khi version trong Postgres đã khác (catalogue được ingest lại sau khi build bảng).
+
+Định dạng file (little-endian):
+    header   : magic "SCRT", version, max_size, top_k, n_vocab, n_recipes, n_entries,
+               catalogue_version (0xFFFFFFFF = không rõ)  (uint32)
+    vocab    : uint32 độ dài + JSON list[str]
+    recipes  : uint32 độ dài + JSON list[str] (recipe id)
+    keys     : uint64[n_entries] (đã sắp xếp)
+    offsets  : uint32[n_entries + 1] (vị trí trong postings)
+    postings : structured [(recipe uint32, match float32, semantic float32)]
+"""
+
+import json
+import struct
+import threading
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+
+from .embedding_cache import canonicalize_ingredients
+
+MAGIC = b"SCRT"
+FORMAT_VERSION = 2
+NO_CATALOGUE_VERSION = 0xFFFFFFFF
+# Số tập nguyên liệu không được bao phủ giữ lại để thống kê (đầu vào từ người dùng, không giới hạn)
+MAX_UNCOVERED_KEYS = 1000
+POSTING_DTYPE = np.dtype([("recipe", "<u4"), ("match", "<f4"), ("semantic", "<f4")])
+
+
+class RetrievalTable:
+    """
+    Bảng tra cứu kết quả retrieval đã tính trước, kèm thống kê coverage.
+    """
+    def __init__(self, vocab, recipe_ids, keys, offsets, postings, max_size: int, top_k: int,
+                 catalogue_version: int | None = None):
+        self.vocab = list(vocab)
+        self.recipe_ids = list(recipe_ids)
+        self.keys = keys
+        self.offsets = offsets
+        self.postings = postings
+        self.max_size = max_size
+        self.top_k = top_k
+        self.catalogue_version = catalogue_version
+        self._bit = {name: i for i, name in enumerate(self.vocab)}
+
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.covered = 0
+        self.uncovered = Counter()
+
+    def encode(self, ingredients: list[str]):
+        """
+        Mã hóa tập nguyên liệu thành bitmask; None nếu có nguyên liệu ngoài từ vựng.
+        """
+        mask = 0
+        for name in canonicalize_ingredients(ingredients):
+            bit = self._bit.get(name)
+            if bit is None:
+                return None
+            mask |= 1 << bit
+        return mask
+
+    def lookup(self, ingredients: list[str], top_k: int = 5):
+        """
+        Tra cứu kết quả đã tính trước.
+
+        Returns:
+            list[tuple[str, float, float]] | None: (recipe_id, match_score, semantic_score)
+            theo thứ hạng, hoặc None nếu tập nguyên liệu không được bảng bao phủ.
+        """
+        canonical = canonicalize_ingredients(ingredients)
+        entries = None
+        if canonical and len(canonical) <= self.max_size and top_k <= self.top_k:
+            mask = self.encode(canonical)
+            if mask is not None:
+                i = int(np.searchsorted(self.keys, np.uint64(mask)))
+                if i < len(self.keys) and int(self.keys[i]) == mask:
+                    rows = self.postings[self.offsets[i]:self.offsets[i + 1]][:top_k]
+                    entries = [
+                        (self.recipe_ids[int(r["recipe"])], float(r["match"]), float(r["semantic"]))
+                        for r in rows
+                    ]
+
+        with self._lock:
+            self.lookups += 1
+            if entries is None:
+                self.uncovered[", ".join(canonical)] += 1
+                if len(self.uncovered) > MAX_UNCOVERED_KEYS:
+                    # Chỉ giữ nửa phổ biến nhất: bộ nhớ và chi phí `stats()` có giới hạn
+                    self.uncovered = Counter(dict(self.uncovered.most_common(MAX_UNCOVERED_KEYS // 2)))
+            else:
+                self.covered += 1
+        return entries
+
+    def stats(self, top_uncovered: int = 10) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self.keys),
+                "max_size": self.max_size,
+                "catalogue_version": self.catalogue_version,
+                "lookups": self.lookups,
+                "covered": self.covered,
+                "coverage": self.covered / self.lookups if self.lookups else 0.0,
+                "top_uncovered": self.uncovered.most_common(top_uncovered),
+            }
+
+    def save(self, path):
+        vocab_blob = json.dumps(self.vocab, ensure_ascii=False).encode("utf-8")
+        recipes_blob = json.dumps(self.recipe_ids, ensure_ascii=False).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack(
+                "<7I", FORMAT_VERSION, self.max_size, self.top_k,
+                len(self.vocab), len(self.recipe_ids), len(self.keys),
+                NO_CATALOGUE_VERSION if self.catalogue_version is None else self.catalogue_version
+            ))
+            for blob in (vocab_blob, recipes_blob):
+                f.write(struct.pack("<I", len(blob)))
+                f.write(blob)
+            f.write(np.ascontiguousarray(self.keys, dtype="<u8").tobytes())
+            f.write(np.ascontiguousarray(self.offsets, dtype="<u4").tobytes())
+            f.write(np.ascontiguousarray(self.postings, dtype=POSTING_DTYPE).tobytes())
+
+    @classmethod
+    def load(cls, path) -> "RetrievalTable":
+        with open(path, "rb") as f:
+            data = f.read()
+
+        if data[:4] != MAGIC:
+            raise ValueError(f"{path} is not a retrieval table")
+        (version,) = struct.unpack_from("<I", data, 4)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported retrieval table version {version} (rebuild the table)")
+        _, max_size, top_k, _, _, n_entries, catalogue_version = struct.unpack_from("<7I", data, 4)
+        if catalogue_version == NO_CATALOGUE_VERSION:
+            catalogue_version = None
+
+        pos = 4 + 7 * 4
+        blobs = []
+        for _ in range(2):
+            (length,) = struct.unpack_from("<I", data, pos)
+            pos += 4
+            blobs.append(json.loads(data[pos:pos + length].decode("utf-8")))
+            pos += length
+        vocab, recipe_ids = blobs
+
+        keys = np.frombuffer(data, dtype="<u8", count=n_entries, offset=pos)
+        pos += keys.nbytes
+        offsets = np.frombuffer(data, dtype="<u4", count=n_entries + 1, offset=pos)
+        pos += offsets.nbytes
+        postings = np.frombuffer(data, dtype=POSTING_DTYPE, count=int(offsets[-1]), offset=pos)
+
+        return cls(vocab, recipe_ids, keys, offsets, postings, max_size, top_k, catalogue_version)
+
+
+def build_retrieval_table(retrieve, vocab: list[str], max_size: int = 2, top_k: int = 5, progress=None,
+                          catalogue_version: int | None = None) -> RetrievalTable:
+    """
+    Tính trước kết quả cho mọi tổ hợp nguyên liệu kích thước 1..max_size.
+
+    Args:
+        retrieve (callable): Hàm (ingredients, top_k) -> list[dict] như `RecipeRAGService.retrieve`.
+        vocab (list[str]): Từ vựng nguyên liệu (tối đa 64 phần tử).
+        progress (callable | None): Gọi với (done, total) sau mỗi truy vấn.
+        catalogue_version (int | None): Version catalogue mà `retrieve` đang đọc.
+    """
+    vocab = sorted(set(canonicalize_ingredients(vocab)))
+    if len(vocab) > 64:
+        raise ValueError("Retrieval table supports at most 64 vocabulary items")
+
+    combos = [c for size in range(1, max_size + 1) for c in combinations(vocab, size)]
+    bit = {name: i for i, name in enumerate(vocab)}
+
+    recipe_index = {}
+    table = []
+    for done, combo in enumerate(combos, start=1):
+        mask = 0
+        for name in combo:
+            mask |= 1 << bit[name]
+        rows = []
+        for r in retrieve(list(combo), top_k):
+            idx = recipe_index.setdefault(r["id"], len(recipe_index))
+            rows.append((idx, r["match_score"], r["semantic_score"]))
+        table.append((mask, rows))
+        if progress:
+            progress(done, len(combos))
+
+    table.sort(key=lambda item: item[0])
+    keys = np.array([mask for mask, _ in table], dtype="<u8")
+    offsets = np.zeros(len(table) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(rows) for _, rows in table])
+    postings = np.array([row for _, rows in table for row in rows], dtype=POSTING_DTYPE)
+
+    return RetrievalTable(
+        vocab, list(recipe_index), keys, offsets, postings, max_size, top_k, catalogue_version
+    )
@@ -1,12 +1,76 @@
-from qdrant_client import QdrantClient
+"""
+Module: Recipe Vector Store
+=========================
 
-class RecipeVectorDB:
+Hai backend dùng chung một interface (`search`, `search_ids` và bản async, `aclose`):
+- `RecipeVectorDB`: Qdrant server (HTTP).
+- `LocalVectorDB`: tìm kiếm in-process trên ma trận float32/float16 memory-mapped,
+  vector đã chuẩn hóa -> cosine = một phép nhân ma trận + `argpartition`.
+
+Chọn backend bằng biến môi trường VECTOR_BACKEND=qdrant|local (xem `create_vector_db`).
+"""
+
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import FieldCondition, Filter, MatchAny
+
+from app.config import paths
+
+QDRANT_URL = "http://localhost:6333"
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", str(paths.LOCAL_VECTOR_DIR))
+
+
+@dataclass
+class VectorHit:
+    """
+    Kết quả tìm kiếm, cùng các trường được dùng từ `ScoredPoint` của Qdrant.
+    """
+    id: int
+    score: float
+    payload: dict = field(default_factory=dict)
+
+
+class VectorStore(ABC):
+    """
+    Interface chung của các backend vector.
+    `executor` của các hàm async: nơi chạy phần tính toán CPU của backend cục bộ (None = thread pool mặc định).
+    """
+    @abstractmethod
+    def search(self, vector, limit=10) -> list:
+        ...
+
+    @abstractmethod
+    async def asearch(self, vector, limit=10, executor=None) -> list:
+        ...
+
+    @abstractmethod
+    def search_ids(self, vector, recipe_ids: list[str]) -> list:
+        ...
+
+    @abstractmethod
+    async def asearch_ids(self, vector, recipe_ids: list[str], executor=None) -> list:
+        ...
+
+    async def aclose(self):
+        pass
+
+
+class RecipeVectorDB(VectorStore):
     """
     Wrapper cho Qdrant Vector Database.
     """
-    def __init__(self):
-        self.client = QdrantClient(url="http://localhost:6333")
-        self.collection = "recipes"
+    def __init__(self, url: str = QDRANT_URL, collection: str = "recipes"):
+        self.client = QdrantClient(url=url)
+        self.async_client = AsyncQdrantClient(url=url)
+        self.collection = collection
 
     def search(self, vector, limit=10):
         """
@@ -17,3 +81,148 @@ class RecipeVectorDB:
             query_vector=vector,
             limit=limit
         )
+
+    async def asearch(self, vector, limit=10, executor=None):
+        """
+        Phiên bản async của `search` (dùng AsyncQdrantClient).
+        """
+        return await self.async_client.search(
+            collection_name=self.collection,
+            query_vector=vector,
+            limit=limit
+        )
+
+    def search_ids(self, vector, recipe_ids: list[str]):
+        """
+        Tính điểm tương đồng của `vector` với một tập recipe cụ thể (lọc theo payload `recipe_id`).
+        """
+        return self.client.search(
+            collection_name=self.collection,
+            query_vector=vector,
+            query_filter=_recipe_filter(recipe_ids),
+            limit=len(recipe_ids)
+        )
+
+    async def asearch_ids(self, vector, recipe_ids: list[str], executor=None):
+        return await self.async_client.search(
+            collection_name=self.collection,
+            query_vector=vector,
+            query_filter=_recipe_filter(recipe_ids),
+            limit=len(recipe_ids)
+        )
+
+    async def aclose(self):
+        await self.async_client.close()
+
+
+class LocalVectorDB(VectorStore):
+    """
+    Vector store nhúng trong process.
+
+    Thư mục dữ liệu:
+        meta.json       {"dim": ..., "dtype": "float32"|"float16", "count": ..., "normalized": true}
+        vectors.bin     ma trận [count, dim] raw (đọc bằng np.memmap)
+        payloads.jsonl  payload của từng dòng (cùng thứ tự với vectors.bin)
+    """
+    CHUNK_ROWS = 65536
+
+    def __init__(self, directory=LOCAL_VECTOR_DIR):
+        self.directory = Path(directory)
+        with open(self.directory / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        self.dim = meta["dim"]
+        self.dtype = np.dtype(meta["dtype"])
+        matrix = np.memmap(
+            self.directory / "vectors.bin", dtype=self.dtype, mode="r", shape=(meta["count"], self.dim)
+        )
+        if not meta.get("normalized", False):
+            # Chuẩn hóa một lần khi load (phải nạp vào RAM vì memmap chỉ đọc)
+            matrix = _normalize_rows(np.asarray(matrix, dtype=np.float32)).astype(self.dtype)
+        self.matrix = matrix
+
+        with open(self.directory / "payloads.jsonl", "r", encoding="utf-8") as f:
+            self.payloads = [json.loads(line) for line in f if line.strip()]
+        self.row_of = {p.get("recipe_id"): i for i, p in enumerate(self.payloads)}
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @classmethod
+    def build(cls, directory, vectors, payloads: list[dict], dtype: str = "float32") -> "LocalVectorDB":
+        """
+        Ghi vectors (đã chuẩn hóa) + payloads ra thư mục và mở store.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32)).astype(dtype)
+        vectors.tofile(directory / "vectors.bin")
+        with open(directory / "payloads.jsonl", "w", encoding="utf-8") as f:
+            for payload in payloads:
+                f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        with open(directory / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"dim": int(vectors.shape[1]), "dtype": dtype, "count": int(vectors.shape[0]), "normalized": True}, f)
+
+        return cls(directory)
+
+    def scores(self, vector) -> np.ndarray:
+        """
+        Cosine similarity của `vector` với toàn bộ store (tính theo chunk để giới hạn bộ nhớ tạm).
+        """
+        query = _normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        n = self.matrix.shape[0]
+        if self.dtype == np.float32 and n <= self.CHUNK_ROWS:
+            return self.matrix @ query
+
+        out = np.empty(n, dtype=np.float32)
+        for start in range(0, n, self.CHUNK_ROWS):
+            chunk = self.matrix[start:start + self.CHUNK_ROWS]
+            out[start:start + len(chunk)] = chunk.astype(np.float32, copy=False) @ query
+        return out
+
+    def search(self, vector, limit=10):
+        scores = self.scores(vector)
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [VectorHit(id=int(i), score=float(scores[i]), payload=self.payloads[i]) for i in top]
+
+    async def asearch(self, vector, limit=10, executor=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.search, vector, limit)
+
+    def search_ids(self, vector, recipe_ids: list[str]):
+        rows = [self.row_of[r_id] for r_id in recipe_ids if r_id in self.row_of]
+        if not rows:
+            return []
+        query = _normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        scores = np.asarray(self.matrix[rows], dtype=np.float32) @ query
+        order = np.argsort(-scores)
+        return [VectorHit(id=rows[i], score=float(scores[i]), payload=self.payloads[rows[i]]) for i in order]
+
+    async def asearch_ids(self, vector, recipe_ids: list[str], executor=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.search_ids, vector, recipe_ids)
+
+
+def create_vector_db(backend: str = VECTOR_BACKEND) -> VectorStore:
+    """
+    Khởi tạo backend vector theo cấu hình.
+    """
+    if backend == "local":
+        return LocalVectorDB()
+    if backend == "qdrant":
+        return RecipeVectorDB()
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def _recipe_filter(recipe_ids: list[str]) -> Filter:
+    return Filter(must=[FieldCondition(key="recipe_id", match=MatchAny(any=list(recipe_ids)))])
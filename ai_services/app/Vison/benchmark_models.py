@@ -0,0 +1,171 @@
+"""
+Module: YOLO Model Accuracy vs Latency
+====================================
+
+So sánh các biến thể model (FP32, INT8, cấu hình session khác nhau) trên một thư mục ảnh:
+- Độ trễ: preprocess và `session.run` (median / p95, ms/ảnh).
+- Độ chính xác: precision / recall / F1 khi ghép detection cùng class với IoU >= 0.5, và tỉ lệ ảnh
+  có cùng tập nguyên liệu.
+  Mặc định so với model đầu tiên (FP32 làm chuẩn); nếu có `--labels` (định dạng YOLO txt,
+  cùng tên file ảnh) thì so với nhãn thật.
+
+Chạy (từ thư mục `ai_services`):
+    python -m app.Vison.benchmark_models --images path/to/images \\
+        --models app/Vison/Yolo_Model/best.onnx app/Vison/Yolo_Model/best.int8.onnx
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ..config import paths
+from .ort_session import SessionConfig
+from .quantize_model import list_images
+from .yolo_service import YoloIngredientService
+
+
+def iou(a, b) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match(predicted: list[dict], reference: list[dict], iou_threshold: float = 0.5) -> int:
+    """
+    Số detection khớp (greedy theo confidence, cùng class, IoU >= ngưỡng).
+    """
+    used = set()
+    matched = 0
+    for p in sorted(predicted, key=lambda d: -d.get("confidence", 1.0)):
+        best, best_iou = None, iou_threshold
+        for j, r in enumerate(reference):
+            if j in used or r["raw_label"] != p["raw_label"]:
+                continue
+            score = iou(p["box"], r["box"])
+            if score >= best_iou:
+                best, best_iou = j, score
+        if best is not None:
+            used.add(best)
+            matched += 1
+    return matched
+
+
+def load_labels(label_path: Path, class_names: list[str], width: int, height: int) -> list[dict]:
+    """
+    Đọc nhãn YOLO txt (class cx cy w h, chuẩn hóa 0..1) thành box pixel.
+    """
+    if not label_path.exists():
+        return []
+    labels = []
+    for line in label_path.read_text().splitlines():
+        parts = line.split()
+        if len(parts) < 5:
+            continue
+        class_id, cx, cy, w, h = int(parts[0]), *map(float, parts[1:5])
+        labels.append({
+            "raw_label": class_names[class_id],
+            "box": [(cx - w / 2) * width, (cy - h / 2) * height, (cx + w / 2) * width, (cy + h / 2) * height]
+        })
+    return labels
+
+
+def run_model(service: YoloIngredientService, images: list[bytes], warmup: int = 3) -> tuple[list, dict]:
+    for data in images[:warmup]:
+        service.detect_objects(data)
+
+    detections, pre_ms, infer_ms = [], [], []
+    for data in images:
+        t = time.perf_counter()
+        prepared = service._prepare(data)
+        pre_ms.append((time.perf_counter() - t) * 1000)
+
+        t = time.perf_counter()
+        pred = service._infer([prepared])[0]
+        infer_ms.append((time.perf_counter() - t) * 1000)
+        detections.append(service._to_detections(pred, prepared.info))
+
+    return detections, {
+        "preprocess_ms": float(np.median(pre_ms)),
+        "infer_ms_p50": float(np.median(infer_ms)),
+        "infer_ms_p95": float(np.percentile(infer_ms, 95)),
+    }
+
+
+def score(predicted: list[list[dict]], reference: list[list[dict]]) -> dict:
+    tp = sum(match(p, r) for p, r in zip(predicted, reference))
+    n_pred = sum(len(p) for p in predicted)
+    n_ref = sum(len(r) for r in reference)
+    precision = tp / n_pred if n_pred else 1.0
+    recall = tp / n_ref if n_ref else 1.0
+    same_set = sum(
+        {d["raw_label"] for d in p} == {d["raw_label"] for d in r}
+        for p, r in zip(predicted, reference)
+    )
+    return {
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "same_ingredients": same_set / len(reference) if reference else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare YOLO model variants: accuracy vs latency")
+    parser.add_argument("--images", required=True, help="Thư mục ảnh")
+    parser.add_argument("--labels", help="Thư mục nhãn YOLO txt (mặc định: so với model đầu tiên)")
+    parser.add_argument("--models", nargs="+", default=[str(paths.YOLO_MODEL_PATH), str(paths.YOLO_INT8_MODEL_PATH)])
+    parser.add_argument("--max-images", type=int, default=200)
+    parser.add_argument("--intra-op-threads", type=int, default=0)
+    parser.add_argument("--graph-opt-level", default="all")
+    parser.add_argument("--providers", default="CPUExecutionProvider")
+    args = parser.parse_args()
+
+    image_paths = list_images(args.images, args.max_images)
+    if not image_paths:
+        raise SystemExit(f"No images found in {args.images}")
+    images = [p.read_bytes() for p in image_paths]
+
+    session_config = SessionConfig(
+        intra_op_threads=args.intra_op_threads,
+        graph_opt_level=args.graph_opt_level,
+        providers=args.providers.split(","),
+        cache_dir=None
+    )
+
+    results = {}
+    for model_path in args.models:
+        service = YoloIngredientService(model_path=model_path, session_config=session_config)
+        results[model_path] = run_model(service, images)
+
+    if args.labels:
+        reference = []
+        class_names = service.class_names
+        for path in image_paths:
+            prepared = service._prepare(path.read_bytes())
+            reference.append(load_labels(
+                Path(args.labels) / f"{path.stem}.txt", class_names, prepared.info.orig_w, prepared.info.orig_h
+            ))
+        reference_name = "labels"
+    else:
+        reference = results[args.models[0]][0]
+        reference_name = Path(args.models[0]).name
+
+    print(f"{len(images)} images, reference = {reference_name}")
+    header = f"{'model':<28}{'size MB':>9}{'pre ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'prec':>7}{'recall':>8}{'F1':>7}{'same':>7}"
+    print(header)
+    print("-" * len(header))
+    for model_path, (detections, latency) in results.items():
+        acc = score(detections, reference)
+        print(
+            f"{Path(model_path).name[-28:]:<28}{Path(model_path).stat().st_size / 2**20:>9.1f}"
+            f"{latency['preprocess_ms']:>9.1f}{latency['infer_ms_p50']:>9.1f}{latency['infer_ms_p95']:>9.1f}"
+            f"{acc['precision']:>7.3f}{acc['recall']:>8.3f}{acc['f1']:>7.3f}{acc['same_ingredients']:>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
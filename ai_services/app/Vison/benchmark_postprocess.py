@@ -0,0 +1,110 @@
+"""
+Module: Yolo Postprocess Benchmark
+================================
+
+So sánh thời gian hậu xử lý output YOLO giữa:
+- Legacy: vòng lặp Python qua từng anchor + cv2.dnn.NMSBoxes.
+- Vectorized: `postprocess_predictions` (argmax/mask/NMS bằng NumPy).
+
+Chạy (từ thư mục `ai_services`):
+    python -m app.Vison.benchmark_postprocess --anchors 8400 --classes 48 --repeat 50
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from .yolo_service import postprocess_predictions
+
+
+def legacy_postprocess(predictions, conf_threshold: float, iou_threshold: float):
+    """
+    Bản sao của đường xử lý cũ trong `detect_objects`, giữ lại để đối chiếu.
+    """
+    if predictions.ndim == 3:
+        predictions = predictions[0]
+
+    predictions = predictions.transpose()
+
+    boxes = []
+    confidences = []
+    class_ids = []
+
+    for pred in predictions:
+        scores = pred[4:]
+        class_id = np.argmax(scores)
+        confidence = scores[class_id]
+
+        if confidence >= conf_threshold:
+            cx, cy, w, h = pred[0], pred[1], pred[2], pred[3]
+            boxes.append([cx - w / 2, cy - h / 2, w, h])
+            confidences.append(float(confidence))
+            class_ids.append(class_id)
+
+    indices = cv2.dnn.NMSBoxes(boxes, confidences, conf_threshold, iou_threshold)
+    if len(indices) == 0:
+        return []
+    return [(int(class_ids[i]), confidences[i]) for i in np.asarray(indices).flatten()]
+
+
+def make_synthetic_output(num_anchors: int, num_classes: int, num_objects: int, seed: int = 0):
+    """
+    Sinh tensor output giả lập (1, 4 + C, N) giống YOLOv8: phần lớn anchor có score thấp,
+    một số cụm anchor quanh `num_objects` vật thể có score cao.
+    """
+    rng = np.random.default_rng(seed)
+    out = np.empty((1, 4 + num_classes, num_anchors), dtype=np.float32)
+    pred = out[0]
+    pred[0:2] = rng.uniform(0, 640, size=(2, num_anchors))
+    pred[2:4] = rng.uniform(10, 120, size=(2, num_anchors))
+    pred[4:] = rng.uniform(0, 0.3, size=(num_classes, num_anchors))
+
+    for _ in range(num_objects):
+        cls = rng.integers(num_classes)
+        cx, cy = rng.uniform(60, 580, size=2)
+        members = rng.choice(num_anchors, size=20, replace=False)
+        pred[0, members] = cx + rng.normal(0, 3, size=20)
+        pred[1, members] = cy + rng.normal(0, 3, size=20)
+        pred[2:4, members] = 80 + rng.normal(0, 4, size=(2, 20))
+        pred[4 + cls, members] = rng.uniform(0.55, 0.95, size=20)
+
+    return out
+
+
+def _time(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO postprocess (legacy vs vectorized)")
+    parser.add_argument("--anchors", type=int, default=8400)
+    parser.add_argument("--classes", type=int, default=48)
+    parser.add_argument("--objects", type=int, default=6)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    predictions = make_synthetic_output(args.anchors, args.classes, args.objects)
+
+    legacy = legacy_postprocess(predictions, args.conf, args.iou)
+    _, confidences, class_ids = postprocess_predictions(predictions, args.conf, args.iou)
+    print(f"Legacy detections: {len(legacy)} | Vectorized detections: {len(confidences)}")
+    print(f"Legacy classes:     {sorted(set(c for c, _ in legacy))}")
+    print(f"Vectorized classes: {sorted(set(class_ids.tolist()))}")
+
+    legacy_ms = _time(lambda: legacy_postprocess(predictions, args.conf, args.iou), args.repeat)
+    vector_ms = _time(lambda: postprocess_predictions(predictions, args.conf, args.iou), args.repeat)
+
+    print(f"Legacy:     {legacy_ms:8.3f} ms/call")
+    print(f"Vectorized: {vector_ms:8.3f} ms/call")
+    print(f"Speedup:    {legacy_ms / vector_ms:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Module: Yolo Preprocess Benchmark
+===============================
+
+So sánh thời gian và bộ nhớ đỉnh của từng bước tiền xử lý cho ảnh cỡ điện thoại:
+- Legacy: decode full-size + stretch-resize + flip/astype/transpose/expand_dims.
+- Fast: decode giảm độ phân giải + letterbox + ghi vào buffer NCHW dùng lại (preprocess.py).
+
+Bộ nhớ đỉnh đo bằng tracemalloc (ảnh NumPy/OpenCV đều được cấp phát qua allocator của NumPy).
+
+Chạy (từ thư mục `ai_services`):
+    python -m app.Vison.benchmark_preprocess --sizes 4032x3024 4000x3000 1920x1080 --repeat 10
+    python -m app.Vison.benchmark_preprocess --images path/to/photos/*.jpg
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from .preprocess import TensorBuffer, decode_image, letterbox, write_nchw
+
+
+def legacy_preprocess(image_bytes: bytes, input_size: int):
+    """
+    Bản sao của đường xử lý cũ (`_decode` + `_preprocess`), giữ lại để đối chiếu.
+    """
+    timings = {}
+    t = time.perf_counter()
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    timings["decode"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    img = cv2.resize(image, (input_size, input_size))
+    timings["resize"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    img = img[:, :, ::-1]
+    img = img.astype(np.float32) / 255.0
+    img = np.transpose(img, (2, 0, 1))
+    img = np.expand_dims(img, axis=0)
+    timings["tensor"] = time.perf_counter() - t
+    return img, timings
+
+
+def fast_preprocess(image_bytes: bytes, input_size: int, buffers: TensorBuffer):
+    timings = {}
+    t = time.perf_counter()
+    image, orig_size = decode_image(image_bytes, input_size)
+    timings["decode"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    prepared = letterbox(image, input_size, orig_size)
+    timings["resize"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    batch = buffers.get(1)
+    write_nchw([prepared.canvas], batch)
+    timings["tensor"] = time.perf_counter() - t
+    return batch, timings
+
+
+def make_phone_jpeg(width: int, height: int, quality: int = 90, seed: int = 0) -> bytes:
+    """
+    Sinh JPEG giả lập ảnh chụp: gradient + vài khối màu + nhiễu (nén gần giống ảnh thật hơn nhiễu thuần).
+    """
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:, :, 0] = (x * 0.6 + y * 0.4).astype(np.uint8)
+    image[:, :, 1] = (x * 0.3 + y * 0.2 + 40).astype(np.uint8)
+    image[:, :, 2] = (255 - x * 0.5).astype(np.uint8)
+    for _ in range(12):
+        cx, cy = rng.integers(0, width), rng.integers(0, height)
+        radius = int(rng.integers(min(width, height) // 20, min(width, height) // 6))
+        color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+        cv2.circle(image, (int(cx), int(cy)), radius, color, -1)
+    image = cv2.add(image, rng.integers(0, 12, size=image.shape, dtype=np.uint8))
+
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("JPEG encode failed")
+    return encoded.tobytes()
+
+
+def measure(fn, image_bytes: bytes, repeat: int) -> dict:
+    # Warmup: buffer dùng lại được cấp phát ở lần đầu
+    fn(image_bytes)
+
+    stages = {}
+    for _ in range(repeat):
+        _, timings = fn(image_bytes)
+        for stage, seconds in timings.items():
+            stages.setdefault(stage, []).append(seconds)
+
+    tracemalloc.start()
+    fn(image_bytes)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {stage: float(np.median(values)) * 1000 for stage, values in stages.items()}
+    result["total"] = sum(result.values())
+    result["peak_mb"] = peak / 2**20
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO preprocessing")
+    parser.add_argument("--sizes", nargs="*", default=["4032x3024", "4000x3000", "3024x4032", "1920x1080"])
+    parser.add_argument("--images", nargs="*", default=[], help="Ảnh thật thay cho ảnh sinh")
+    parser.add_argument("--input-size", type=int, default=640)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.images:
+        samples = []
+        for path in args.images:
+            with open(path, "rb") as f:
+                samples.append((path, f.read()))
+    else:
+        samples = []
+        for size in args.sizes:
+            width, height = (int(v) for v in size.split("x"))
+            samples.append((size, make_phone_jpeg(width, height)))
+
+    buffers = TensorBuffer(args.input_size)
+    header = f"{'image':<20}{'path':<8}{'decode':>9}{'resize':>9}{'tensor':>9}{'total':>9}{'peak MB':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, data in samples:
+        legacy = measure(lambda b: legacy_preprocess(b, args.input_size), data, args.repeat)
+        fast = measure(lambda b: fast_preprocess(b, args.input_size, buffers), data, args.repeat)
+        for label, r in (("legacy", legacy), ("fast", fast)):
+            print(
+                f"{name[-20:]:<20}{label:<8}{r['decode']:>8.1f}ms{r['resize']:>7.1f}ms"
+                f"{r['tensor']:>7.1f}ms{r['total']:>7.1f}ms{r['peak_mb']:>10.1f}"
+            )
+        print(f"{'':<20}speedup x{legacy['total'] / fast['total']:.1f}, peak memory x{legacy['peak_mb'] / max(fast['peak_mb'], 1e-6):.1f} lower")
+
+
+if __name__ == "__main__":
+    main()
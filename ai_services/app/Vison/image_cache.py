@@ -0,0 +1,181 @@
+"""
+Module: Image Result Cache
+========================
+
+Cache kết quả nhận diện (và tùy chọn kết quả retrieval) theo ảnh, đặt trước YOLO:
+
+1. Exact: SHA-256 của bytes ảnh -> ảnh gửi lại y hệt.
+2. Near-duplicate: pHash 64 bit (DCT 32x32 của ảnh xám, decode ở 1/8 độ phân giải với JPEG) ->
+   ảnh chụp lại / nén lại gần giống, khoảng cách Hamming <= `max_distance`.
+
+Khi trúng near-duplicate, box được co giãn theo kích thước của ảnh mới.
+Giới hạn bộ nhớ (bytes + số phần tử) và TTL dùng `TTLLRUCache`; `stats()` trả về hit rate.
+"""
+
+import copy
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from ..cache import TTLLRUCache, estimate_size
+from .preprocess import jpeg_size
+
+PHASH_SIZE = 32
+PHASH_BITS = 8
+
+
+@dataclass
+class ImageFingerprint:
+    digest: str
+    phash: int
+    size: tuple[int, int]
+
+
+@dataclass
+class CachedResult:
+    vision: dict
+    recipes: list | None
+    match: str
+    distance: int
+
+
+def phash(gray: np.ndarray) -> int:
+    """
+    Perceptual hash 64 bit: DCT của ảnh 32x32, lấy khối tần số thấp 8x8 (bỏ DC) so với median.
+    """
+    small = cv2.resize(gray, (PHASH_SIZE, PHASH_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:PHASH_BITS, :PHASH_BITS].flatten()
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def fingerprint(image_bytes: bytes) -> ImageFingerprint:
+    """
+    SHA-256 + pHash + kích thước (width, height) ảnh gốc sau khi xoay theo EXIF.
+    """
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    size = jpeg_size(image_bytes)
+    # JPEG: decode 1/8 đủ cho ảnh 32x32 và rẻ hơn nhiều so với decode đầy đủ
+    flag = cv2.IMREAD_REDUCED_GRAYSCALE_8 if size and min(size) >= 8 * PHASH_SIZE else cv2.IMREAD_GRAYSCALE
+    gray = cv2.imdecode(nparr, flag)
+    if gray is None:
+        raise ValueError("Could not decode image bytes")
+
+    h, w = gray.shape[:2]
+    if size is None:
+        size = (w, h)
+    elif (size[0] > size[1]) != (w > h) and size[0] != size[1]:
+        size = (size[1], size[0])
+
+    return ImageFingerprint(
+        digest=hashlib.sha256(image_bytes).hexdigest(),
+        phash=phash(gray),
+        size=size
+    )
+
+
+def rescale_vision(vision: dict, from_size: tuple[int, int], to_size: tuple[int, int]) -> dict:
+    """
+    Bản sao của kết quả vision với box co giãn từ ảnh đã cache sang ảnh mới.
+    """
+    vision = copy.deepcopy(vision)
+    if from_size == to_size:
+        return vision
+    sx = to_size[0] / from_size[0]
+    sy = to_size[1] / from_size[1]
+    for d in vision.get("detections", []):
+        x1, y1, x2, y2 = d["box"]
+        d["box"] = [round(x1 * sx, 1), round(y1 * sy, 1), round(x2 * sx, 1), round(y2 * sy, 1)]
+    return vision
+
+
+class ImageResultCache:
+    """
+    Args:
+        max_items (int): Số ảnh tối đa.
+        max_bytes (int): Tổng kích thước ước lượng tối đa của các kết quả.
+        ttl (float): Thời gian sống (giây).
+        max_distance (int): Ngưỡng Hamming (0..64) để coi là near-duplicate; 0 = chỉ exact.
+        cache_retrieval (bool): Lưu cả danh sách công thức đã retrieve.
+    """
+    def __init__(self, max_items: int = 512, max_bytes: int = 32 * 2**20, ttl: float = 600.0,
+                 max_distance: int = 6, cache_retrieval: bool = True):
+        self.cache = TTLLRUCache(max_bytes=max_bytes, max_items=max_items, ttl=ttl, sizeof=self._sizeof)
+        self.max_distance = max_distance
+        self.cache_retrieval = cache_retrieval
+
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.fingerprint_seconds = 0.0
+
+    @staticmethod
+    def _sizeof(entry: dict) -> int:
+        return estimate_size(entry["vision"]) + estimate_size(entry["recipes"]) + 64
+
+    def lookup(self, image_bytes: bytes) -> tuple[CachedResult | None, ImageFingerprint]:
+        """
+        Tìm kết quả đã cache cho ảnh. Luôn trả về fingerprint để dùng lại khi `store`.
+        """
+        start = time.perf_counter()
+        fp = fingerprint(image_bytes)
+        elapsed = time.perf_counter() - start
+
+        entry = self.cache.get(fp.digest)
+        match, distance = "exact", 0
+        if entry is None and self.max_distance > 0:
+            best_key, distance = None, self.max_distance + 1
+            for key, candidate in self.cache.items():
+                d = (candidate["phash"] ^ fp.phash).bit_count()
+                if d < distance:
+                    best_key, distance = key, d
+            if best_key is not None:
+                entry = self.cache.get(best_key)
+                match = "near"
+
+        with self._lock:
+            self.fingerprint_seconds += elapsed
+            if entry is None:
+                self.misses += 1
+            elif match == "exact":
+                self.exact_hits += 1
+            else:
+                self.near_hits += 1
+
+        if entry is None:
+            return None, fp
+        return CachedResult(
+            vision=rescale_vision(entry["vision"], entry["size"], fp.size),
+            recipes=copy.deepcopy(entry["recipes"]),
+            match=match,
+            distance=distance
+        ), fp
+
+    def store(self, fp: ImageFingerprint, vision: dict, recipes: list | None = None):
+        self.cache.set(fp.digest, {
+            "phash": fp.phash,
+            "size": fp.size,
+            "vision": copy.deepcopy(vision),
+            "recipes": copy.deepcopy(recipes) if self.cache_retrieval else None,
+        })
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            hits = self.exact_hits + self.near_hits
+            return {
+                "lookups": lookups,
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "avg_fingerprint_ms": self.fingerprint_seconds / lookups * 1000 if lookups else 0.0,
+                "max_distance": self.max_distance,
+                "cache_retrieval": self.cache_retrieval,
+                "storage": self.cache.stats(),
+            }
@@ -0,0 +1,172 @@
+"""
+Module: Yolo Micro-Batcher
+========================
+
+Gom các request nhận diện đến gần nhau về thời gian thành một batch duy nhất
+trước khi gọi ONNX session.
+
+Cơ chế:
+1. Caller decode + letterbox ảnh ngay trên thread của mình (song song giữa các request).
+2. Tensor được đưa vào hàng đợi; worker thread chờ tối đa `window_ms` kể từ request đầu tiên
+   hoặc đến khi đủ `max_batch` request.
+3. Worker ghi batch vào buffer NCHW riêng của nó, chạy một lần `session.run` cho cả batch và trả detections về Future của từng caller.
+
+Metrics (`stats()`): độ sâu hàng đợi, histogram kích thước batch, thời gian chờ trong hàng đợi.
+"""
+
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+
+class _PendingRequest:
+    __slots__ = ("prepared", "future", "enqueued_at")
+
+    def __init__(self, prepared, future: Future, enqueued_at: float):
+        self.prepared = prepared
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+
+class YoloMicroBatcher:
+    """
+    Micro-batching scheduler đặt trước `YoloIngredientService`.
+    """
+    def __init__(
+        self,
+        yolo_service,
+        window_ms: float = 10.0,
+        max_batch: int = 8,
+        latency_samples: int = 2048
+    ):
+        self.yolo = yolo_service
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._wait_times = deque(maxlen=latency_samples)
+        self._closed = False
+        # Giữ khi kiểm tra `_closed` + đưa vào hàng đợi, để không request nào lọt vào sau sentinel của `close`
+        self._submit_lock = threading.Lock()
+
+        self._worker = threading.Thread(target=self._loop, name="yolo-micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, image_bytes: bytes) -> Future:
+        """
+        Đưa một ảnh vào hàng đợi. Lỗi decode được raise ngay trên thread gọi.
+        """
+        if self._closed:
+            raise RuntimeError("Micro-batcher is closed")
+
+        prepared = self.yolo._prepare(image_bytes)
+        future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("Micro-batcher is closed")
+            self._queue.put(_PendingRequest(prepared, future, time.perf_counter()))
+        return future
+
+    def detect_objects(self, image_bytes: bytes, timeout: float | None = None) -> list[dict]:
+        return self.submit(image_bytes).result(timeout)
+
+    def detect_ingredients(self, image_bytes: bytes, timeout: float | None = None) -> list[str]:
+        return self.yolo.normalize_ingredients(self.detect_objects(image_bytes, timeout))
+
+    def close(self):
+        """
+        Dừng worker sau khi xử lý hết các request đang chờ. Request còn lại trong hàng đợi khi worker
+        không dừng kịp bị báo lỗi, không để caller chờ mãi.
+        """
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join(timeout=5)
+
+        while True:
+            try:
+                req = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if req is not None and req.future.set_running_or_notify_cancel():
+                req.future.set_exception(RuntimeError("Micro-batcher is closed"))
+        if self._worker.is_alive():
+            # Sentinel có thể vừa bị lấy ra cùng các request: đặt lại để worker dừng sau batch hiện tại
+            self._queue.put(None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            histogram = dict(sorted(self._batch_sizes.items()))
+            waits = sorted(self._wait_times)
+
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "queue_depth": self._queue.qsize(),
+            "batches": sum(histogram.values()),
+            "batch_size_histogram": histogram,
+            "wait_ms": {
+                "avg": sum(waits) / len(waits) * 1000 if waits else 0.0,
+                "p50": _percentile(waits, 0.50) * 1000,
+                "p99": _percentile(waits, 0.99) * 1000,
+                "max": waits[-1] * 1000 if waits else 0.0,
+            },
+        }
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            stop = False
+            deadline = first.enqueued_at + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    # Hết cửa sổ: vẫn gom các request đã nằm sẵn trong hàng đợi, không chờ thêm
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._run(batch)
+            if stop:
+                return
+
+    def _run(self, batch: list[_PendingRequest]):
+        # Bỏ các request caller đã hủy (ví dụ hết timeout của stage vision trên luồng async)
+        batch = [req for req in batch if req.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        with self._lock:
+            self._batch_sizes[len(batch)] += 1
+            self._wait_times.extend(started - req.enqueued_at for req in batch)
+
+        try:
+            predictions = self.yolo._infer([req.prepared for req in batch])
+            for req, pred in zip(batch, predictions):
+                req.future.set_result(self.yolo._to_detections(pred, req.prepared.info))
+        except Exception as e:
+            for req in batch:
+                if not req.future.done():
+                    req.future.set_exception(e)
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
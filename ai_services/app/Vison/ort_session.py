@@ -0,0 +1,131 @@
+"""
+Module: ONNX Runtime Session
+==========================
+
+Tạo `ort.InferenceSession` cho YOLO với `SessionOptions` cấu hình được qua biến môi trường:
+
+    YOLO_INTRA_OP_THREADS   Số thread trong một operator (0 = mặc định của ORT)
+    YOLO_INTER_OP_THREADS   Số thread giữa các operator (chỉ có tác dụng với execution mode parallel)
+    YOLO_EXECUTION_MODE     sequential | parallel
+    YOLO_GRAPH_OPT_LEVEL    disable | basic | extended | all
+    YOLO_PROVIDERS          Danh sách execution provider, cách nhau dấu phẩy
+    YOLO_ORT_CACHE_DIR      Thư mục cache model đã tối ưu (rỗng = tắt)
+
+Cache model đã tối ưu: lần đầu ORT ghi graph sau tối ưu ra `YOLO_ORT_CACHE_DIR`, các lần sau
+load thẳng file đó với optimization tắt nên startup không phải tối ưu lại. Tên file gồm hash của
+model gốc, mức tối ưu và provider -> đổi model/cấu hình sẽ tự tạo cache mới. Với mức "all", graph
+đã tối ưu có thể chứa kernel riêng cho CPU hiện tại, nên cache chỉ dùng trên chính máy đó (không commit).
+"""
+
+import hashlib
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import onnxruntime as ort
+
+from ..config import paths
+
+logger = logging.getLogger(__name__)
+
+GRAPH_OPT_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+
+@dataclass
+class SessionConfig:
+    intra_op_threads: int = 0
+    inter_op_threads: int = 0
+    execution_mode: str = "sequential"
+    graph_opt_level: str = "all"
+    providers: list[str] = field(default_factory=lambda: ["CUDAExecutionProvider", "CPUExecutionProvider"])
+    cache_dir: str | None = None
+
+    @classmethod
+    def from_env(cls) -> "SessionConfig":
+        providers = os.getenv("YOLO_PROVIDERS")
+        return cls(
+            intra_op_threads=int(os.getenv("YOLO_INTRA_OP_THREADS", "0")),
+            inter_op_threads=int(os.getenv("YOLO_INTER_OP_THREADS", "0")),
+            execution_mode=os.getenv("YOLO_EXECUTION_MODE", "sequential"),
+            graph_opt_level=os.getenv("YOLO_GRAPH_OPT_LEVEL", "all"),
+            providers=(
+                [p.strip() for p in providers.split(",") if p.strip()]
+                if providers else cls().providers
+            ),
+            cache_dir=os.getenv("YOLO_ORT_CACHE_DIR", str(paths.YOLO_ORT_CACHE_DIR)) or None
+        )
+
+    def available_providers(self) -> list[str]:
+        available = set(ort.get_available_providers())
+        return [p for p in self.providers if p in available] or ["CPUExecutionProvider"]
+
+
+def build_session_options(config: SessionConfig, graph_opt_level: str | None = None) -> ort.SessionOptions:
+    if config.execution_mode not in EXECUTION_MODES:
+        raise ValueError(f"Unknown YOLO_EXECUTION_MODE: {config.execution_mode}")
+    level = graph_opt_level or config.graph_opt_level
+    if level not in GRAPH_OPT_LEVELS:
+        raise ValueError(f"Unknown YOLO_GRAPH_OPT_LEVEL: {level}")
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = config.intra_op_threads
+    options.inter_op_num_threads = config.inter_op_threads
+    options.execution_mode = EXECUTION_MODES[config.execution_mode]
+    options.graph_optimization_level = GRAPH_OPT_LEVELS[level]
+    return options
+
+
+def optimized_model_path(model_path, config: SessionConfig, providers: list[str]) -> Path:
+    """
+    Đường dẫn cache của model đã tối ưu, duy nhất theo (nội dung model, mức tối ưu, providers).
+    """
+    digest = hashlib.sha1()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    provider_tag = "-".join(p.replace("ExecutionProvider", "").lower() for p in providers)
+    name = f"{Path(model_path).stem}.{digest.hexdigest()[:12]}.{config.graph_opt_level}.{provider_tag}.onnx"
+    return Path(config.cache_dir) / name
+
+
+def create_session(model_path, config: SessionConfig | None = None) -> ort.InferenceSession:
+    """
+    Tạo InferenceSession theo `config`, dùng/ghi cache model đã tối ưu nếu bật.
+    """
+    config = config or SessionConfig.from_env()
+    providers = config.available_providers()
+
+    if not config.cache_dir or config.graph_opt_level == "disable":
+        return ort.InferenceSession(
+            str(model_path), sess_options=build_session_options(config), providers=providers
+        )
+
+    cached = optimized_model_path(model_path, config, providers)
+    if cached.exists():
+        try:
+            session = ort.InferenceSession(
+                str(cached), sess_options=build_session_options(config, "disable"), providers=providers
+            )
+            logger.info(f"Loaded optimized YOLO model from cache: {cached}")
+            return session
+        except Exception as e:
+            logger.warning(f"Optimized model cache unusable ({e}), rebuilding.")
+            cached.unlink(missing_ok=True)
+
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    options = build_session_options(config)
+    options.optimized_model_filepath = str(cached)
+    session = ort.InferenceSession(str(model_path), sess_options=options, providers=providers)
+    logger.info(f"Saved optimized YOLO model to cache: {cached}")
+    return session
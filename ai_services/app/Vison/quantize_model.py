@@ -0,0 +1,185 @@
+"""
+Module: YOLO INT8 Quantization
+============================
+
+Lượng tử hóa offline `best.onnx` -> `best.int8.onnx` (ONNX Runtime quantization).
+
+- Static (mặc định): calibration trên thư mục ảnh thật, qua đúng pipeline tiền xử lý của service
+  (decode giảm độ phân giải + letterbox), định dạng QDQ, weight INT8 per-channel.
+- Dynamic (`--dynamic`): không cần ảnh, chỉ lượng tử hóa weight; nhanh nhưng ít lợi hơn cho Conv.
+
+Phần đuôi của Detect head (chuỗi op không phải Conv từ output ngược lên: decode box/DFL, Concat,
+Sigmoid...) được giữ FP32, vì output gộp cả tọa độ pixel (0..640) lẫn xác suất (0..1) vào một tensor:
+một scale INT8 chung cho cả hai làm mất gần hết độ phân giải của confidence.
+
+Chạy (từ thư mục `ai_services`):
+    python -m app.Vison.quantize_model --calib-dir path/to/images --max-images 200
+    python -m app.Vison.benchmark_models --images path/to/images   # so sánh độ chính xác / độ trễ
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import onnx
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    CalibrationMethod,
+    QuantFormat,
+    QuantType,
+    quantize_dynamic,
+    quantize_static,
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from ..config import paths
+from .preprocess import decode_image, letterbox, write_nchw
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+CALIBRATION_METHODS = {
+    "minmax": CalibrationMethod.MinMax,
+    "entropy": CalibrationMethod.Entropy,
+    "percentile": CalibrationMethod.Percentile,
+}
+
+
+def list_images(directory, limit: int | None = None) -> list[Path]:
+    images = sorted(p for p in Path(directory).rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    return images[:limit] if limit else images
+
+
+class ImageCalibrationReader(CalibrationDataReader):
+    """
+    Cấp từng batch ảnh calibration đã tiền xử lý giống lúc inference.
+    """
+    def __init__(self, model_path, images: list[Path]):
+        model = onnx.load(str(model_path), load_external_data=False)
+        graph_input = model.graph.input[0]
+        dims = graph_input.type.tensor_type.shape.dim
+        self.input_name = graph_input.name
+        self.batch_size = dims[0].dim_value or 1
+        self.input_size = dims[2].dim_value or 640
+        self.images = images
+        self._position = 0
+
+    def get_next(self):
+        if self._position >= len(self.images):
+            return None
+        chunk = self.images[self._position:self._position + self.batch_size]
+        self._position += self.batch_size
+
+        canvases = []
+        for path in chunk:
+            image, orig_size = decode_image(path.read_bytes(), self.input_size)
+            canvases.append(letterbox(image, self.input_size, orig_size).canvas)
+        batch = np.zeros((self.batch_size, 3, self.input_size, self.input_size), dtype=np.float32)
+        write_nchw(canvases, batch)
+        return {self.input_name: batch}
+
+    def rewind(self):
+        self._position = 0
+
+
+def head_tail_nodes(model_path) -> list[str]:
+    """
+    Tên các node không phải Conv nằm giữa output của graph và lớp Conv cuối cùng.
+    """
+    model = onnx.load(str(model_path), load_external_data=False)
+    producer = {output: node for node in model.graph.node for output in node.output}
+
+    excluded = []
+    seen = set()
+    stack = [output.name for output in model.graph.output]
+    while stack:
+        node = producer.get(stack.pop())
+        if node is None or id(node) in seen or node.op_type == "Conv":
+            continue
+        seen.add(id(node))
+        if node.name:
+            excluded.append(node.name)
+        stack.extend(node.input)
+    return excluded
+
+
+def quantize(model_path, output_path, calib_dir=None, max_images: int = 200, dynamic: bool = False,
+             per_channel: bool = True, method: str = "minmax", keep_head_fp32: bool = True) -> dict:
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Shape inference + fold các node hằng trước khi lượng tử hóa
+        prepared = Path(tmp) / "prepared.onnx"
+        quant_pre_process(str(model_path), str(prepared), skip_symbolic_shape=True)
+
+        excluded = head_tail_nodes(prepared) if keep_head_fp32 else []
+        if dynamic:
+            quantize_dynamic(
+                str(prepared), str(output_path),
+                per_channel=per_channel,
+                weight_type=QuantType.QInt8,
+                nodes_to_exclude=excluded
+            )
+            calibrated = 0
+        else:
+            if not calib_dir:
+                raise ValueError("Static quantization needs --calib-dir (or use --dynamic)")
+            images = list_images(calib_dir, max_images)
+            if not images:
+                raise ValueError(f"No calibration images found in {calib_dir}")
+            quantize_static(
+                str(prepared), str(output_path),
+                ImageCalibrationReader(prepared, images),
+                quant_format=QuantFormat.QDQ,
+                per_channel=per_channel,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                calibrate_method=CALIBRATION_METHODS[method],
+                nodes_to_exclude=excluded
+            )
+            calibrated = len(images)
+
+    return {
+        "output": str(output_path),
+        "mode": "dynamic" if dynamic else f"static/{method}",
+        "calibration_images": calibrated,
+        "fp32_nodes_kept": len(excluded),
+        "size_mb": {
+            "fp32": Path(model_path).stat().st_size / 2**20,
+            "int8": Path(output_path).stat().st_size / 2**20,
+        },
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the YOLO ONNX model to INT8")
+    parser.add_argument("--model", default=str(paths.YOLO_MODEL_PATH))
+    parser.add_argument("--output", default=str(paths.YOLO_INT8_MODEL_PATH))
+    parser.add_argument("--calib-dir", help="Thư mục ảnh calibration (static quantization)")
+    parser.add_argument("--max-images", type=int, default=200)
+    parser.add_argument("--dynamic", action="store_true", help="Dynamic quantization (không cần ảnh)")
+    parser.add_argument("--method", choices=sorted(CALIBRATION_METHODS), default="minmax")
+    parser.add_argument("--per-tensor", action="store_true", help="Weight per-tensor thay vì per-channel")
+    parser.add_argument("--quantize-head", action="store_true", help="Lượng tử hóa cả phần đuôi Detect head")
+    args = parser.parse_args()
+
+    report = quantize(
+        args.model, args.output,
+        calib_dir=args.calib_dir,
+        max_images=args.max_images,
+        dynamic=args.dynamic,
+        per_channel=not args.per_tensor,
+        method=args.method,
+        keep_head_fp32=not args.quantize_head
+    )
+    print(
+        f"Saved {report['output']} ({report['mode']}, {report['calibration_images']} calibration images, "
+        f"{report['fp32_nodes_kept']} head nodes kept FP32) "
+        f"{report['size_mb']['fp32']:.1f}MB -> {report['size_mb']['int8']:.1f}MB in {report['seconds']:.1f}s"
+    )
+    print("Dùng model INT8: YOLO_QUANTIZED=1 (hoặc YOLO_MODEL_PATH=...)")
+
+
+if __name__ == "__main__":
+    main()
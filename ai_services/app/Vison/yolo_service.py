@@ -5,18 +5,137 @@ Module: Yolo Ingredient Service
 Dịch vụ nhận diện nguyên liệu sử dụng mô hình YOLO (ONNX Runtime).
 
 Quy trình xử lý (Pipeline):
-1. Preprocess: Resize và chuẩn hóa ảnh đầu vào.
+1. Preprocess: Decode (giảm độ phân giải với JPEG lớn), letterbox và ghi vào buffer NCHW dùng lại
+   (xem preprocess.py).
 2. Inference: Chạy model ONNX để detect object.
 3. Postprocess: Lọc ngưỡng confidence và NMS (nếu cần).
 4. Normalization: Ánh xạ nhãn (label) sang tiếng Việt chuẩn.
 """
 
-import cv2
+import os
+
 import numpy as np
-import onnxruntime as ort
 import yaml
 from ..config import YOLO_CLASS_TO_VI
 from .. import config
+from .ort_session import SessionConfig, create_session
+from .preprocess import LetterboxInfo, PreparedImage, TensorBuffer, decode_image, letterbox, write_nchw
+
+
+def postprocess_predictions(predictions, conf_threshold: float, iou_threshold: float):
+    """
+    Hậu xử lý output YOLOv8 bằng các phép toán mảng (không lặp từng anchor).
+
+    Args:
+        predictions (np.ndarray): Output thô dạng (1, 4 + C, N) hoặc (4 + C, N).
+        conf_threshold (float): Ngưỡng confidence.
+        iou_threshold (float): Ngưỡng IoU cho NMS.
+
+    Returns:
+        tuple: (boxes [K, 4] dạng x, y, w, h; confidences [K]; class_ids [K]),
+        đã sắp xếp theo confidence giảm dần.
+    """
+    if predictions.ndim == 3:
+        predictions = predictions[0]
+
+    # Layout (4 + C, N): argmax theo trục class, không cần transpose cả ma trận
+    scores = predictions[4:]
+    class_ids = scores.argmax(axis=0)
+    confidences = np.take_along_axis(scores, class_ids[None, :], axis=0)[0]
+
+    mask = confidences >= conf_threshold
+    if not mask.any():
+        empty = np.empty((0,), dtype=np.float32)
+        return np.empty((0, 4), dtype=np.float32), empty, np.empty((0,), dtype=np.int64)
+
+    cx, cy, w, h = predictions[:4, mask]
+    boxes = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+    confidences = confidences[mask].astype(np.float32)
+    class_ids = class_ids[mask]
+
+    keep = nms_per_class(boxes, confidences, class_ids, iou_threshold)
+    return boxes[keep], confidences[keep], class_ids[keep]
+
+
+def nms_per_class(boxes, scores, class_ids, iou_threshold: float):
+    """
+    Non-Maximum Suppression theo từng class, thuần NumPy.
+
+    Các box được dịch chuyển theo class_id để box khác class không bao giờ chồng lên nhau,
+    nhờ đó chỉ cần chạy một lượt NMS cho toàn bộ class.
+
+    Returns:
+        np.ndarray: Chỉ số các box được giữ lại, theo thứ tự score giảm dần.
+    """
+    if len(boxes) == 0:
+        return np.empty((0,), dtype=np.int64)
+
+    x1 = boxes[:, 0]
+    y1 = boxes[:, 1]
+    x2 = x1 + boxes[:, 2]
+    y2 = y1 + boxes[:, 3]
+
+    offset = class_ids.astype(np.float32) * (float(max(x2.max(), y2.max())) + 1.0)
+    x1 = x1 + offset
+    y1 = y1 + offset
+    x2 = x2 + offset
+    y2 = y2 + offset
+    areas = (x2 - x1) * (y2 - y1)
+
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        xx1 = np.maximum(x1[i], x1[rest])
+        yy1 = np.maximum(y1[i], y1[rest])
+        xx2 = np.minimum(x2[i], x2[rest])
+        yy2 = np.minimum(y2[i], y2[rest])
+
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+
+    return np.asarray(keep, dtype=np.int64)
+
+
+# YOLO_MODEL_PATH trỏ tới model khác (vd. best.int8.onnx); YOLO_QUANTIZED=1 dùng model INT8 mặc định
+YOLO_MODEL_PATH = os.getenv(
+    "YOLO_MODEL_PATH",
+    str(config.paths.YOLO_INT8_MODEL_PATH if os.getenv("YOLO_QUANTIZED") == "1" else config.paths.YOLO_MODEL_PATH)
+)
+
+
+def boxes_to_original(boxes, info: LetterboxInfo):
+    """
+    Đổi box (x, y, w, h) trong tọa độ input model (đã letterbox) sang (x1, y1, x2, y2)
+    theo pixel của ảnh gốc, cắt trong biên ảnh.
+    """
+    x1 = (boxes[:, 0] - info.pad_x) * info.gain_x
+    y1 = (boxes[:, 1] - info.pad_y) * info.gain_y
+    x2 = x1 + boxes[:, 2] * info.gain_x
+    y2 = y1 + boxes[:, 3] * info.gain_y
+    out = np.stack([x1, y1, x2, y2], axis=1)
+    np.clip(out[:, 0::2], 0, info.orig_w, out=out[:, 0::2])
+    np.clip(out[:, 1::2], 0, info.orig_h, out=out[:, 1::2])
+    return out
+
+
+def summarize_detections(detections: list[dict]) -> dict:
+    """
+    Thống kê theo nguyên liệu (tên tiếng Việt): số lượng và confidence cao nhất.
+    """
+    summary = {}
+    for d in detections:
+        name = d.get("ingredient")
+        if not name:
+            continue
+        entry = summary.setdefault(name, {"count": 0, "max_confidence": 0.0})
+        entry["count"] += 1
+        entry["max_confidence"] = max(entry["max_confidence"], d["confidence"])
+    return summary
 
 
 class YoloIngredientService:
@@ -25,17 +144,23 @@ class YoloIngredientService:
     """
     def __init__(
         self,
-        model_path=config.paths.YOLO_MODEL_PATH,
+        model_path=YOLO_MODEL_PATH,
         data_yaml_path=config.paths.YOLO_DATA_YAML,
-        conf_threshold: float = 0.5
+        conf_threshold: float = 0.5,
+        iou_threshold: float = 0.45,
+        session_config: SessionConfig | None = None
     ):
-        self.session = ort.InferenceSession(
-            model_path,
-            providers=["CUDAExecutionProvider", "CPUExecutionProvider"]
-        )
+        # Threads, execution mode, mức tối ưu graph, cache model đã tối ưu: xem ort_session.py
+        self.session = create_session(model_path, session_config)
 
         input_meta = self.session.get_inputs()[0]
         self.input_name = input_meta.name
+        # None nếu model export với batch dim động
+        self.batch_size = (
+            input_meta.shape[0]
+            if isinstance(input_meta.shape[0], int)
+            else None
+        )
 
         self.input_size = (
             input_meta.shape[2]
@@ -44,6 +169,8 @@ class YoloIngredientService:
         )
 
         self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.buffers = TensorBuffer(self.input_size, self.batch_size or 1)
 
         self.class_names = self._load_class_names(data_yaml_path)
 
@@ -62,62 +189,95 @@ class YoloIngredientService:
         detections = self.detect_objects(image_bytes)
         return self.normalize_ingredients(detections)
 
+    def detect_ingredients_batch(self, images: list[bytes]) -> list[str]:
+        """
+        Nhận diện nhiều ảnh trong một lần inference và gộp tập nguyên liệu.
+        Args:
+            images (list[bytes]): Danh sách ảnh dạng raw bytes.
+        """
+        detections = []
+        for image_detections in self.detect_objects_batch(images):
+            detections.extend(image_detections)
+        return self.normalize_ingredients(detections)
+
     def detect_objects(self, image_bytes: bytes):
         """
         Thực hiện inference YOLO để lấy raw predictions.
         Args:
             image_bytes (bytes): Dữ liệu ảnh.
         """
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise ValueError("Could not decode image bytes")
-        img = self._preprocess(image)
-
-        outputs = self.session.run(None, {self.input_name: img})
-        predictions = outputs[0]
-
-        if predictions.ndim == 3:
-            predictions = predictions[0]
-
-        predictions = predictions.transpose()
-        
-        boxes = []
-        confidences = []
-        class_ids = []
-
-        for pred in predictions:
-            scores = pred[4:]
-            class_id = np.argmax(scores)
-            confidence = scores[class_id]
-            
-            if confidence >= self.conf_threshold:
-                cx, cy, w, h = pred[0], pred[1], pred[2], pred[3]
-                
-                x = cx - w / 2
-                y = cy - h / 2
-                
-                boxes.append([x, y, w, h])
-                confidences.append(float(confidence))
-                class_ids.append(class_id)
-
-        indices = cv2.dnn.NMSBoxes(boxes, confidences, self.conf_threshold, 0.45)
+        return self.detect_objects_batch([image_bytes])[0]
+
+    def detect_objects_batch(self, images: list[bytes]) -> list[list[dict]]:
+        """
+        Inference YOLO cho nhiều ảnh: ghi các ảnh đã letterbox vào một tensor NCHW
+        và chạy `session.run` một lần (hoặc theo từng chunk nếu model cố định batch).
+        Args:
+            images (list[bytes]): Danh sách ảnh dạng raw bytes.
+        Returns:
+            list[list[dict]]: Detections của từng ảnh, cùng thứ tự với đầu vào.
+        """
+        if not images:
+            return []
+
+        prepared = [self._prepare(image_bytes) for image_bytes in images]
+        predictions = self._infer(prepared)
+
+        return [self._to_detections(pred, p.info) for pred, p in zip(predictions, prepared)]
+
+    def _prepare(self, image_bytes: bytes) -> PreparedImage:
+        """
+        Decode + letterbox một ảnh (phần việc theo từng request, chạy được song song).
+        """
+        image, orig_size = decode_image(image_bytes, self.input_size)
+        return letterbox(image, self.input_size, orig_size)
+
+    def _infer(self, prepared: list[PreparedImage]):
+        """
+        Ghi các ảnh vào buffer NCHW của thread hiện tại và chạy inference.
+        """
+        n = len(prepared)
+        batch = self.buffers.get(n)
+        write_nchw([p.canvas for p in prepared], batch)
+        return self._run_batch(batch)[:n]
+
+    def _run_batch(self, batch):
+        """
+        Chạy session trên tensor (N, 3, H, W). Nếu model có batch dim cố định,
+        tách thành các chunk và pad chunk cuối bằng 0.
+        """
+        if self.batch_size is None:
+            return self.session.run(None, {self.input_name: batch})[0]
+
+        outputs = []
+        n = batch.shape[0]
+        for start in range(0, n, self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            valid = chunk.shape[0]
+            if valid < self.batch_size:
+                pad = np.zeros((self.batch_size - valid, *chunk.shape[1:]), dtype=chunk.dtype)
+                chunk = np.concatenate([chunk, pad], axis=0)
+            outputs.append(self.session.run(None, {self.input_name: chunk})[0][:valid])
+        return np.concatenate(outputs, axis=0)
+
+    def _to_detections(self, predictions, info: LetterboxInfo) -> list[dict]:
+        """
+        Detections của một ảnh; `box` là [x1, y1, x2, y2] theo pixel của ảnh gốc.
+        """
+        boxes, confidences, class_ids = postprocess_predictions(
+            predictions, self.conf_threshold, self.iou_threshold
+        )
+        boxes = boxes_to_original(boxes, info)
 
         detections = []
-        if len(indices) > 0:
-            original_h, original_w = image.shape[:2]
-            scale_x = original_w / self.input_size
-            scale_y = original_h / self.input_size
-
-            for i in indices.flatten():
-                box = boxes[i]
-                x, y, w, h = box
-                
-                detections.append({
-                   "raw_label": self.class_names[class_ids[i]],
-                   "confidence": confidences[i]
-                })
+        for box, confidence, class_id in zip(boxes.tolist(), confidences.tolist(), class_ids.tolist()):
+            raw_label = self.class_names[class_id]
+            detections.append({
+               "raw_label": raw_label,
+               "ingredient": YOLO_CLASS_TO_VI.get(raw_label),
+               "confidence": confidence,
+               "box": [round(v, 1) for v in box]
+            })
 
         return detections
 
@@ -137,15 +297,6 @@ class YoloIngredientService:
 
         return list(ingredients)
 
-    def _preprocess(self, image):
-
-        img = cv2.resize(image, (self.input_size, self.input_size))
-        img = img[:, :, ::-1] 
-        img = img.astype(np.float32) / 255.0
-        img = np.transpose(img, (2, 0, 1))
-        img = np.expand_dims(img, axis=0)
-        return img
-
 
 if __name__ == "__main__":
     yolo_service = YoloIngredientService()
@@ -8,15 +8,21 @@ Nhiệm vụ:
 - Tiếp nhận yêu cầu (request) từ phía client.
 - Gọi xuống lớp Service để xử lý nghiệp vụ (Vision, RAG, LLM).
 - Trả về kết quả (response) chuẩn hóa dưới dạng JSON.
+- Các biến thể `/stream` trả về Server-Sent Events (kết quả trước, lời khuyên LLM stream sau).
 """
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from .service import SmartChefService
+import json
 import os
 
 router = APIRouter()
 
+# Số ảnh tối đa mỗi request /predict/batch (YOLO chạy cả danh sách trong một lần infer)
+PREDICT_BATCH_MAX_IMAGES = int(os.getenv("PREDICT_BATCH_MAX_IMAGES", "8"))
+
 
 smart_chef = SmartChefService()
 
@@ -24,10 +30,26 @@ class ChatRequest(BaseModel):
     session_id: str
     message: str
 
+def sse_response(events) -> StreamingResponse:
+    """
+    Đóng gói async generator (event, data) thành response `text/event-stream`.
+    """
+    async def body():
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        # Tắt buffer của proxy (nginx) để từng event đến client ngay
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/predict", summary="Nhận diện nguyên liệu & Gợi ý (Start Session)")
 async def predict(
     file: UploadFile = File(...),
-    session_id: str = Form("default")
+    session_id: str = Form("default"),
+    use_cache: bool = Form(True)
 ):
     """
     Endpoint khởi tạo phiên làm việc (Session Start).
@@ -37,6 +59,8 @@ async def predict(
     2. Sử dụng YOLO để nhận diện danh sách nguyên liệu.
     3. Gợi ý công thức nấu ăn dựa trên nguyên liệu (RAG + LLM).
     4. Trả về kết quả và khởi tạo context cho session.
+
+    `use_cache=false` để bỏ qua cache (ảnh và câu trả lời LLM), luôn chạy lại toàn bộ quy trình.
     """
     if not file:
         raise HTTPException(status_code=400, detail="No file uploaded")
@@ -45,13 +69,63 @@ async def predict(
         # Read file content directly into memory
         file_bytes = await file.read()
             
-        result = smart_chef.suggest_recipes(file_bytes, session_id)
+        result = await smart_chef.asuggest_recipes(file_bytes, session_id, use_cache=use_cache)
         
         return result
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/predict/stream", summary="Nhận diện nguyên liệu & Gợi ý (Server-Sent Events)")
+async def predict_stream(
+    file: UploadFile = File(...),
+    session_id: str = Form("default"),
+    use_cache: bool = Form(True)
+):
+    """
+    Như `/predict` nhưng trả về SSE:
+    1. `event: result` — nguyên liệu, detections, công thức ngay khi Vision + RAG xong.
+    2. `event: token` — từng đoạn lời khuyên của LLM (`{"text": ...}`).
+    3. `event: done` — toàn bộ lời khuyên (`{"llm_suggestion": ...}`), đã lưu vào history của session.
+    Nếu có lỗi: `event: error` (`{"error": ...}`) và stream kết thúc.
+    """
+    if not file:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+
+    file_bytes = await file.read()
+    return sse_response(smart_chef.astream_suggest_recipes(file_bytes, session_id, use_cache=use_cache))
+
+@router.post("/predict/batch", summary="Nhận diện nhiều ảnh & Gợi ý (Start Session)")
+async def predict_batch(
+    files: list[UploadFile] = File(...),
+    session_id: str = Form("default"),
+    use_cache: bool = Form(True)
+):
+    """
+    Endpoint khởi tạo phiên làm việc với nhiều ảnh (ví dụ: nhiều góc chụp tủ lạnh).
+
+    Quy trình:
+    1. Tiếp nhận danh sách ảnh nguyên liệu.
+    2. Chạy YOLO một lần cho cả batch ảnh.
+    3. Gộp nguyên liệu và gợi ý công thức (RAG + LLM).
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+    if len(files) > PREDICT_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=413, detail=f"Too many files: at most {PREDICT_BATCH_MAX_IMAGES} images per request"
+        )
+
+    try:
+        images = [await file.read() for file in files]
+
+        result = await smart_chef.asuggest_recipes_batch(images, session_id, use_cache=use_cache)
+
+        return result
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/chat", summary="Hội thoại với AI (Follow-up)")
 async def chat(request: ChatRequest):
     """
@@ -63,7 +137,21 @@ async def chat(request: ChatRequest):
     3. Sử dụng LLM để sinh câu trả lời phù hợp ngữ cảnh.
     """
     try:
-        response = smart_chef.chat(request.session_id, request.message)
+        response = await smart_chef.achat(request.session_id, request.message)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/stream", summary="Hội thoại với AI (Server-Sent Events)")
+async def chat_stream(request: ChatRequest):
+    """
+    Như `/chat` nhưng stream câu trả lời: các `event: token` rồi `event: done` (`{"reply": ...}`).
+    """
+    return sse_response(smart_chef.astream_chat(request.session_id, request.message))
+
+@router.get("/metrics", summary="Metrics vận hành của các AI service")
+def metrics():
+    """
+    Trả về metrics nội bộ (micro-batcher YOLO, ...) để tuning.
+    """
+    return smart_chef.metrics()
@@ -0,0 +1,139 @@
+"""
+Module: Concurrency Load Test
+===========================
+
+Đo throughput của một worker khi nhiều request `/predict` đến đồng thời:
+- Before: handler `async def` gọi `SmartChefService.suggest_recipes` (đồng bộ) -> chặn event loop,
+  các request bị xử lý tuần tự.
+- After: handler gọi `SmartChefService.asuggest_recipes` (CPU stage trên executor, I/O stage async).
+
+Các service được thay bằng bản giả lập có độ trễ cấu hình được, nên có thể chạy offline.
+
+Chạy (từ thư mục `ai_services`):
+    python -m app.benchmark_concurrency --requests 32 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("YOLO_BATCH_WINDOW_MS", "0")
+# Ảnh giả giống hệt nhau giữa các request: tắt image cache để đo đúng đường xử lý đầy đủ
+os.environ.setdefault("IMAGE_CACHE_SIZE", "0")
+
+from .service import SmartChefService
+from .RAG.recipe_selection import select_recipe
+
+
+class FakeYoloService:
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+
+    def _detections(self) -> list[dict]:
+        return [
+            {"raw_label": label, "ingredient": name, "confidence": 0.9, "box": [10.0, 10.0, 100.0, 100.0]}
+            for label, name in (("chicken", "thịt gà"), ("ginger", "gừng"), ("scallion", "hành lá"))
+        ]
+
+    def detect_objects(self, image_bytes: bytes) -> list[dict]:
+        time.sleep(self.latency)
+        return self._detections()
+
+    def detect_objects_batch(self, images: list[bytes]) -> list[list[dict]]:
+        time.sleep(self.latency)
+        return [self._detections() for _ in images]
+
+    def normalize_ingredients(self, detections) -> list[str]:
+        return list({d["ingredient"] for d in detections})
+
+
+class FakeRAGService:
+    def __init__(self, embed_ms: float, io_ms: float):
+        self.embed_latency = embed_ms / 1000
+        self.io_latency = io_ms / 1000
+
+    def _recipes(self, ingredients):
+        return [{"id": "ga-kho-gung", "ten_mon": "Gà kho gừng", "match_score": 1.0}]
+
+    def retrieve(self, ingredients: list[str], top_k=5):
+        time.sleep(self.embed_latency)
+        time.sleep(self.io_latency)
+        return self._recipes(ingredients)
+
+    async def aretrieve(self, ingredients: list[str], top_k=5, executor=None):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, time.sleep, self.embed_latency)
+        await asyncio.sleep(self.io_latency)
+        return self._recipes(ingredients)
+
+    def select_recipe(self, ingredients: list[str], recipes: list[dict]):
+        return select_recipe(ingredients, recipes)
+
+
+class FakeLLMService:
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+
+    def generate_suggestion(self, session_id, ingredients, recipes, use_cache=True, selection=None) -> str:
+        time.sleep(self.latency)
+        return "Gợi ý: Gà kho gừng"
+
+    async def agenerate_suggestion(self, session_id, ingredients, recipes, use_cache=True, selection=None) -> str:
+        await asyncio.sleep(self.latency)
+        return "Gợi ý: Gà kho gừng"
+
+
+async def _run(handler, total: int, concurrency: int) -> tuple[float, list[float]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    start = time.perf_counter()
+
+    async def one(i: int):
+        # Mọi request "đến" cùng lúc: latency tính từ thời điểm bắt đầu, gồm cả thời gian xếp hàng
+        async with semaphore:
+            await handler(b"image", f"session-{i}")
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def _report(name: str, elapsed: float, latencies: list[float], total: int):
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{name:<8} {total / elapsed:8.2f} req/s | p50 {p50:8.1f} ms | p99 {p99:8.1f} ms | total {elapsed:6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /predict orchestration (sync vs async)")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--vision-ms", type=float, default=40)
+    parser.add_argument("--embed-ms", type=float, default=15)
+    parser.add_argument("--io-ms", type=float, default=10)
+    parser.add_argument("--llm-ms", type=float, default=800)
+    args = parser.parse_args()
+
+    service = SmartChefService(
+        yolo_service=FakeYoloService(args.vision_ms),
+        rag_service=FakeRAGService(args.embed_ms, args.io_ms),
+        llm_service=FakeLLMService(args.llm_ms),
+    )
+
+    async def before(image_bytes, session_id):
+        return service.suggest_recipes(image_bytes, session_id)
+
+    async def after(image_bytes, session_id):
+        return await service.asuggest_recipes(image_bytes, session_id)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, 1 worker")
+    for name, handler in (("before", before), ("after", after)):
+        elapsed, latencies = asyncio.run(_run(handler, args.requests, args.concurrency))
+        _report(name, elapsed, latencies, args.requests)
+
+    service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Module: Recipe Context Token Report
+=================================
+
+So sánh kích thước prompt gợi ý món khi dựng recipe context với các ngân sách token khác nhau
+(0 = cách cũ, mọi món đầy đủ các bước), cùng thời gian dựng context lần đầu / khi block đã cache.
+
+Chạy (từ thư mục `ai_services`):
+    python -m app.benchmark_context --budgets 0 2000 1500 1000 600
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("LLM_CACHE_BACKEND", "off")
+
+from .benchmark_history import FakeChefModel, RECIPES, STEPS
+from .llm_service import LLMService, SUGGESTION_QUESTION
+from .prompt_tokens import messages_tokens
+from .recipe_context import RecipeContextBuilder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suggestion prompt size per recipe context budget")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[0, 2000, 1500, 1000, 600])
+    parser.add_argument("--steps", type=int, default=12, help="Số bước cách làm mỗi món")
+    args = parser.parse_args()
+
+    steps = (STEPS * (args.steps // len(STEPS) + 1))[:args.steps]
+    recipes = [{**r, "cach_lam": steps} for r in RECIPES]
+    ingredients = ["thịt gà", "gừng", "hành lá"]
+    prompt = LLMService(llm=FakeChefModel()).suggestion_prompt
+
+    print(f"{len(recipes)} recipes x {args.steps} steps")
+    print(f"{'budget':>8}{'context':>9}{'prompt':>8}{'cold ms':>9}{'warm ms':>9}  levels")
+    for budget in args.budgets:
+        builder = RecipeContextBuilder(budget=budget or None)
+        start = time.perf_counter()
+        builder.build(recipes)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        context = builder.build(recipes)
+        warm = time.perf_counter() - start
+
+        prompt_tokens = messages_tokens(prompt.format_messages(
+            ingredients=", ".join(ingredients),
+            recipe_context=context.text,
+            question=SUGGESTION_QUESTION,
+            history=[],
+            history_summary=""
+        ))
+        print(
+            f"{budget or 'off':>8}{context.tokens:>9}{prompt_tokens:>8}{cold * 1000:>9.2f}{warm * 1000:>9.2f}  "
+            f"{','.join(context.levels)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
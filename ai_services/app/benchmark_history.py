@@ -0,0 +1,115 @@
+"""
+Module: Chat History Token Report
+===============================
+
+Mô phỏng một hội thoại (1 lượt gợi ý món + nhiều lượt `/chat`) với LLM giả lập và in số token
+prompt của từng request: `sent` (cửa sổ + tóm tắt + gợi ý rút gọn, xem `llm_history`) so với
+`full history` (replay nguyên văn toàn bộ lịch sử như trước đây).
+
+Chạy (từ thư mục `ai_services`):
+    python -m app.benchmark_history --turns 12
+    HISTORY_MAX_TURNS=2 HISTORY_SUMMARY=0 python -m app.benchmark_history
+"""
+
+import argparse
+import os
+
+os.environ.setdefault("LLM_CACHE_BACKEND", "off")
+os.environ.setdefault("HISTORY_STRIP_SUGGESTIONS", "1")
+
+from .benchmark_streaming import FakeStreamingChatModel
+from .llm_service import LLMService, get_session_history
+
+STEPS = [
+    "Rửa sạch gà, chặt miếng vừa ăn, để ráo nước.",
+    "Ướp gà với nước mắm, đường, tiêu, hành tím băm và gừng thái sợi trong 20-30 phút.",
+    "Phi thơm hành tỏi với dầu ăn, cho gà vào đảo đến khi thịt săn lại.",
+    "Thêm nước dừa hoặc nước lọc xâm xấp mặt thịt, đun sôi rồi hạ lửa nhỏ.",
+    "Kho liu riu 25 phút, thỉnh thoảng đảo đều cho thịt thấm gia vị.",
+    "Nêm nếm lại cho vừa ăn, rắc hành lá và tiêu, tắt bếp.",
+]
+
+RECIPES = [
+    {
+        "id": f"recipe-{i}",
+        "ten_mon": name,
+        "match_score": 1.0 - i * 0.1,
+        "mo_ta": f"Món {name.lower()} đậm đà, đưa cơm, dễ làm tại nhà.",
+        "nguyen_lieu_chi_tiet": ["500g thịt gà", "1 củ gừng", "3 cây hành lá", "2 củ hành tím", "1 quả dừa"],
+        "gia_vi": ["nước mắm", "đường", "tiêu", "dầu ăn"],
+        "cach_lam": STEPS,
+    }
+    for i, name in enumerate(["Gà kho gừng", "Gà xào sả ớt", "Canh gà lá giang", "Gà rang muối", "Cháo gà"])
+]
+
+QUESTIONS = [
+    "Có thể thay gừng bằng gì?",
+    "Món này để được bao lâu trong tủ lạnh?",
+    "Tôi muốn giảm ngọt thì nêm thế nào?",
+    "Nấu cho 6 người thì cần bao nhiêu gà?",
+    "Có nên dùng nồi áp suất không?",
+    "Ăn kèm với rau gì thì hợp?",
+]
+
+
+class FakeChefModel(FakeStreamingChatModel):
+    """
+    Trả lời theo loại prompt: gợi ý món (dài, chép lại các bước), tóm tắt (ngắn), chat (vừa).
+    """
+    def _reply(self, messages) -> str:
+        system = messages[0].content if messages else ""
+        if "Nhiệm vụ của bạn" in system:
+            steps = "\n".join(f"Bước {i + 1}: {step}" for i, step in enumerate(STEPS * 3))
+            return (
+                "Dựa trên nguyên liệu của bạn (gồm thịt gà, gừng, hành lá), tôi đề xuất món: Gà kho gừng.\n"
+                "Món này dùng đúng nguyên liệu chính bạn đang có và không cần thêm thịt khác.\n"
+                f"{steps}\nMẹo: thêm chút nước màu để món kho có màu đẹp."
+            )
+        if system.startswith("Tóm tắt"):
+            return "Người dùng có thịt gà, gừng, hành lá; đã được gợi ý Gà kho gừng (recipe-0) và hỏi về cách nấu."
+        return (
+            "Bạn có thể làm như sau: " + " ".join(STEPS[:2])
+            + " Ngoài ra hãy điều chỉnh lượng gia vị theo khẩu vị của gia đình."
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt token counts per turn: windowed history vs full replay")
+    parser.add_argument("--turns", type=int, default=12, help="Số lượt /chat sau lượt gợi ý")
+    args = parser.parse_args()
+
+    llm = LLMService(llm=FakeChefModel(first_token_ms=0, token_ms=0))
+    policy = llm.history_policy
+    print(
+        f"policy: max_turns={policy.max_turns} max_tokens={policy.max_tokens} summarize={policy.summarize} "
+        f"strip_suggestions={policy.strip_suggestions}"
+    )
+    print(f"{'request':<12}{'sent':>8}{'full history':>14}{'saved':>8}{'stored msgs':>13}")
+
+    session_id = "history-benchmark"
+    totals = {"sent": 0, "full_history": 0}
+
+    def report(name: str):
+        # Chờ việc tóm tắt nền (nếu có) xong để lượt sau thấy kết quả
+        llm._summary_executor.submit(lambda: None).result()
+        record = llm.token_stats.recent()[-1]
+        totals["sent"] += record["sent"]
+        totals["full_history"] += record["full_history"]
+        saved = 1 - record["sent"] / record["full_history"]
+        stored = len(get_session_history(session_id).messages)
+        print(f"{name:<12}{record['sent']:>8}{record['full_history']:>14}{saved:>8.0%}{stored:>13}")
+
+    llm.generate_suggestion(session_id, ["thịt gà", "gừng", "hành lá"], RECIPES, use_cache=False)
+    report("suggestion")
+    for i in range(args.turns):
+        llm.chat(session_id, QUESTIONS[i % len(QUESTIONS)])
+        report(f"chat {i + 1}")
+
+    print(
+        f"{'total':<12}{totals['sent']:>8}{totals['full_history']:>14}"
+        f"{1 - totals['sent'] / totals['full_history']:>8.0%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
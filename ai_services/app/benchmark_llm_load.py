@@ -0,0 +1,105 @@
+"""
+Module: Offline /predict Load Test
+================================
+
+Load test toàn bộ đường `/predict` (`SmartChefService.asuggest_recipes`) không cần GPU, Qdrant hay Gemini:
+Vision / RAG giả lập như `benchmark_concurrency`, bước LLM là `LLMService` thật (prompt, history, cache,
+`ResilientCaller`) trên `FakeChatModel` có tỷ lệ lỗi 503 và request chậm cấu hình được.
+
+So sánh các chính sách gọi LLM trên cùng chuỗi lỗi / độ trễ giả lập (cùng seed):
+    no-retry      không retry, không hedge
+    retry         LLM_RETRIES lần retry với backoff có jitter
+    retry+hedge   thêm hedged request sau --hedge-ms
+    outage        provider lỗi 100%: circuit breaker mở, các request sau trả công thức ngay (fallback)
+
+Chạy (từ thư mục `ai_services`):
+    python -m app.benchmark_llm_load --requests 64 --concurrency 16 --error-rate 0.2 --slow-rate 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("YOLO_BATCH_WINDOW_MS", "0")
+os.environ.setdefault("IMAGE_CACHE_SIZE", "0")
+os.environ.setdefault("LLM_CACHE_BACKEND", "off")
+os.environ.setdefault("HISTORY_SUMMARY", "0")
+
+from .benchmark_concurrency import FakeRAGService, FakeYoloService
+from .llm_providers import FakeChatModel
+from .llm_resilience import CallPolicy, CircuitBreaker, ResilientCaller
+from .llm_service import LLMService
+from .service import SmartChefService
+
+
+async def _load(service: SmartChefService, total: int, concurrency: int) -> tuple[float, list[float], int]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, fallbacks = [], 0
+
+    async def one(i: int):
+        nonlocal fallbacks
+        async with semaphore:
+            start = time.perf_counter()
+            result = await service.asuggest_recipes(b"image", f"load-{i}")
+            latencies.append(time.perf_counter() - start)
+            fallbacks += bool(result.get("llm_fallback"))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start, sorted(latencies), fallbacks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline /predict load test with a fake LLM provider")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=2)
+    parser.add_argument("--error-rate", type=float, default=0.2, help="Tỷ lệ request LLM lỗi 503")
+    parser.add_argument("--slow-rate", type=float, default=0.1, help="Tỷ lệ request LLM chậm thêm --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=3000)
+    parser.add_argument("--timeout", type=float, default=10, help="Deadline mỗi lần gọi LLM (giây)")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--hedge-ms", type=float, default=800)
+    args = parser.parse_args()
+
+    scenarios = [
+        ("no-retry", args.error_rate, CallPolicy(timeout=args.timeout, retries=0)),
+        ("retry", args.error_rate, CallPolicy(timeout=args.timeout, retries=args.retries)),
+        ("retry+hedge", args.error_rate, CallPolicy(
+            timeout=args.timeout, retries=args.retries, hedge_after=args.hedge_ms / 1000
+        )),
+        ("outage", 1.0, CallPolicy(timeout=args.timeout, retries=args.retries)),
+    ]
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, "
+          f"LLM errors {args.error_rate:.0%}, slow {args.slow_rate:.0%} (+{args.slow_ms:.0f} ms)")
+    print(f"{'policy':<13}{'req/s':>7}{'p50 ms':>9}{'p99 ms':>9}{'fallback':>10}"
+          f"{'retries':>9}{'hedges':>8}{'wins':>6}  circuit")
+    for name, error_rate, policy in scenarios:
+        llm_service = LLMService(llm=FakeChatModel(
+            first_token_ms=args.first_token_ms, token_ms=args.token_ms, error_rate=error_rate,
+            slow_rate=args.slow_rate, slow_ms=args.slow_ms, seed=0
+        ))
+        llm_service.caller = ResilientCaller(policy, CircuitBreaker(failures=5, cooldown=30))
+        service = SmartChefService(
+            yolo_service=FakeYoloService(20), rag_service=FakeRAGService(10, 5), llm_service=llm_service
+        )
+        try:
+            elapsed, latencies, fallbacks = asyncio.run(_load(service, args.requests, args.concurrency))
+        finally:
+            service.close()
+
+        stats = llm_service.llm_stats()
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(
+            f"{name:<13}{args.requests / elapsed:>7.1f}{p50 * 1000:>9.1f}{p99 * 1000:>9.1f}{fallbacks:>10}"
+            f"{stats['retries']:>9}{stats['hedges']:>8}{stats['hedge_wins']:>6}  "
+            f"{stats['circuit']['state']} (opened {stats['circuit']['opened']}, rejected {stats['circuit']['rejected']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
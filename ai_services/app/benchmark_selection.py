@@ -0,0 +1,174 @@
+"""
+Module: Recipe Selection Evaluation
+=================================
+
+So sánh hai chế độ gợi ý món trên một bộ danh sách nguyên liệu cố định:
+- `llm`   : LLM nhận cả danh sách công thức, tự chọn món rồi viết hướng dẫn (cách hiện tại).
+- `local` : món được chọn bằng quy tắc xác định (`RAG.recipe_selection`), LLM chỉ nhận món đó.
+
+Catalogue nhỏ dựng sẵn, retrieval bằng `IngredientIndex` (điểm khớp nguyên liệu như RAG thật). Mặc định
+dùng LLM giả lập: chọn món có độ khớp cao nhất trong context (tức bỏ qua quy tắc loại nguyên liệu chính,
+lỗi prompt gợi ý cố tránh) và có độ trễ tăng theo số token prompt; `--gemini` để chạy với Gemini thật
+(cần GOOGLE_API_KEY). In món được chọn (so với món mong đợi), số token prompt và độ trễ của từng chế độ.
+
+Chạy (từ thư mục `ai_services`):
+    python -m app.benchmark_selection
+    python -m app.benchmark_selection --prefill-ms-per-1k 300 --token-ms 5
+"""
+
+import argparse
+import os
+import re
+import time
+
+os.environ.setdefault("LLM_CACHE_BACKEND", "off")
+os.environ.setdefault("HISTORY_SUMMARY", "0")
+
+from .benchmark_streaming import FakeStreamingChatModel
+from .llm_service import LLMService
+from .prompt_tokens import messages_tokens
+from .RAG.ingredient_index import IngredientIndex
+from .RAG.recipe_selection import select_recipe
+
+# (id, tên món, nguyen_lieu_search, nguyên liệu chính trong nguyen_lieu_chi_tiet)
+CATALOGUE = [
+    ("bo-luc-lac", "Bò lúc lắc", "thịt bò, hành tây, ớt chuông, tỏi", "400g thịt bò thăn"),
+    ("heo-xao-hanh-tay", "Thịt heo xào hành tây", "thịt heo, hành tây, ớt chuông, tỏi, cà rốt, nước mắm",
+     "300g thịt heo nạc vai"),
+    ("bo-xao-ca-chua", "Bò xào cà chua", "thịt bò, cà chua, hành lá", "300g thịt bò"),
+    ("canh-ca-chua-thit-bam", "Canh cà chua thịt băm", "thịt heo, cà chua, hành lá, nước mắm", "150g thịt heo xay"),
+    ("trung-xao-ca-chua", "Trứng xào cà chua", "trứng, cà chua, hành lá, nước mắm", "3 quả trứng gà"),
+    ("thit-kho-trung", "Thịt kho trứng", "thịt heo, trứng, nước dừa", "500g thịt ba chỉ"),
+    ("ga-kho-gung", "Gà kho gừng", "thịt gà, gừng, hành lá", "500g thịt gà ta"),
+    ("bo-kho", "Bò kho", "thịt bò, cà rốt, sả, gừng", "600g bắp bò"),
+    ("canh-chua-tom", "Canh chua tôm", "tôm, cà chua, giá đỗ", "300g tôm sú"),
+    ("canh-chua-ca", "Canh chua cá", "thịt cá, cà chua, dứa, giá đỗ, me", "1 con cá lóc"),
+    ("rau-muong-xao-toi", "Rau muống xào tỏi", "rau muống, tỏi", "1 bó rau muống"),
+]
+
+# (nguyên liệu người dùng, món mong đợi; None = không món nào phù hợp, LLM tự sáng tạo)
+CASES = [
+    (["thịt heo", "hành tây", "ớt chuông", "tỏi"], "Thịt heo xào hành tây"),
+    (["thịt heo", "cà chua", "hành lá"], "Canh cà chua thịt băm"),
+    (["thịt gà", "gừng", "hành lá"], "Gà kho gừng"),
+    (["thịt bò", "cà rốt", "gừng"], "Bò kho"),
+    (["thịt cá", "cà chua", "giá đỗ"], "Canh chua cá"),
+    (["thịt vịt", "gừng"], None),
+]
+
+STEP_TEMPLATES = [
+    "Sơ chế {main}, rửa sạch, để ráo.",
+    "Ướp {main} với nước mắm, tiêu, tỏi băm trong 15 phút.",
+    "Sơ chế rau củ, cắt miếng vừa ăn.",
+    "Phi thơm tỏi với dầu ăn.",
+    "Cho {main} vào đảo lửa lớn đến khi săn lại.",
+    "Thêm rau củ, nêm nếm gia vị cho vừa ăn.",
+    "Nấu thêm vài phút cho thấm, tắt bếp.",
+    "Bày ra đĩa, rắc hành lá và tiêu.",
+]
+
+PICK = re.compile(r"tôi đề xuất món: (.+?)\.?\n")
+HEADER = re.compile(r"^\d+\. Tên món: (.+) \(Độ khớp: ([\d.]+)\)$", re.MULTILINE)
+
+
+def build_catalogue() -> tuple[IngredientIndex, dict]:
+    rows = [{"id": r_id, "ten_mon": name, "nguyen_lieu_search": search} for r_id, name, search, _ in CATALOGUE]
+    details = {}
+    for r_id, name, search, main in CATALOGUE:
+        main_name = main.split(" ", 1)[1]
+        details[r_id] = {
+            "id": r_id,
+            "ten_mon": name,
+            "mo_ta": f"Món {name.lower()} thơm ngon, dễ làm cho bữa cơm gia đình.",
+            "nguyen_lieu_chi_tiet": [main] + [i.strip() for i in search.split(",")[1:]],
+            "gia_vi": ["nước mắm", "đường", "tiêu", "dầu ăn"],
+            "cach_lam": [step.format(main=main_name) for step in STEP_TEMPLATES],
+        }
+    return IngredientIndex(rows), details
+
+
+def retrieve(index: IngredientIndex, details: dict, ingredients: list[str], top_k: int = 5) -> list[dict]:
+    return [
+        {**details[r_id], "match_score": score, "semantic_score": 0.0}
+        for r_id, score in index.top_matches(ingredients, limit=top_k)
+    ]
+
+
+class FakeSelectorModel(FakeStreamingChatModel):
+    """
+    LLM giả lập: chọn món có độ khớp cao nhất trong context (không xét nguyên liệu chính), độ trễ
+    = prefill theo số token prompt + token đầu + từng token trả lời.
+    """
+    prefill_ms_per_1k: float = 150.0
+
+    def _reply(self, messages) -> str:
+        headers = HEADER.findall(messages[0].content)
+        name = max(headers, key=lambda h: float(h[1]))[0] if headers else "Vịt om gừng (món tự sáng tạo)"
+        return (
+            f"Dựa trên nguyên liệu của bạn, tôi đề xuất món: {name}.\n"
+            "Món này tận dụng tốt nguyên liệu bạn đang có.\n"
+            + "\n".join(f"Bước {i + 1}: {step.format(main='nguyên liệu chính')}" for i, step in enumerate(STEP_TEMPLATES))
+            + "\nMẹo: nêm nếm lại trước khi tắt bếp."
+        )
+
+    def _total_seconds(self, messages) -> float:
+        return super()._total_seconds(messages) + self.prefill_ms_per_1k * messages_tokens(messages) / 1e6
+
+
+def run_case(llm: LLMService, mode: str, case: int, ingredients: list[str], recipes: list[dict], index):
+    start = time.perf_counter()
+    selection = None
+    if mode == "local":
+        selection = select_recipe(ingredients, recipes, index.ingredients_of)
+    reply = llm.generate_suggestion(f"{mode}-{case}", ingredients, recipes, use_cache=False, selection=selection)
+    elapsed = time.perf_counter() - start
+
+    match = PICK.search(reply)
+    picked = match.group(1).strip(" *") if match else None
+    tokens = llm.token_stats.recent()[-1]["sent"]
+    return picked, tokens, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare LLM-side vs local recipe selection")
+    parser.add_argument("--gemini", action="store_true", help="Dùng Gemini thật thay cho LLM giả lập")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=150)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=2)
+    args = parser.parse_args()
+
+    fake = None if args.gemini else FakeSelectorModel(
+        prefill_ms_per_1k=args.prefill_ms_per_1k, first_token_ms=args.first_token_ms, token_ms=args.token_ms
+    )
+    llm = LLMService(llm=fake)
+    index, details = build_catalogue()
+    names = {d["ten_mon"] for d in details.values()}
+
+    totals = {mode: {"correct": 0, "tokens": 0, "seconds": 0.0} for mode in ("llm", "local")}
+    print(f"{'ingredients':<36}{'expected':<24}{'mode':<7}{'picked':<28}{'tokens':>7}{'ms':>9}")
+    for case, (ingredients, expected) in enumerate(CASES):
+        recipes = retrieve(index, details, ingredients)
+        for mode in ("llm", "local"):
+            picked, tokens, elapsed = run_case(llm, mode, case, ingredients, recipes, index)
+            # Món không có trong catalogue = LLM tự sáng tạo món mới
+            outcome = picked if picked in names else None
+            totals[mode]["correct"] += outcome == expected
+            totals[mode]["tokens"] += tokens
+            totals[mode]["seconds"] += elapsed
+            label = ", ".join(ingredients) if mode == "llm" else ""
+            print(
+                f"{label:<36}{(expected or '(sáng tạo)') if mode == 'llm' else '':<24}{mode:<7}"
+                f"{(picked or '?')[:27]:<28}{tokens:>7}{elapsed * 1000:>9.1f}"
+            )
+
+    n = len(CASES)
+    for mode, total in totals.items():
+        print(
+            f"{mode:<6} correct {total['correct']}/{n} | avg prompt tokens {total['tokens'] / n:7.1f} | "
+            f"avg latency {total['seconds'] / n * 1000:8.1f} ms"
+        )
+    llm.close()
+
+
+if __name__ == "__main__":
+    main()
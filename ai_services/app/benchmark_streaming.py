@@ -0,0 +1,122 @@
+"""
+Module: Streaming Check
+=====================
+
+Kiểm tra và đo luồng streaming (`astream_suggest_recipes`, `astream_chat`) với LLM giả lập stream
+từng token (độ trễ token đầu và giữa các token cấu hình được), Vision/RAG giả lập như
+`benchmark_concurrency`:
+- Thứ tự event: "result" -> "token"... -> "done"; nội dung "done" = ghép các "token".
+- Câu trả lời đầy đủ có trong history của session (cho `/chat` phía sau).
+- Time-to-first-event / first-token so với tổng thời gian của `asuggest_recipes` (không stream).
+
+Chạy (từ thư mục `ai_services`):
+    python -m app.benchmark_streaming --first-token-ms 600 --token-ms 15
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("YOLO_BATCH_WINDOW_MS", "0")
+os.environ.setdefault("IMAGE_CACHE_SIZE", "0")
+# Mỗi lượt phải thực sự gọi LLM
+os.environ.setdefault("LLM_CACHE_BACKEND", "off")
+# So sánh nguyên văn câu trả lời với history: lưu gợi ý không rút gọn
+os.environ.setdefault("HISTORY_STRIP_SUGGESTIONS", "0")
+
+from .benchmark_concurrency import FakeRAGService, FakeYoloService
+from .llm_providers import FakeChatModel
+from .llm_service import LLMService, get_session_history
+from .service import SmartChefService
+
+REPLY = (
+    "Dựa trên nguyên liệu của bạn (gồm thịt gà, gừng, hành lá), tôi đề xuất món: Gà kho gừng. "
+    "Sơ chế gà, chặt miếng vừa ăn, ướp với nước mắm, đường và gừng thái sợi trong 20 phút. "
+    "Phi thơm hành, cho gà vào đảo săn rồi kho lửa nhỏ đến khi nước sánh lại. "
+    "Mẹo: thêm chút nước màu để món kho có màu đẹp."
+)
+
+
+class FakeStreamingChatModel(FakeChatModel):
+    """
+    `FakeChatModel` trả lời cố định `reply`: chờ `first_token_ms` rồi trả từng từ, mỗi từ cách `token_ms`.
+    """
+    reply: str = REPLY
+
+    def _reply(self, messages) -> str:
+        return self.reply
+
+
+async def _collect(events) -> list[tuple[str, dict, float]]:
+    start = time.perf_counter()
+    return [(event, data, time.perf_counter() - start) async for event, data in events]
+
+
+def _check(events: list, first: str | None, final_key: str) -> str:
+    names = [event for event, _, _ in events]
+    expected_head = [first] if first else []
+    tokens = names[len(expected_head):-1]
+    if names[:len(expected_head)] != expected_head or names[-1] != "done" or not tokens or set(tokens) != {"token"}:
+        raise SystemExit(f"Unexpected event order: {names}")
+
+    text = "".join(data["text"] for event, data, _ in events if event == "token")
+    if events[-1][1][final_key] != text:
+        raise SystemExit("'done' payload does not match the streamed tokens")
+    return text
+
+
+def _check_history(session_id: str, text: str):
+    messages = get_session_history(session_id).messages
+    if not messages or messages[-1].content != text:
+        raise SystemExit(f"Session '{session_id}' history does not end with the streamed reply")
+
+
+async def _run(service: SmartChefService):
+    start = time.perf_counter()
+    await service.asuggest_recipes(b"image", "blocking")
+    blocking = time.perf_counter() - start
+
+    events = await _collect(service.astream_suggest_recipes(b"image", "streaming"))
+    text = _check(events, "result", "llm_suggestion")
+    _check_history("streaming", text)
+    first_token = next(t for event, _, t in events if event == "token")
+    n_tokens = sum(event == "token" for event, _, _ in events)
+
+    print(f"/predict blocking       total {blocking * 1000:8.1f} ms")
+    print(
+        f"/predict stream         first event {events[0][2] * 1000:6.1f} ms | "
+        f"first token {first_token * 1000:6.1f} ms | total {events[-1][2] * 1000:8.1f} ms | {n_tokens} tokens"
+    )
+
+    events = await _collect(service.astream_chat("streaming", "Có thể thay gừng bằng gì?"))
+    text = _check(events, None, "reply")
+    _check_history("streaming", text)
+    print(f"/chat stream            first token {events[0][2] * 1000:6.1f} ms | total {events[-1][2] * 1000:8.1f} ms")
+    print("OK: event order, payloads and session history verified")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify and time SSE streaming of /predict and /chat")
+    parser.add_argument("--vision-ms", type=float, default=40)
+    parser.add_argument("--embed-ms", type=float, default=15)
+    parser.add_argument("--io-ms", type=float, default=10)
+    parser.add_argument("--first-token-ms", type=float, default=600)
+    parser.add_argument("--token-ms", type=float, default=15)
+    args = parser.parse_args()
+
+    service = SmartChefService(
+        yolo_service=FakeYoloService(args.vision_ms),
+        rag_service=FakeRAGService(args.embed_ms, args.io_ms),
+        llm_service=LLMService(llm=FakeStreamingChatModel(
+            first_token_ms=args.first_token_ms, token_ms=args.token_ms
+        )),
+    )
+    try:
+        asyncio.run(_run(service))
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
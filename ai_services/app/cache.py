@@ -0,0 +1,173 @@
+"""
+Module: In-Process Cache
+======================
+
+Cache LRU trong bộ nhớ dùng chung cho các service:
+- Giới hạn theo tổng kích thước (bytes, ước lượng) và/hoặc số phần tử.
+- TTL cho từng phần tử.
+- Bộ đếm hit/miss/eviction/rejection (giá trị lớn hơn `max_bytes`) phục vụ metrics.
+Thread-safe (dùng được từ executor thread và event loop).
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimate_size(value) -> int:
+    """
+    Ước lượng kích thước (bytes) của một giá trị JSON-like.
+    """
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class TTLLRUCache:
+    """
+    LRU cache có TTL, giới hạn bytes và metrics.
+
+    Args:
+        max_bytes (int | None): Tổng kích thước tối đa (None = không giới hạn).
+        max_items (int | None): Số phần tử tối đa (None = không giới hạn).
+        ttl (float | None): Thời gian sống của phần tử, giây (None = không hết hạn).
+        sizeof (callable): Hàm ước lượng kích thước của value.
+    """
+    def __init__(self, max_bytes=None, max_items=None, ttl=None, sizeof=estimate_size):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.ttl = ttl
+        self.sizeof = sizeof
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._get_locked(key)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys) -> tuple[dict, list]:
+        """
+        Lấy nhiều key một lần.
+
+        Returns:
+            tuple: (dict key -> value cho các key có trong cache, list các key bị miss).
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                value = self._get_locked(key)
+                if value is _MISSING:
+                    missing.append(key)
+                else:
+                    found[key] = value
+        return found, missing
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Không lưu được giá trị mới: bỏ luôn bản cũ, tránh `get` trả dữ liệu lỗi thời tới hết TTL
+            with self._lock:
+                self.rejections += 1
+                old = self._data.pop(key, None)
+                if old is not None:
+                    self._bytes -= old[2]
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            self._evict_locked()
+
+    def set_many(self, items: dict):
+        for key, value in items.items():
+            self.set(key, value)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self._bytes -= entry[2]
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def items(self) -> list:
+        """
+        Snapshot (key, value) của các phần tử còn hạn; không tính hit/miss, không đổi thứ tự LRU.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value)
+                for key, (value, expires_at, _) in self._data.items()
+                if expires_at is None or expires_at > now
+            ]
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "items": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_items": self.max_items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejections": self.rejections,
+            }
+
+    def _get_locked(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return _MISSING
+
+        value, expires_at, size = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self._bytes -= size
+            self.expirations += 1
+            self.misses += 1
+            return _MISSING
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _evict_locked(self):
+        while self._data and (
+            (self.max_bytes is not None and self._bytes > self.max_bytes)
+            or (self.max_items is not None and len(self._data) > self.max_items)
+        ):
+            _, (_, _, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+
+_MISSING = object()
@@ -31,11 +31,21 @@ PREPARE_SCRIPTS_DIR = PREPARE_DATA_DIR / "scripts"
 
 YOLO_SERVICE_DIR = AI_SERVICES_DIR / "app" / "Vison"
 YOLO_MODEL_PATH = YOLO_SERVICE_DIR / "Yolo_Model" / "best.onnx"
+YOLO_INT8_MODEL_PATH = YOLO_SERVICE_DIR / "Yolo_Model" / "best.int8.onnx"
+YOLO_ORT_CACHE_DIR = YOLO_SERVICE_DIR / "Yolo_Model" / "ort_cache"
 YOLO_DATA_YAML = YOLO_SERVICE_DIR / "Yolo_Model" / "data.yaml"
 
 
 RECIPES_JSON_PATH = PREPARE_DATA_DIR / "smartchef_dataset.json"
+RECIPES_JSONL_PATH = PREPARE_DATA_DIR / "smartchef_dataset.jsonl"
+RETRIEVAL_TABLE_PATH = PREPARE_DATA_DIR / "retrieval_table.bin"
+
+
+LLM_CACHE_DIR = AI_SERVICES_DIR / "cache"
+LLM_CACHE_PATH = LLM_CACHE_DIR / "llm_responses.sqlite3"
+SESSION_STORE_PATH = LLM_CACHE_DIR / "sessions.sqlite3"
 
 
 QDRANT_DATA_DIR = VECTOR_DB_DIR / "data"
+LOCAL_VECTOR_DIR = VECTOR_DB_DIR / "local"
 
@@ -1,7 +1,16 @@
+import asyncio
+import asyncpg
 import psycopg2
+import psycopg2.extensions
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import asynccontextmanager, contextmanager
 import os
 import json
+import threading
+import time
+
+from .cache import TTLLRUCache
 
 DB_NAME = os.getenv("DB_NAME", "smartchef_db")
 DB_USER = os.getenv("DB_USER", "admin")
@@ -9,6 +18,300 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "admin")
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
 
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "5"))
+# Connection nhàn rỗi lâu hơn ngưỡng này sẽ được ping (SELECT 1) trước khi dùng lại
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))
+
+RECIPE_CACHE_MAX_BYTES = int(os.getenv("RECIPE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RECIPE_CACHE_TTL = float(os.getenv("RECIPE_CACHE_TTL", "3600"))
+CATALOGUE_VERSION_CHECK_INTERVAL = float(os.getenv("CATALOGUE_VERSION_CHECK_INTERVAL", "5"))
+
+CATALOGUE_META_DDL = """
+    CREATE TABLE IF NOT EXISTS catalogue_meta (
+        id INT PRIMARY KEY,
+        version BIGINT NOT NULL
+    );
+"""
+CATALOGUE_VERSION_SQL = "SELECT version FROM catalogue_meta WHERE id = 1"
+
+RECIPE_INGREDIENTS_SQL = "SELECT id, ten_mon, nguyen_lieu_search FROM recipes"
+
+RECIPES_BY_IDS_STATEMENT = "get_recipes_by_ids"
+RECIPES_BY_IDS_SQL = """
+    SELECT id, ten_mon, mo_ta, nguyen_lieu_search, nguyen_lieu_chi_tiet, cach_lam, thoi_gian_nau, gia_vi
+    FROM recipes
+    WHERE id = ANY($1::text[])
+"""
+
+
+class PoolTimeoutError(TimeoutError):
+    """
+    Không lấy được connection từ pool trong thời gian `acquire_timeout`.
+    """
+
+
+class _PoolStats:
+    """
+    Bộ đếm dùng chung cho pool sync và async.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.acquire_seconds_total = 0.0
+        self.acquire_seconds_max = 0.0
+
+    def wait_started(self):
+        with self._lock:
+            self.waiting += 1
+
+    def wait_finished(self, acquired: bool, elapsed: float):
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.timeouts += 1
+                return
+            self.in_use += 1
+            self.acquired += 1
+            self.acquire_seconds_total += elapsed
+            self.acquire_seconds_max = max(self.acquire_seconds_max, elapsed)
+
+    def discard(self):
+        with self._lock:
+            self.discarded += 1
+
+    def released(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "discarded": self.discarded,
+                "acquire_ms_avg": self.acquire_seconds_total / self.acquired * 1000 if self.acquired else 0.0,
+                "acquire_ms_max": self.acquire_seconds_max * 1000,
+            }
+
+
+class _PooledConnection(psycopg2.extensions.connection):
+    """
+    Connection psycopg2 mang trạng thái của pool: các statement đã PREPARE và thời điểm trả về pool.
+    Trạng thái nằm trên chính object nên mất cùng connection khi psycopg2 đóng nó.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Pool connection psycopg2 (thread-safe) có acquire timeout, health check và metrics.
+    Câu lệnh `get_recipes_by_ids` được PREPARE một lần trên mỗi connection.
+    """
+    def __init__(
+        self,
+        minconn: int = DB_POOL_MIN,
+        maxconn: int = DB_POOL_MAX,
+        acquire_timeout: float = DB_POOL_ACQUIRE_TIMEOUT,
+        healthcheck_idle: float = DB_POOL_HEALTHCHECK_IDLE
+    ):
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.healthcheck_idle = healthcheck_idle
+        self.stats = _PoolStats()
+
+        self._pool = ThreadedConnectionPool(
+            minconn, maxconn,
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            host=DB_HOST,
+            port=DB_PORT,
+            connection_factory=_PooledConnection
+        )
+        # Chỉ mở `minconn` connection lúc khởi tạo, nhưng giữ lại tới `maxconn` connection nhàn rỗi:
+        # `putconn` của psycopg2 đóng mọi connection trả về khi đã có `minconn` connection nhàn rỗi.
+        self._pool.minconn = maxconn
+        # ThreadedConnectionPool raise ngay khi hết connection; semaphore giúp chờ có timeout
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self._release(conn, broken)
+
+    def execute_prepared(self, cursor, conn, name: str, sql: str, params: tuple):
+        """
+        Thực thi câu lệnh đã PREPARE trên connection (PREPARE ở lần dùng đầu tiên).
+        `sql` dùng placeholder kiểu Postgres ($1, $2, ...).
+        """
+        if name not in conn.prepared:
+            cursor.execute(f"PREPARE {name} AS {sql}")
+            conn.prepared.add(name)
+        placeholders = ", ".join(["%s"] * len(params))
+        cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+
+    def close(self):
+        self._pool.closeall()
+
+    def _acquire(self):
+        start = time.perf_counter()
+        self.stats.wait_started()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self.stats.wait_finished(False, 0.0)
+            raise PoolTimeoutError(f"No Postgres connection available after {self.acquire_timeout}s")
+
+        try:
+            conn = self._ensure_healthy(self._pool.getconn())
+        except Exception:
+            self._slots.release()
+            self.stats.wait_finished(False, 0.0)
+            raise
+
+        self.stats.wait_finished(True, time.perf_counter() - start)
+        return conn
+
+    def _ensure_healthy(self, conn):
+        idle = time.monotonic() - conn.last_used
+        if not conn.closed and idle < self.healthcheck_idle:
+            return conn
+
+        if not conn.closed:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+                return conn
+            except psycopg2.Error:
+                pass
+
+        self._discard(conn)
+        return self._pool.getconn()
+
+    def _release(self, conn, broken: bool):
+        try:
+            if not broken and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+
+            if broken or conn.closed:
+                self._discard(conn)
+            else:
+                conn.last_used = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+            self.stats.released()
+
+    def _discard(self, conn):
+        self.stats.discard()
+        self._pool.putconn(conn, close=True)
+
+
+class AsyncConnectionPool:
+    """
+    Pool connection asyncpg có acquire timeout, metrics và đóng graceful.
+    asyncpg tự cache prepared statement theo nội dung câu query trên mỗi connection,
+    nên `RECIPES_BY_IDS_SQL` chỉ được parse/plan một lần cho mỗi connection.
+    """
+    def __init__(
+        self,
+        min_size: int = DB_POOL_MIN,
+        max_size: int = DB_POOL_MAX,
+        acquire_timeout: float = DB_POOL_ACQUIRE_TIMEOUT,
+        healthcheck_idle: float = DB_POOL_HEALTHCHECK_IDLE
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.healthcheck_idle = healthcheck_idle
+        self.stats = _PoolStats()
+        self._pool = None
+
+    async def open(self):
+        self._pool = await asyncpg.create_pool(
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            host=DB_HOST,
+            port=int(DB_PORT),
+            min_size=self.min_size,
+            max_size=self.max_size,
+            init=_init_async_connection,
+            # Đóng connection nhàn rỗi quá lâu thay vì dùng lại connection có thể đã chết
+            max_inactive_connection_lifetime=self.healthcheck_idle * 10
+        )
+        return self
+
+    @asynccontextmanager
+    async def connection(self):
+        start = time.perf_counter()
+        self.stats.wait_started()
+        try:
+            conn = await self._pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.stats.wait_finished(False, 0.0)
+            raise PoolTimeoutError(f"No Postgres connection available after {self.acquire_timeout}s") from None
+        except Exception:
+            self.stats.wait_finished(False, 0.0)
+            raise
+        self.stats.wait_finished(True, time.perf_counter() - start)
+
+        try:
+            yield conn
+        finally:
+            await self._pool.release(conn)
+            self.stats.released()
+
+    async def close(self, timeout: float = 10):
+        if self._pool is None:
+            return
+        try:
+            await asyncio.wait_for(self._pool.close(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._pool.terminate()
+        self._pool = None
+
+    def snapshot(self) -> dict:
+        data = self.stats.snapshot()
+        if self._pool is not None:
+            data["size"] = self._pool.get_size()
+            data["idle"] = self._pool.get_idle_size()
+        return data
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_async_pool = None
+_async_pool_lock = None
+
+# Cache chi tiết công thức theo id; bị xóa khi version catalogue trong Postgres thay đổi
+recipe_cache = TTLLRUCache(max_bytes=RECIPE_CACHE_MAX_BYTES, ttl=RECIPE_CACHE_TTL)
+_catalogue_version = None
+_catalogue_checked_at = float("-inf")
+# Tăng mỗi lần xóa cache: fetch bắt đầu trước lần xóa không được ghi lại dữ liệu cũ vào cache
+_cache_generation = 0
+
+
 def get_db_connection():
     conn = psycopg2.connect(
         dbname=DB_NAME,
@@ -19,30 +322,224 @@ def get_db_connection():
     )
     return conn
 
+async def _init_async_connection(conn):
+    # Giải mã JSONB thành list/dict giống RealDictCursor của psycopg2
+    await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+async def get_async_db_connection():
+    conn = await asyncpg.connect(
+        database=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=int(DB_PORT)
+    )
+    await _init_async_connection(conn)
+    return conn
+
+def get_pool() -> ConnectionPool:
+    """
+    Pool sync dùng chung trong process (khởi tạo lazy).
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """
+    Pool async dùng chung trong process (khởi tạo lazy, hoặc từ FastAPI lifespan).
+    """
+    global _async_pool, _async_pool_lock
+    if _async_pool is None:
+        if _async_pool_lock is None:
+            _async_pool_lock = asyncio.Lock()
+        async with _async_pool_lock:
+            if _async_pool is None:
+                _async_pool = await AsyncConnectionPool().open()
+    return _async_pool
+
+async def close_pools():
+    """
+    Đóng cả hai pool (gọi khi shutdown).
+    """
+    global _pool, _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+def pool_metrics() -> dict:
+    return {
+        "sync": _pool.stats.snapshot() if _pool else None,
+        "async": _async_pool.snapshot() if _async_pool else None,
+    }
+
 def get_recipes_by_ids(recipe_ids: list[str]) -> dict:
     """
     Fetch detailed recipe information for a list of IDs.
     Returns a dictionary mapping ID -> Recipe Data (dict).
+    Chỉ các ID chưa có trong `recipe_cache` mới được truy vấn Postgres.
     """
     if not recipe_ids:
         return {}
-    
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    if _catalogue_version_due():
+        _apply_catalogue_version(_fetch_catalogue_version())
+
+    cached, missing = recipe_cache.get_many(recipe_ids)
+    if not missing:
+        return cached
+
+    generation = _cache_generation
+    fetched = _fetch_recipes_by_ids(missing)
+    if generation == _cache_generation:
+        recipe_cache.set_many(fetched)
+    return {**cached, **fetched}
+
+async def aget_recipes_by_ids(recipe_ids: list[str]) -> dict:
+    """
+    Phiên bản async của `get_recipes_by_ids` (asyncpg).
+    """
+    if not recipe_ids:
+        return {}
+
+    if _catalogue_version_due():
+        _apply_catalogue_version(await _afetch_catalogue_version())
+
+    cached, missing = recipe_cache.get_many(recipe_ids)
+    if not missing:
+        return cached
+
+    generation = _cache_generation
+    fetched = await _afetch_recipes_by_ids(missing)
+    if generation == _cache_generation:
+        recipe_cache.set_many(fetched)
+    return {**cached, **fetched}
+
+def invalidate_recipe_cache():
+    """
+    Xóa toàn bộ cache công thức (ví dụ sau khi nạp lại catalogue).
+    """
+    _clear_recipe_cache()
+
+def bump_catalogue_version(cursor):
+    """
+    Tăng version của catalogue; các process đang chạy sẽ xóa cache công thức
+    trong vòng `CATALOGUE_VERSION_CHECK_INTERVAL` giây. Gọi trong transaction của script ingest.
+    """
+    cursor.execute(CATALOGUE_META_DDL)
+    cursor.execute("""
+        INSERT INTO catalogue_meta (id, version) VALUES (1, 1)
+        ON CONFLICT (id) DO UPDATE SET version = catalogue_meta.version + 1
+    """)
+
+def catalogue_version():
+    """
+    Version catalogue quan sát được gần nhất (None nếu chưa đọc được).
+    """
+    if _catalogue_version_due():
+        _apply_catalogue_version(_fetch_catalogue_version())
+    return _catalogue_version
+
+async def acatalogue_version():
+    if _catalogue_version_due():
+        _apply_catalogue_version(await _afetch_catalogue_version())
+    return _catalogue_version
+
+def get_recipe_ingredients() -> list[dict]:
+    """
+    Lấy (id, ten_mon, nguyen_lieu_search) của toàn bộ catalogue (để build inverted index).
+    """
+    with get_pool().connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(RECIPE_INGREDIENTS_SQL)
+            return cursor.fetchall()
+
+async def aget_recipe_ingredients() -> list[dict]:
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        rows = await conn.fetch(RECIPE_INGREDIENTS_SQL)
+        return [dict(row) for row in rows]
+
+def recipe_cache_metrics() -> dict:
+    data = recipe_cache.stats()
+    data["catalogue_version"] = _catalogue_version
+    return data
+
+def _catalogue_version_due() -> bool:
+    global _catalogue_checked_at
+    now = time.monotonic()
+    if now - _catalogue_checked_at < CATALOGUE_VERSION_CHECK_INTERVAL:
+        return False
+    _catalogue_checked_at = now
+    return True
+
+def _apply_catalogue_version(version):
+    global _catalogue_version
+    if version is None:
+        return
+    if _catalogue_version is not None and version != _catalogue_version:
+        print(f"Catalogue version changed {_catalogue_version} -> {version}, clearing recipe cache")
+        _clear_recipe_cache()
+    _catalogue_version = version
+
+def _clear_recipe_cache():
+    global _cache_generation
+    _cache_generation += 1
+    recipe_cache.clear()
+
+def _fetch_catalogue_version():
+    try:
+        with get_pool().connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(CATALOGUE_VERSION_SQL)
+                row = cursor.fetchone()
+                return row[0] if row else 0
+    except Exception as e:
+        # Bảng catalogue_meta chưa tồn tại (DB cũ) hoặc Postgres lỗi: giữ version hiện tại
+        print(f"Error reading catalogue version: {e}")
+        return None
+
+async def _afetch_catalogue_version():
+    try:
+        pool = await get_async_pool()
+        async with pool.connection() as conn:
+            version = await conn.fetchval(CATALOGUE_VERSION_SQL)
+            return version or 0
+    except Exception as e:
+        print(f"Error reading catalogue version: {e}")
+        return None
+
+def _fetch_recipes_by_ids(recipe_ids: list[str]) -> dict:
+    # Lỗi lấy connection (Postgres không kết nối được, PoolTimeoutError) cũng trả {} như lỗi truy vấn
+    try:
+        pool = get_pool()
+        with pool.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                pool.execute_prepared(
+                    cursor, conn, RECIPES_BY_IDS_STATEMENT, RECIPES_BY_IDS_SQL, (recipe_ids,)
+                )
+                rows = cursor.fetchall()
+
+                result = {row['id']: row for row in rows}
+                return result
+    except Exception as e:
+        print(f"Error querying Postgres: {e}")
+        return {}
+
+async def _afetch_recipes_by_ids(recipe_ids: list[str]) -> dict:
     try:
-        query = """
-            SELECT id, ten_mon, mo_ta, nguyen_lieu_search, nguyen_lieu_chi_tiet, cach_lam, thoi_gian_nau, gia_vi
-            FROM recipes
-            WHERE id = ANY(%s)
-        """
-        cursor.execute(query, (recipe_ids,))
-        rows = cursor.fetchall()
-        
-        result = {row['id']: row for row in rows}
-        return result
+        pool = await get_async_pool()
+        async with pool.connection() as conn:
+            rows = await conn.fetch(RECIPES_BY_IDS_SQL, recipe_ids)
+
+            result = {row['id']: dict(row) for row in rows}
+            return result
     except Exception as e:
         print(f"Error querying Postgres: {e}")
         return {}
-    finally:
-        cursor.close()
-        conn.close()
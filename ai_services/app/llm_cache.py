@@ -0,0 +1,166 @@
+"""
+Module: LLM Response Cache
+========================
+
+Cache câu trả lời `generate_suggestion` của LLM. Hai request có cùng:
+- tập nguyên liệu đã chuẩn hóa (không phụ thuộc thứ tự, bỏ trùng),
+- danh sách recipe id theo đúng thứ tự retrieve,
+- phiên bản prompt template và tên model,
+cho cùng một prompt -> dùng lại câu trả lời thay vì gọi Gemini.
+
+Backend (LLM_CACHE_BACKEND):
+    memory   `TTLLRUCache` trong process (mặc định)
+    sqlite   file SQLite (LLM_CACHE_PATH), giữ qua restart và dùng chung giữa các uvicorn worker
+    off      tắt cache
+
+Cả hai backend đều có TTL (LLM_CACHE_TTL, giây) và giới hạn số phần tử với LRU (LLM_CACHE_SIZE).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .cache import TTLLRUCache
+from .config import paths
+from .RAG.embedding_cache import canonicalize_ingredients
+
+
+def response_key(ingredients: list[str], recipe_ids: list, prompt_version: str, model: str) -> str:
+    payload = json.dumps({
+        "prompt": prompt_version,
+        "model": model,
+        "ingredients": canonicalize_ingredients(ingredients),
+        "recipes": [str(r_id) for r_id in recipe_ids],
+    }, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryResponseStore:
+    def __init__(self, max_items: int = 1024, ttl: float | None = 3600.0):
+        self.cache = TTLLRUCache(max_items=max_items, ttl=ttl, sizeof=lambda v: len(v.encode("utf-8")))
+
+    def get(self, key: str) -> str | None:
+        return self.cache.get(key)
+
+    def set(self, key: str, value: str):
+        self.cache.set(key, value)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self.cache.stats()}
+
+
+class SQLiteResponseStore:
+    """
+    Store trên file SQLite (WAL), LRU theo thời điểm truy cập cuối.
+    Nhiều process có thể mở cùng một file.
+    """
+    def __init__(self, path, max_items: int = 1024, ttl: float | None = 3600.0):
+        self.path = Path(path)
+        self.max_items = max_items
+        self.ttl = ttl
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if self.ttl is not None and created_at + self.ttl <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            if self.ttl is not None:
+                self.expirations += self._conn.execute(
+                    "DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,)
+                ).rowcount
+            if self.max_items is not None:
+                self.evictions += self._conn.execute("""
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_items,)).rowcount
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            items, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM responses"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "backend": "sqlite",
+                "path": str(self.path),
+                "items": items,
+                "bytes": size,
+                "max_items": self.max_items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def create_response_store():
+    """
+    Tạo store theo biến môi trường; trả về None nếu cache bị tắt.
+    """
+    backend = os.getenv("LLM_CACHE_BACKEND", "memory")
+    max_items = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+    ttl = float(os.getenv("LLM_CACHE_TTL", "3600")) or None
+    if backend == "off" or max_items <= 0:
+        return None
+    if backend == "memory":
+        return MemoryResponseStore(max_items=max_items, ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteResponseStore(
+            os.getenv("LLM_CACHE_PATH", str(paths.LLM_CACHE_PATH)), max_items=max_items, ttl=ttl
+        )
+    raise ValueError(f"Unknown LLM_CACHE_BACKEND: {backend}")
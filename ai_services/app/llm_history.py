@@ -0,0 +1,152 @@
+"""
+Module: Chat History Policy
+=========================
+
+Quyết định phần lịch sử nào được đưa vào prompt và lịch sử được lưu ở dạng nào:
+
+- Cửa sổ: chỉ giữ N lượt (human + ai) gần nhất, trong ngân sách token (HISTORY_MAX_TURNS,
+  HISTORY_MAX_TOKENS). Các lượt cũ hơn không được replay nguyên văn.
+- Tóm tắt: khi số message cũ nằm ngoài cửa sổ đạt HISTORY_SUMMARY_MIN_MESSAGES, chúng được LLM
+  tóm tắt (nối tiếp bản tóm tắt trước) ngoài luồng request và thay thế trong store bằng một
+  message tóm tắt duy nhất; bản tóm tắt đi vào system prompt.
+- Rút gọn gợi ý: câu trả lời `generate_suggestion` (hướng dẫn nấu đầy đủ) được lưu dạng rút gọn
+  (HISTORY_SUGGESTION_TOKENS token đầu) kèm tên món + recipe id để tham chiếu lại.
+
+Mỗi message lưu kèm `original_tokens` (số token nếu lưu nguyên văn), để báo cáo số token prompt
+so với cách replay toàn bộ lịch sử trước đây.
+"""
+
+import os
+from dataclasses import dataclass
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from .prompt_tokens import estimate_tokens
+
+SUMMARY_FLAG = "history_summary"
+
+
+def original_tokens(message: BaseMessage) -> int:
+    return message.additional_kwargs.get("original_tokens", estimate_tokens(message.content))
+
+
+def is_summary(message: BaseMessage) -> bool:
+    return bool(message.additional_kwargs.get(SUMMARY_FLAG))
+
+
+def prompt_message(message: BaseMessage) -> BaseMessage:
+    """
+    Bản sao chỉ có nội dung (bỏ metadata lưu trữ) để đưa vào prompt.
+    """
+    return type(message)(content=message.content)
+
+
+def render_conversation(messages: list[BaseMessage]) -> str:
+    speaker = {"human": "Người dùng", "ai": "SmartChef"}
+    return "\n".join(f"{speaker.get(m.type, m.type)}: {m.content}" for m in messages)
+
+
+@dataclass
+class HistoryWindow:
+    summary: BaseMessage | None
+    older: list[BaseMessage]
+    recent: list[BaseMessage]
+
+    @property
+    def summary_text(self) -> str:
+        """
+        Đoạn thêm vào cuối system prompt (rỗng nếu chưa có tóm tắt).
+        """
+        if self.summary is None:
+            return ""
+        return f"\n\nTóm tắt cuộc hội thoại trước đó:\n{self.summary.content}"
+
+    def prompt_messages(self) -> list[BaseMessage]:
+        return [prompt_message(m) for m in self.recent]
+
+
+@dataclass
+class HistoryPolicy:
+    max_turns: int = 6
+    max_tokens: int = 1500
+    summarize: bool = True
+    summary_min_messages: int = 4
+    strip_suggestions: bool = True
+    suggestion_tokens: int = 250
+
+    @classmethod
+    def from_env(cls) -> "HistoryPolicy":
+        return cls(
+            max_turns=int(os.getenv("HISTORY_MAX_TURNS", "6")),
+            max_tokens=int(os.getenv("HISTORY_MAX_TOKENS", "1500")),
+            summarize=os.getenv("HISTORY_SUMMARY", "1") == "1",
+            summary_min_messages=int(os.getenv("HISTORY_SUMMARY_MIN_MESSAGES", "4")),
+            strip_suggestions=os.getenv("HISTORY_STRIP_SUGGESTIONS", "1") == "1",
+            suggestion_tokens=int(os.getenv("HISTORY_SUGGESTION_TOKENS", "250")),
+        )
+
+    def split(self, messages: list[BaseMessage]) -> HistoryWindow:
+        """
+        Tách lịch sử đã lưu thành (tóm tắt, các message cũ ngoài cửa sổ, cửa sổ gần nhất).
+        Cửa sổ gồm các lượt trọn vẹn, lấy từ cuối lên đến khi vượt số lượt hoặc ngân sách token.
+        """
+        summary = messages[0] if messages and is_summary(messages[0]) else None
+        rest = messages[1:] if summary is not None else list(messages)
+
+        start = len(rest)
+        turns, tokens = 0, 0
+        while start > 0:
+            turn_start = start - 1
+            while turn_start > 0 and rest[turn_start].type != "human":
+                turn_start -= 1
+            turn_tokens = sum(estimate_tokens(m.content) for m in rest[turn_start:start])
+            if turns + 1 > self.max_turns or tokens + turn_tokens > self.max_tokens:
+                break
+            turns += 1
+            tokens += turn_tokens
+            start = turn_start
+
+        return HistoryWindow(summary=summary, older=rest[:start], recent=rest[start:])
+
+    def needs_summary(self, window: HistoryWindow) -> bool:
+        return self.summarize and len(window.older) >= self.summary_min_messages
+
+    def suggestion_messages(self, question: str, ingredients: list[str], recipes: list[dict],
+                            reply: str) -> list[BaseMessage]:
+        """
+        Cặp hỏi/đáp lưu vào history cho một lần gợi ý món.
+        Câu hỏi kèm danh sách nguyên liệu (vốn chỉ nằm trong system prompt), câu trả lời rút gọn.
+        """
+        recipe_ids = [r.get("id") for r in recipes]
+        human = HumanMessage(
+            content=f"{question} (Nguyên liệu: {', '.join(ingredients)})",
+            additional_kwargs={"original_tokens": estimate_tokens(question)}
+        )
+        kwargs = {"original_tokens": estimate_tokens(reply), "recipe_ids": recipe_ids}
+        if not self.strip_suggestions or estimate_tokens(reply) <= self.suggestion_tokens:
+            return [human, AIMessage(content=reply, additional_kwargs=kwargs)]
+
+        head = self._head(reply, self.suggestion_tokens)
+        references = ", ".join(f"{r.get('ten_mon', '')} (id {r.get('id')})" for r in recipes)
+        content = f"{head}\n[...đã rút gọn. Công thức tham khảo: {references}]" if references else head
+        return [human, AIMessage(content=content, additional_kwargs=kwargs)]
+
+    @staticmethod
+    def _head(text: str, budget: int) -> str:
+        """
+        Các đoạn đầu của `text` trong ngân sách token (cắt theo đoạn, nếu không được thì theo ký tự).
+        """
+        kept = []
+        for paragraph in text.split("\n"):
+            if estimate_tokens("\n".join(kept + [paragraph])) > budget:
+                break
+            kept.append(paragraph)
+        head = "\n".join(kept).strip()
+        return head or text[:budget * 3].strip()
+
+    @staticmethod
+    def summary_message(content: str, replaced: list[BaseMessage]) -> SystemMessage:
+        return SystemMessage(content=content, additional_kwargs={
+            SUMMARY_FLAG: True,
+            "original_tokens": sum(original_tokens(m) for m in replaced),
+        })
@@ -0,0 +1,201 @@
+"""
+Module: LLM Providers
+===================
+
+Khởi tạo chat model LangChain theo LLM_PROVIDER:
+
+    gemini   Google Gemini (`ChatGoogleGenerativeAI`, cần GOOGLE_API_KEY). Mặc định khi có GOOGLE_API_KEY.
+    openai   Endpoint tương thích OpenAI (vLLM, llama.cpp server, Ollama, ...) tại LLM_BASE_URL,
+             qua `langchain-openai`.
+    fake     `FakeChatModel`: trả lời xác định dựng từ chính prompt, độ trễ / lỗi giả lập cấu hình được
+             (LLM_FAKE_*), để chạy benchmark và load test toàn bộ `/predict` offline.
+
+Retry, timeout, hedging và circuit breaker nằm ở `llm_resilience` (áp dụng chung cho mọi provider), nên
+client của từng provider được tạo với `max_retries=0`.
+"""
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+PROVIDERS = ("gemini", "openai", "fake")
+DEFAULT_MODELS = {"gemini": "gemini-1.5-flash", "openai": "local-model", "fake": "smartchef-fake"}
+
+_HEADER = re.compile(r"^\d+\. Tên món: (.+) \(Độ khớp: [\d.]+\)$", re.MULTILINE)
+_STEP = re.compile(r"^     \+ (.+)$", re.MULTILINE)
+_INGREDIENTS = re.compile(r"\*\*(.+?)\*\*")
+
+
+class FakeLLMError(Exception):
+    """
+    Lỗi giả lập của `FakeChatModel`, mang `status_code` như lỗi HTTP của provider thật.
+    """
+    def __init__(self, status_code: int):
+        super().__init__(f"Fake LLM error {status_code}")
+        self.status_code = status_code
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model giả lập, xác định:
+    - Gợi ý món: đề xuất món đầu tiên trong recipe context của prompt, chép lại các bước "Cách làm".
+    - Tóm tắt hội thoại / chat: câu trả lời ngắn cố định theo nội dung prompt.
+    - Độ trễ: `first_token_ms` rồi `token_ms` cho mỗi từ; tỷ lệ `slow_rate` request chậm thêm `slow_ms`.
+    - Lỗi: tỷ lệ `error_rate` request lỗi `error_status` (429/503...). Chuỗi ngẫu nhiên cố định theo `seed`.
+    """
+    first_token_ms: float = 600.0
+    token_ms: float = 15.0
+    slow_rate: float = 0.0
+    slow_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr(default=None)
+    _rng_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "smartchef-fake"
+
+    def _reply(self, messages) -> str:
+        system = messages[0].content if messages else ""
+        if system.startswith("Tóm tắt"):
+            return "Người dùng đã được SmartChef gợi ý món ăn từ nguyên liệu của họ và hỏi thêm về cách nấu."
+
+        headers = _HEADER.findall(system)
+        if headers:
+            first = system[system.index(headers[0]):]
+            steps = _STEP.findall(first.split("\n\n", 1)[0]) or ["Sơ chế nguyên liệu.", "Nấu chín và nêm nếm vừa ăn."]
+            ingredients = _INGREDIENTS.search(system)
+            return (
+                f"Dựa trên nguyên liệu của bạn (gồm {ingredients.group(1) if ingredients else '...'}), "
+                f"tôi đề xuất món: {headers[0]}.\n"
+                "Hệ thống tìm thấy món này khớp tốt nhất với nguyên liệu chính bạn đang có.\n"
+                + "\n".join(f"Bước {i + 1}: {step}" for i, step in enumerate(steps))
+                + "\nMẹo: nêm nếm lại trước khi tắt bếp."
+            )
+
+        question = messages[-1].content if messages else ""
+        return f"SmartChef trả lời câu hỏi \"{question}\": hãy điều chỉnh gia vị theo khẩu vị của gia đình bạn."
+
+    def _tokens(self, messages) -> list[str]:
+        return re.findall(r"\S+\s*", self._reply(messages))
+
+    def _total_seconds(self, messages) -> float:
+        return (self.first_token_ms + self.token_ms * (len(self._tokens(messages)) - 1)) / 1000
+
+    def _draw(self) -> tuple[float, int | None]:
+        """
+        (độ trễ thêm tính bằng giây, mã lỗi hoặc None) của request tiếp theo.
+        """
+        if not self.slow_rate and not self.error_rate:
+            return 0.0, None
+        with self._rng_lock:
+            if self._rng is None:
+                self._rng = random.Random(self.seed)
+            slow, error = self._rng.random(), self._rng.random()
+        extra = self.slow_ms / 1000 if slow < self.slow_rate else 0.0
+        return extra, (self.error_status if error < self.error_rate else None)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        extra, error = self._draw()
+        if error:
+            time.sleep(self.first_token_ms / 1000)
+            raise FakeLLMError(error)
+        time.sleep(self._total_seconds(messages) + extra)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        extra, error = self._draw()
+        if error:
+            await asyncio.sleep(self.first_token_ms / 1000)
+            raise FakeLLMError(error)
+        await asyncio.sleep(self._total_seconds(messages) + extra)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        extra, error = self._draw()
+        await asyncio.sleep(self.first_token_ms / 1000 + extra)
+        if error:
+            raise FakeLLMError(error)
+        for i, token in enumerate(self._tokens(messages)):
+            if i:
+                await asyncio.sleep(self.token_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def provider_from_env() -> str | None:
+    """
+    Provider theo LLM_PROVIDER; không đặt thì dùng Gemini nếu có GOOGLE_API_KEY, ngược lại None.
+    """
+    provider = os.getenv("LLM_PROVIDER", "").strip().lower()
+    if not provider:
+        return "gemini" if os.getenv("GOOGLE_API_KEY") else None
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER: {provider}")
+    return provider
+
+
+def create_chat_model(provider: str | None, model_name: str, timeout: float | None = None):
+    """
+    Chat model LangChain của `provider` (None nếu chưa cấu hình được).
+
+    Args:
+        provider (str | None): Một trong `PROVIDERS`.
+        model_name (str): Tên model phía provider.
+        timeout (float | None): Timeout HTTP của client (giây), khớp với deadline mỗi lần gọi.
+    """
+    if provider is None:
+        return None
+
+    max_output_tokens = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "8192"))
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            print("Warning: GOOGLE_API_KEY not found. LLM service will not work.")
+            return None
+        return ChatGoogleGenerativeAI(
+            model=model_name,
+            temperature=0.7,
+            top_p=0.95,
+            top_k=40,
+            max_output_tokens=max_output_tokens,
+            google_api_key=api_key,
+            timeout=timeout,
+            max_retries=0
+        )
+
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            model=model_name,
+            base_url=os.getenv("LLM_BASE_URL", "http://localhost:8000/v1"),
+            api_key=os.getenv("LLM_API_KEY", "not-needed"),
+            temperature=0.7,
+            top_p=0.95,
+            max_tokens=max_output_tokens,
+            timeout=timeout,
+            max_retries=0
+        )
+
+    return FakeChatModel(
+        first_token_ms=float(os.getenv("LLM_FAKE_FIRST_TOKEN_MS", "300")),
+        token_ms=float(os.getenv("LLM_FAKE_TOKEN_MS", "5")),
+        slow_rate=float(os.getenv("LLM_FAKE_SLOW_RATE", "0")),
+        slow_ms=float(os.getenv("LLM_FAKE_SLOW_MS", "0")),
+        error_rate=float(os.getenv("LLM_FAKE_ERROR_RATE", "0")),
+        error_status=int(os.getenv("LLM_FAKE_ERROR_STATUS", "503")),
+        seed=int(os.getenv("LLM_FAKE_SEED", "0"))
+    )
@@ -0,0 +1,353 @@
+"""
+Module: LLM Call Resilience
+=========================
+
+Bọc các lần gọi chain LLM (mọi provider, xem `llm_providers`) bằng:
+
+- Deadline mỗi lần gọi (LLM_TIMEOUT giây): với stream là deadline tới chunk đầu tiên.
+- Retry khi lỗi 429 / 5xx / timeout / mất kết nối (LLM_RETRIES lần), backoff lũy thừa có jitter
+  ("full jitter": ngẫu nhiên trong [0, min(LLM_RETRY_MAX_MS, LLM_RETRY_BASE_MS * 2^n)]).
+- Hedged request (LLM_HEDGE_AFTER_MS > 0, chỉ `ainvoke`): quá ngưỡng mà chưa có kết quả thì gửi thêm
+  một request giống hệt, lấy kết quả về trước, hủy request còn lại.
+- Circuit breaker: LLM_BREAKER_FAILURES lần gọi thất bại liên tiếp (đã hết retry) thì ngắt mạch trong
+  LLM_BREAKER_COOLDOWN giây: các lần gọi bị từ chối ngay (`CircuitOpenError`), sau đó cho một lần gọi thử.
+
+Lỗi không retry được (ví dụ 400) được raise nguyên gốc và không tính vào circuit breaker.
+
+Luồng sync chạy mỗi lần gọi trên thread riêng để áp deadline; thread của lần gọi quá hạn vẫn chạy tới khi
+client HTTP trả về (timeout của client = LLM_TIMEOUT), nên số lần gọi sync đang chạy bị giới hạn
+(LLM_SYNC_MAX_INFLIGHT): hết chỗ thì báo `LLMUnavailableError` ngay thay vì xếp hàng sau các thread treo.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+
+
+class LLMUnavailableError(RuntimeError):
+    """
+    LLM không trả lời được: hết retry với lỗi tạm thời, hoặc circuit breaker đang mở.
+    """
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+def status_code(exc: BaseException) -> int | None:
+    """
+    Mã HTTP của lỗi từ client provider (google-genai, openai, httpx, ...), nếu có.
+    """
+    for error in (exc, exc.__cause__):
+        if error is None:
+            continue
+        for attr in ("status_code", "code", "http_status"):
+            value = getattr(error, attr, None)
+            if isinstance(value, int):
+                return value
+        value = getattr(getattr(error, "response", None), "status_code", None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, FutureTimeoutError, ConnectionError)):
+        return True
+    status = status_code(exc)
+    return status is not None and (status == 429 or 500 <= status < 600)
+
+
+@dataclass
+class CallPolicy:
+    """
+    Args:
+        timeout (float | None): Deadline mỗi lần gọi (giây); None = không giới hạn.
+        retries (int): Số lần thử lại tối đa sau lần gọi đầu.
+        backoff_base (float): Backoff của lần retry đầu (giây), nhân đôi mỗi lần.
+        backoff_max (float): Backoff tối đa (giây).
+        hedge_after (float | None): Gửi request dự phòng sau ngần này giây; None = tắt.
+    """
+    timeout: float | None = 30.0
+    retries: int = 2
+    backoff_base: float = 0.2
+    backoff_max: float = 5.0
+    hedge_after: float | None = None
+
+    @classmethod
+    def from_env(cls) -> "CallPolicy":
+        return cls(
+            timeout=float(os.getenv("LLM_TIMEOUT", "30")) or None,
+            retries=int(os.getenv("LLM_RETRIES", "2")),
+            backoff_base=float(os.getenv("LLM_RETRY_BASE_MS", "200")) / 1000,
+            backoff_max=float(os.getenv("LLM_RETRY_MAX_MS", "5000")) / 1000,
+            hedge_after=float(os.getenv("LLM_HEDGE_AFTER_MS", "0")) / 1000 or None,
+        )
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker đếm số lần thất bại liên tiếp, dùng chung cho luồng sync và async.
+    """
+    def __init__(self, failures: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self.opened = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        return cls(
+            failures=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+        )
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def acquire(self) -> str | None:
+        """
+        Xin phép gọi LLM: "closed" (bình thường), "trial" (lần gọi thử duy nhất khi hết cooldown)
+        hoặc None (đang ngắt mạch, từ chối).
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.cooldown and not self._trial:
+                self._trial = True
+                return "trial"
+            self.rejected += 1
+            return None
+
+    def release(self, token: str | None):
+        """
+        Kết thúc lần gọi thử mà không có kết quả (lỗi không tính, bị hủy) để lần sau được thử lại.
+        """
+        if token == "trial":
+            with self._lock:
+                self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.opened += 1
+            self._trial = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class ResilientCaller:
+    """
+    Gọi một runnable LangChain (chain) theo `CallPolicy` và `CircuitBreaker`.
+    """
+    def __init__(self, policy: CallPolicy | None = None, breaker: CircuitBreaker | None = None,
+                 sync_inflight: int = 8):
+        self.policy = policy or CallPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        # Luồng sync cần thread riêng để áp deadline lên lời gọi chặn; slot chỉ trả lại khi thread xong hẳn
+        self._executor = ThreadPoolExecutor(max_workers=sync_inflight, thread_name_prefix="llm-call")
+        self._sync_slots = threading.BoundedSemaphore(sync_inflight)
+        self._lock = threading.Lock()
+        self._counts = {
+            "calls": 0, "retries": 0, "timeouts": 0, "failures": 0, "hedges": 0, "hedge_wins": 0, "saturated": 0
+        }
+
+    @classmethod
+    def from_env(cls) -> "ResilientCaller":
+        return cls(
+            CallPolicy.from_env(), CircuitBreaker.from_env(),
+            sync_inflight=int(os.getenv("LLM_SYNC_MAX_INFLIGHT", "8"))
+        )
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _acquire(self) -> str:
+        self._count("calls")
+        token = self.breaker.acquire()
+        if token is None:
+            raise CircuitOpenError("LLM circuit breaker is open")
+        return token
+
+    def _failed(self, exc: BaseException, attempt: int) -> bool:
+        """
+        Ghi nhận lần gọi lỗi; True nếu nên retry.
+        """
+        if isinstance(exc, (TimeoutError, FutureTimeoutError)):
+            self._count("timeouts")
+        if not is_retryable(exc):
+            return False
+        if attempt < self.policy.retries:
+            self._count("retries")
+            return True
+        self._count("failures")
+        self.breaker.record_failure()
+        return False
+
+    def invoke(self, runnable, inputs):
+        token = self._acquire()
+        try:
+            for attempt in range(self.policy.retries + 1):
+                future = self._submit(runnable, inputs)
+                try:
+                    result = future.result(timeout=self.policy.timeout)
+                except Exception as e:
+                    future.cancel()
+                    if self._failed(e, attempt):
+                        time.sleep(self.policy.backoff(attempt))
+                        continue
+                    if is_retryable(e):
+                        raise LLMUnavailableError(f"LLM unavailable: {e!r}") from e
+                    raise
+                self.breaker.record_success()
+                return result
+        finally:
+            self.breaker.release(token)
+
+    def _submit(self, runnable, inputs):
+        """
+        Chạy `runnable.invoke` trên executor nếu còn slot; không chờ slot (thread đang treo tới timeout HTTP).
+        """
+        if not self._sync_slots.acquire(blocking=False):
+            self._count("saturated")
+            raise LLMUnavailableError("Too many LLM calls in flight")
+        try:
+            future = self._executor.submit(runnable.invoke, inputs)
+        except BaseException:
+            self._sync_slots.release()
+            raise
+        future.add_done_callback(lambda _: self._sync_slots.release())
+        return future
+
+    async def ainvoke(self, runnable, inputs):
+        token = self._acquire()
+        try:
+            for attempt in range(self.policy.retries + 1):
+                try:
+                    result = await self._attempt(runnable, inputs)
+                except Exception as e:
+                    if self._failed(e, attempt):
+                        await asyncio.sleep(self.policy.backoff(attempt))
+                        continue
+                    if is_retryable(e):
+                        raise LLMUnavailableError(f"LLM unavailable: {e!r}") from e
+                    raise
+                self.breaker.record_success()
+                return result
+        finally:
+            self.breaker.release(token)
+
+    async def _attempt(self, runnable, inputs):
+        """
+        Một lần gọi trong deadline, kèm hedged request nếu bật.
+        """
+        timeout, hedge_after = self.policy.timeout, self.policy.hedge_after
+        if not hedge_after or (timeout is not None and hedge_after >= timeout):
+            return await asyncio.wait_for(runnable.ainvoke(inputs), timeout)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        primary = asyncio.ensure_future(runnable.ainvoke(inputs))
+        pending = {primary}
+        hedge = None
+        try:
+            while True:
+                if hedge is None:
+                    wait = hedge_after
+                else:
+                    wait = None if deadline is None else max(0.0, deadline - loop.time())
+                done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_wins")
+                        return task.result()
+                if not pending:
+                    # Mọi request đều lỗi (request chính lỗi sớm thì không hedge: để retry xử lý có backoff)
+                    raise next(iter(done)).exception()
+                if done:
+                    continue
+                if hedge is not None:
+                    raise TimeoutError("LLM call exceeded deadline")
+                hedge = asyncio.ensure_future(runnable.ainvoke(inputs))
+                pending.add(hedge)
+                self._count("hedges")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def astream(self, runnable, inputs):
+        """
+        Stream qua `runnable.astream`. Deadline và retry chỉ áp cho chunk đầu tiên (chưa gửi gì cho
+        client); lỗi giữa chừng được raise cho caller.
+        """
+        token = self._acquire()
+        try:
+            for attempt in range(self.policy.retries + 1):
+                iterator = runnable.astream(inputs).__aiter__()
+                try:
+                    first = await asyncio.wait_for(iterator.__anext__(), self.policy.timeout)
+                    break
+                except StopAsyncIteration:
+                    self.breaker.record_success()
+                    return
+                except Exception as e:
+                    await iterator.aclose()
+                    if self._failed(e, attempt):
+                        await asyncio.sleep(self.policy.backoff(attempt))
+                        continue
+                    if is_retryable(e):
+                        raise LLMUnavailableError(f"LLM unavailable: {e!r}") from e
+                    raise
+            # Provider đã trả lời: tính là thành công với circuit breaker (kể cả khi client ngắt stream giữa chừng)
+            self.breaker.record_success()
+        finally:
+            self.breaker.release(token)
+
+        yield first
+        try:
+            async for chunk in iterator:
+                yield chunk
+        except Exception as e:
+            if is_retryable(e):
+                self._count("failures")
+                self.breaker.record_failure()
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        return {**counts, "circuit": self.breaker.stats()}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -2,52 +2,84 @@
 Module: LLM Service
 =================
 
-Cung cấp dịch vụ Xử lý Ngôn ngữ Tự nhiên (NLP) thông qua Google Gemini và LangChain.
+Cung cấp dịch vụ Xử lý Ngôn ngữ Tự nhiên (NLP) thông qua LangChain, với chat model theo LLM_PROVIDER
+(Gemini, endpoint tương thích OpenAI hoặc model giả lập, xem `llm_providers`).
 
 Chức năng:
-- Quản lý ngữ cảnh hội thoại (Context Management) theo session.
+- Quản lý ngữ cảnh hội thoại (Context Management) theo session (`session_store`).
 - Sinh nội dung tư vấn món ăn dựa trên nguyên liệu và công thức.
 - Xử lý các tác vụ Chat General.
+- Cache câu trả lời gợi ý theo (nguyên liệu, recipe id, phiên bản prompt), xem `llm_cache`.
+- Context công thức theo ngân sách token, chi tiết theo thứ hạng (`recipe_context`).
+- Hai chế độ gợi ý: LLM tự chọn món trong danh sách công thức (mặc định), hoặc nhận món đã được chọn
+  sẵn (`selection`, RECIPE_SELECTION=local, xem `RAG.recipe_selection`) và chỉ viết hướng dẫn cho món đó.
+- Lịch sử đưa vào prompt theo cửa sổ token + tóm tắt chạy nền, lưu gợi ý dạng rút gọn (`llm_history`).
+  Số token của mỗi prompt (so với replay toàn bộ lịch sử) được log và thống kê ở `prompt_stats`.
+- Mọi lần gọi LLM đi qua `ResilientCaller` (deadline, retry có jitter, hedging, circuit breaker; xem
+  `llm_resilience`). Lỗi được raise cho caller (không trộn vào nội dung trả lời); `fallback_suggestion`
+  dựng câu trả lời từ công thức đã tìm được khi LLM không khả dụng.
 """
 
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_core.runnables.history import RunnableWithMessageHistory
+from .llm_cache import create_response_store, response_key
+from .llm_history import HistoryPolicy, original_tokens, render_conversation
+from .llm_providers import DEFAULT_MODELS, create_chat_model, provider_from_env
+from .llm_resilience import ResilientCaller
+from .prompt_tokens import PromptTokenStats, estimate_tokens, messages_tokens
+from .recipe_context import RecipeContextBuilder
+from .session_store import SessionHistory, create_session_store
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
-store = {}
+# Tăng khi sửa suggestion_prompt hoặc cách dựng recipe context để không dùng lại câu trả lời cũ
+SUGGESTION_PROMPT_VERSION = "suggestion-v3"
+NARRATION_PROMPT_VERSION = "narration-v1"
+SUGGESTION_QUESTION = "Hãy gợi ý món ăn cho tôi dựa trên các nguyên liệu này."
+
+# Lịch sử hội thoại theo session (TTL, giới hạn LRU, backend memory/sqlite), xem `session_store`
+session_store = create_session_store()
 
 def get_session_history(session_id: str):
-    if session_id not in store:
-        store[session_id] = ChatMessageHistory()
-    return store[session_id]
+    return SessionHistory(session_store, session_id)
 
 class LLMService:
     """
-    Service wrapper cho Google Gemini API và LangChain.
+    Service wrapper cho chat model (LLM_PROVIDER) và LangChain.
     """
-    def __init__(self):
-        self.api_key = os.getenv("GOOGLE_API_KEY")
-        if not self.api_key:
-            print("Warning: GOOGLE_API_KEY not found. LLM service will not work.")
-        
-        self.model_name = os.getenv("MODEL_NAME", "gemini-1.5-flash")
+    def __init__(self, llm=None):
+        """
+        Args:
+            llm: Chat model LangChain dùng thay cho provider cấu hình (fake model cho benchmark);
+                mặc định tạo từ env (`llm_providers`).
+        """
+        self.provider = provider_from_env() if llm is None else "custom"
+        if self.provider is None:
+            print("Warning: GOOGLE_API_KEY / LLM_PROVIDER not set. LLM service will not work.")
+
+        self.model_name = os.getenv("MODEL_NAME", DEFAULT_MODELS.get(self.provider, "custom"))
+        self.caller = ResilientCaller.from_env()
+        self.response_cache = create_response_store()
+        self.history_policy = HistoryPolicy.from_env()
+        self.context_builder = RecipeContextBuilder.from_env()
+        self.token_stats = PromptTokenStats()
+
+        # Tóm tắt lịch sử chạy nền, tuần tự, mỗi session tối đa một việc đang chờ
+        self._summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+        self._summary_pending = set()
+        self._summary_lock = threading.Lock()
         
-        if self.api_key:
-            self.llm = ChatGoogleGenerativeAI(
-                model=self.model_name,
-                temperature=0.7,
-                top_p=0.95,
-                top_k=40,
-                max_output_tokens=8192,
-                google_api_key=self.api_key
-            )
-            
+        self.llm = llm if llm is not None else create_chat_model(
+            self.provider, self.model_name, self.caller.policy.timeout
+        )
+
+        if self.llm is not None:
             self.suggestion_prompt = ChatPromptTemplate.from_messages(messages=[
                 ("system", """
 Bạn là SmartChef - Chuyên gia ẩm thực thông minh.
@@ -70,33 +102,56 @@ Nhiệm vụ của bạn:
 
 Lưu ý:
 - Chỉ sáng tạo món mới NẾU VÀ CHỈ NẾU danh sách trên hoàn toàn không phù hợp (ví dụ sai lệch nguyên liệu chính).
-- Tuyệt đối không nói "Dựa trên danh sách bạn cung cấp", hãy nói "Hệ thống tìm thấy...".
+- Món có "Cách làm" đã lược bớt: nếu chọn món đó, hãy hướng dẫn các bước theo kiến thức ẩm thực của bạn.
+- Tuyệt đối không nói "Dựa trên danh sách bạn cung cấp", hãy nói "Hệ thống tìm thấy...".{history_summary}
 """),
                 MessagesPlaceholder(variable_name="history"),
                 ("human", "{question}"), 
             ])
 
+            self.narration_prompt = ChatPromptTemplate.from_messages(messages=[
+                ("system", """
+Bạn là SmartChef - Chuyên gia ẩm thực thông minh.
+Người dùng đang có các nguyên liệu sau: **{ingredients}**
+
+Hệ thống đã chọn món phù hợp nhất với nguyên liệu của người dùng ({selection_reason}):
+{recipe_context}
+
+Trả lời theo cấu trúc sau:
+   - "Dựa trên nguyên liệu của bạn (gồm ...), tôi đề xuất món: [Tên Món]"
+   - Giải thích ngắn gọn tại sao chọn món này.
+   - Hướng dẫn chi tiết cách làm (Dựa trên thông tin "Cách làm" đã cung cấp).
+   - Mẹo nhỏ để món ăn ngon hơn.
+
+Lưu ý:
+- Chỉ hướng dẫn món đã được chọn, không đổi sang món khác.
+- Nếu "Cách làm" đã lược bớt, hãy hướng dẫn các bước còn lại theo kiến thức ẩm thực của bạn.
+- Tuyệt đối không nói "Dựa trên danh sách bạn cung cấp", hãy nói "Hệ thống tìm thấy...".{history_summary}
+"""),
+                MessagesPlaceholder(variable_name="history"),
+                ("human", "{question}"),
+            ])
+
             self.chat_prompt = ChatPromptTemplate.from_messages(messages=[
-                ("system", "Bạn là SmartChef. Hãy trả lời câu hỏi của người dùng dựa trên ngữ cảnh các món ăn và nguyên liệu đã thảo luận trước đó."),
+                ("system", "Bạn là SmartChef. Hãy trả lời câu hỏi của người dùng dựa trên ngữ cảnh các món ăn và nguyên liệu đã thảo luận trước đó.{history_summary}"),
                 MessagesPlaceholder(variable_name="history"),
                 ("human", "{question}"),
             ])
-            
-            self.suggestion_chain = RunnableWithMessageHistory(
-                runnable=self.suggestion_prompt | self.llm | StrOutputParser(),
-                get_session_history=get_session_history,
-                input_messages_key="question",
-                history_messages_key="history",
-            )
-            
-            self.chat_chain = RunnableWithMessageHistory(
-                runnable=self.chat_prompt | self.llm | StrOutputParser(),
-                get_session_history=get_session_history,
-                input_messages_key="question",
-                history_messages_key="history",
-            )
-
-    def generate_suggestion(self, session_id: str, ingredients: list[str], recipes: list[dict]) -> str:
+
+            self.summary_prompt = ChatPromptTemplate.from_messages(messages=[
+                ("system", """Tóm tắt ngắn gọn (tối đa 120 từ) cuộc hội thoại giữa người dùng và SmartChef.
+Giữ lại: nguyên liệu người dùng có, món đã được đề xuất (kèm recipe id nếu có), sở thích / hạn chế của người dùng,
+các câu hỏi chưa được giải quyết. Bỏ chi tiết các bước nấu."""),
+                ("human", "Tóm tắt trước đó:\n{summary}\n\nHội thoại tiếp theo:\n{conversation}"),
+            ])
+
+            self.suggestion_chain = self.suggestion_prompt | self.llm | StrOutputParser()
+            self.narration_chain = self.narration_prompt | self.llm | StrOutputParser()
+            self.chat_chain = self.chat_prompt | self.llm | StrOutputParser()
+            self.summary_chain = self.summary_prompt | self.llm | StrOutputParser()
+
+    def generate_suggestion(self, session_id: str, ingredients: list[str], recipes: list[dict],
+                            use_cache: bool = True, selection=None) -> str:
         """
         Sinh nội dung tư vấn món ăn từ LLM.
 
@@ -104,57 +159,259 @@ Lưu ý:
             session_id (str): ID phiên làm việc.
             ingredients (list[str]): Danh sách nguyên liệu đầu vào.
             recipes (list[dict]): Danh sách công thức đã tìm được từ RAG.
+            use_cache (bool): False để bỏ qua cache câu trả lời (luôn gọi LLM, không ghi cache).
+            selection (RecipeSelection | None): Món đã chọn sẵn (RECIPE_SELECTION=local); LLM chỉ nhận
+                món này để viết hướng dẫn. None = LLM tự chọn trong `recipes`.
 
         Returns:
             str: Nội dung tư vấn từ AI.
+
+        Raises:
+            LLMUnavailableError: LLM lỗi tạm thời sau khi đã retry, hoặc circuit breaker đang mở
+                (caller có thể trả về `fallback_suggestion`).
+        """
+        if self.llm is None: return "LLM not configured."
+
+        key = self._cache_key(ingredients, recipes, selection) if use_cache else None
+        cached = self._cached_suggestion(session_id, key, ingredients, recipes, selection)
+        if cached is not None:
+            return cached
+
+        chain, inputs = self._suggestion_input(session_id, ingredients, recipes, selection)
+        response = self.caller.invoke(chain, inputs)
+        self._record_suggestion(session_id, ingredients, recipes, response, key, selection)
+        return response
+
+    async def agenerate_suggestion(self, session_id: str, ingredients: list[str], recipes: list[dict],
+                                   use_cache: bool = True, selection=None) -> str:
+        """
+        Phiên bản async của `generate_suggestion` (không chặn event loop khi chờ Gemini).
+        """
+        if self.llm is None: return "LLM not configured."
+
+        key = self._cache_key(ingredients, recipes, selection) if use_cache else None
+        cached = self._cached_suggestion(session_id, key, ingredients, recipes, selection)
+        if cached is not None:
+            return cached
+
+        chain, inputs = self._suggestion_input(session_id, ingredients, recipes, selection)
+        response = await self.caller.ainvoke(chain, inputs)
+        self._record_suggestion(session_id, ingredients, recipes, response, key, selection)
+        return response
+
+    async def astream_suggestion(self, session_id: str, ingredients: list[str], recipes: list[dict],
+                                 use_cache: bool = True, selection=None):
+        """
+        Phiên bản streaming của `agenerate_suggestion`: yield từng đoạn text ngay khi model trả về.
+        Câu trả lời đầy đủ được ghi vào history (và cache) khi stream kết thúc; trúng cache thì
+        yield cả câu trả lời một lần. Lỗi được raise cho caller (không trộn vào nội dung).
+        """
+        if self.llm is None:
+            yield "LLM not configured."
+            return
+
+        key = self._cache_key(ingredients, recipes, selection) if use_cache else None
+        cached = self._cached_suggestion(session_id, key, ingredients, recipes, selection)
+        if cached is not None:
+            yield cached
+            return
+
+        chain, inputs = self._suggestion_input(session_id, ingredients, recipes, selection)
+        chunks = []
+        async for chunk in self.caller.astream(chain, inputs):
+            chunks.append(chunk)
+            yield chunk
+        self._record_suggestion(session_id, ingredients, recipes, "".join(chunks), key, selection)
+
+    def _suggestion_input(self, session_id: str, ingredients: list[str], recipes: list[dict],
+                          selection=None) -> tuple:
+        """
+        (chain, input) cho một lượt gợi ý: cả danh sách công thức (LLM tự chọn) hoặc chỉ món trong `selection`.
+        """
+        if selection is None:
+            context = self.context_builder.build(recipes)
+            return self.suggestion_chain, self._with_history("suggestion", self.suggestion_prompt, session_id, {
+                "ingredients": ", ".join(ingredients),
+                "recipe_context": context.text,
+                "question": SUGGESTION_QUESTION
+            }, recipe_context=context.tokens, recipe_context_full=context.full_tokens)
+
+        if selection.recipe is not None:
+            context = self.context_builder.build([selection.recipe])
+            text, tokens = context.text, context.tokens
+        else:
+            text = ("(Không có công thức phù hợp trong cơ sở dữ liệu. Hãy sáng tạo một món đơn giản "
+                    "chỉ dùng các nguyên liệu chính người dùng có.)")
+            tokens = estimate_tokens(text)
+        return self.narration_chain, self._with_history("narration", self.narration_prompt, session_id, {
+            "ingredients": ", ".join(ingredients),
+            "recipe_context": text,
+            "selection_reason": selection.reason,
+            "question": SUGGESTION_QUESTION
+        }, recipe_context=tokens)
+
+    def _with_history(self, kind: str, prompt, session_id: str, inputs: dict, **report: int) -> dict:
+        """
+        Thêm cửa sổ lịch sử + tóm tắt của session vào input của prompt và ghi nhận số token:
+        `sent` (prompt thực gửi), `full_history` (nếu replay nguyên văn toàn bộ lịch sử như trước)
+        và các số đo thêm trong `report` (ví dụ token của recipe context).
+        """
+        stored = get_session_history(session_id).messages
+        window = self.history_policy.split(stored)
+        inputs = {**inputs, "history": window.prompt_messages(), "history_summary": window.summary_text}
+
+        sent = messages_tokens(prompt.format_messages(**inputs))
+        base = messages_tokens(prompt.format_messages(**{**inputs, "history": [], "history_summary": ""}))
+        full = base + sum(original_tokens(m) for m in stored)
+        self.token_stats.record(kind, sent=sent, full_history=full, **report)
+        extra = "".join(f"; {name}: {value}" for name, value in report.items())
+        logger.info(
+            f"Prompt tokens [{kind}] session={session_id}: {sent} sent "
+            f"(full history replay: {full}; window {len(window.recent)} msgs, "
+            f"summary={'yes' if window.summary else 'no'}{extra})"
+        )
+        return inputs
+
+    def _record_suggestion(self, session_id: str, ingredients: list[str], recipes: list[dict],
+                           response: str, key: str | None = None, selection=None):
+        if key:
+            self.response_cache.set(key, response)
+        if selection is not None:
+            # History chỉ tham chiếu món đã được chọn
+            recipes = [selection.recipe] if selection.recipe is not None else []
+        get_session_history(session_id).add_messages(
+            self.history_policy.suggestion_messages(SUGGESTION_QUESTION, ingredients, recipes, response)
+        )
+        self._schedule_summary(session_id)
+
+    def _record_chat(self, session_id: str, message: str, response: str):
+        history = get_session_history(session_id)
+        history.add_user_message(message)
+        history.add_ai_message(response)
+        self._schedule_summary(session_id)
+
+    def _schedule_summary(self, session_id: str):
         """
-        if not self.api_key: return "LLM not configured."
-
-        ingredient_str = ", ".join(ingredients)
-        recipe_context = ""
-        for i, r in enumerate(recipes):
-            recipe_context += f"{i+1}. Tên món: {r['ten_mon']} (Độ khớp: {r['match_score']:.2f})\n"
-            recipe_context += f"   - Mô tả: {r.get('mo_ta', '')}\n"
-            
-            nguyen_lieu = ", ".join(r.get('nguyen_lieu_chi_tiet', [])) or "Không có thông tin"
-            recipe_context += f"   - Nguyên liệu chi tiết: {nguyen_lieu}\n"
-            
-            gia_vi = ", ".join(r.get('gia_vi', [])) or "Không có thông tin"
-            recipe_context += f"   - Gia vị: {gia_vi}\n"
-            
-            steps = r.get('cach_lam', [])
-            if steps:
-                cach_lam_str = "\n".join([f"     + {step}" for step in steps])
-            else:
-                cach_lam_str = "     + Không có thông tin"
-            recipe_context += f"   - Cách làm:\n{cach_lam_str}\n\n"
+        Đưa việc tóm tắt các lượt cũ ra thread nền nếu đã đủ nhiều (không chặn request hiện tại).
+        """
+        if not self.history_policy.summarize:
+            return
+        window = self.history_policy.split(get_session_history(session_id).messages)
+        if not self.history_policy.needs_summary(window):
+            return
+        with self._summary_lock:
+            if session_id in self._summary_pending:
+                return
+            self._summary_pending.add(session_id)
+        self._summary_executor.submit(self._summarize, session_id)
 
+    def _summarize(self, session_id: str):
         try:
-            user_msg = "Hãy gợi ý món ăn cho tôi dựa trên các nguyên liệu này."
-            
-            response = self.suggestion_chain.invoke(
-                input={
-                    "ingredients": ingredient_str,
-                    "recipe_context": recipe_context,
-                    "question": user_msg
-                },
-                config={"configurable": {"session_id": session_id}}
-            )
-            return response
+            window = self.history_policy.split(get_session_history(session_id).messages)
+            if not self.history_policy.needs_summary(window):
+                return
+            replaced = ([window.summary] if window.summary else []) + window.older
+            content = self.caller.invoke(self.summary_chain, {
+                "summary": window.summary.content if window.summary else "(chưa có)",
+                "conversation": render_conversation(window.older),
+            })
+            summary = self.history_policy.summary_message(content, replaced)
+            if session_store.compact(session_id, replaced, summary):
+                logger.info(f"Summarized {len(window.older)} old messages of session {session_id}.")
         except Exception as e:
-            return f"Error generating suggestion: {str(e)}"
+            logger.warning(f"History summarization failed for session {session_id}: {e}")
+        finally:
+            with self._summary_lock:
+                self._summary_pending.discard(session_id)
+
+    def _cache_key(self, ingredients: list[str], recipes: list[dict], selection=None) -> str | None:
+        if not self.response_cache:
+            return None
+        # Món được chọn (và lý do) suy ra được từ (nguyên liệu, danh sách recipe id) nên không cần đưa vào key
+        version = SUGGESTION_PROMPT_VERSION if selection is None else NARRATION_PROMPT_VERSION
+        return response_key(
+            ingredients, [r.get("id") for r in recipes],
+            f"{version}/{self.context_builder.signature}", self.model_name
+        )
+
+    def _cached_suggestion(self, session_id: str, key: str | None, ingredients: list[str],
+                           recipes: list[dict], selection=None) -> str | None:
+        """
+        Câu trả lời đã cache cho `key`. Khi trúng vẫn ghi cặp hỏi/đáp vào history của session
+        như một lần gọi LLM thật, để `/chat` phía sau có đủ ngữ cảnh.
+        """
+        if not key:
+            return None
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            self._record_suggestion(session_id, ingredients, recipes, cached, selection=selection)
+        return cached
+
+    def cache_stats(self) -> dict | None:
+        return self.response_cache.stats() if self.response_cache else None
+
+    def session_stats(self) -> dict:
+        return session_store.stats()
+
+    def prompt_stats(self) -> dict:
+        return {**self.token_stats.stats(), "recipe_context": self.context_builder.stats()}
+
+    def llm_stats(self) -> dict:
+        return {"provider": self.provider, "model": self.model_name, **self.caller.stats()}
+
+    def fallback_suggestion(self, ingredients: list[str], recipes: list[dict], selection=None) -> str:
+        """
+        Câu trả lời không cần LLM (LLM lỗi / circuit breaker mở): món đã chọn kèm các bước trong DB,
+        hoặc danh sách công thức đã tìm được.
+        """
+        header = f"Hệ thống tìm thấy các món phù hợp với nguyên liệu của bạn (gồm {', '.join(ingredients)})"
+        note = "\n\n(Trợ lý AI tạm thời không khả dụng, đây là công thức từ cơ sở dữ liệu.)"
+        recipe = selection.recipe if selection is not None else None
+        if recipe is not None:
+            steps = "\n".join(f"{i + 1}. {step}" for i, step in enumerate(recipe.get("cach_lam", [])))
+            return f"{header}. Món đề xuất: {recipe['ten_mon']}.\nCách làm:\n{steps}{note}"
+        if not recipes:
+            return f"Hệ thống chưa tìm thấy công thức phù hợp với nguyên liệu của bạn (gồm {', '.join(ingredients)}).{note}"
+        lines = "\n".join(f"- {r['ten_mon']} (độ khớp {r.get('match_score', 0.0):.2f})" for r in recipes)
+        return f"{header}:\n{lines}{note}"
+
+    def close(self):
+        self._summary_executor.shutdown(wait=False)
+        self.caller.close()
 
     def chat(self, session_id: str, message: str) -> str:
         """
-        Trả lời câu hỏi của người dùng dựa trên lịch sử chat.
+        Trả lời câu hỏi của người dùng dựa trên lịch sử chat. Lỗi LLM được raise cho caller.
         """
-        if not self.api_key: return "LLM not configured."
-        
-        try:
-            response = self.chat_chain.invoke(
-                {"question": message},
-                config={"configurable": {"session_id": session_id}}
-            )
-            return response
-        except Exception as e:
-            return f"Error replying to chat: {str(e)}"
+        if self.llm is None: return "LLM not configured."
+
+        response = self.caller.invoke(self.chat_chain, self._chat_input(session_id, message))
+        self._record_chat(session_id, message, response)
+        return response
+
+    async def achat(self, session_id: str, message: str) -> str:
+        """
+        Phiên bản async của `chat`.
+        """
+        if self.llm is None: return "LLM not configured."
+
+        response = await self.caller.ainvoke(self.chat_chain, self._chat_input(session_id, message))
+        self._record_chat(session_id, message, response)
+        return response
+
+    async def astream_chat(self, session_id: str, message: str):
+        """
+        Phiên bản streaming của `achat`; history được ghi khi stream kết thúc.
+        """
+        if self.llm is None:
+            yield "LLM not configured."
+            return
+
+        chunks = []
+        async for chunk in self.caller.astream(self.chat_chain, self._chat_input(session_id, message)):
+            chunks.append(chunk)
+            yield chunk
+        self._record_chat(session_id, message, "".join(chunks))
+
+    def _chat_input(self, session_id: str, message: str) -> dict:
+        return self._with_history("chat", self.chat_prompt, session_id, {"question": message})
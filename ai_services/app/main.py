@@ -11,17 +11,25 @@ Nhiệm vụ:
 - Cấu hình Uvicorn server để triển khai ứng dụng.
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .api import router as api_router
+from .api import router as api_router, smart_chef
 import uvicorn
 import os
 import sys
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await smart_chef.astart()
+    yield
+    await smart_chef.aclose()
+
 app = FastAPI(
     title="SmartChef AI Services",
     description="API Service tích hợp Vision, RAG và LLM cho SmartChef System",
-    version="2.0"
+    version="2.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
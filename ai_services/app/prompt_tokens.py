@@ -0,0 +1,58 @@
+"""
+Module: Prompt Token Accounting
+=============================
+
+Ước lượng số token của prompt gửi tới LLM và thống kê theo loại request (suggestion, chat, ...),
+phục vụ theo dõi độ dài prompt / chi phí Gemini qua `/metrics`.
+
+Ước lượng theo số ký tự (tiếng Việt ~3 ký tự/token, cùng quy ước với crawler): không gọi API
+đếm token nên dùng được trên đường xử lý request; đủ chính xác để so sánh tương đối.
+"""
+
+import threading
+from collections import deque
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 3 + 1 if text else 0
+
+
+def messages_tokens(messages) -> int:
+    return sum(estimate_tokens(m.content if isinstance(m.content, str) else str(m.content)) for m in messages)
+
+
+class PromptTokenStats:
+    """
+    Cộng dồn số token theo loại request. Mỗi bản ghi gồm số token thực gửi đi (`sent`) và các
+    số đối chứng tùy loại (ví dụ `full_history`: nếu replay toàn bộ lịch sử nguyên văn).
+    """
+    def __init__(self, keep_recent: int = 50):
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._recent = deque(maxlen=keep_recent)
+
+    def record(self, kind: str, **tokens: int):
+        with self._lock:
+            self._recent.append({"kind": kind, **tokens})
+            totals = self._totals.setdefault(kind, {"requests": 0})
+            totals["requests"] += 1
+            for name, value in tokens.items():
+                totals[name] = totals.get(name, 0) + value
+
+    def recent(self) -> list[dict]:
+        """
+        Các bản ghi gần nhất (từng request), cũ trước mới sau.
+        """
+        with self._lock:
+            return list(self._recent)
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {}
+            for kind, totals in self._totals.items():
+                n = totals["requests"]
+                result[kind] = {"requests": n}
+                result[kind].update({
+                    f"avg_{name}": value / n for name, value in totals.items() if name != "requests"
+                })
+            return result
@@ -0,0 +1,182 @@
+"""
+Module: Recipe Context Builder
+============================
+
+Dựng phần "công thức tìm được" trong prompt gợi ý món theo ngân sách token (LLM_CONTEXT_TOKENS),
+phân bổ theo thứ hạng retrieval:
+
+    full      Món top đầu (LLM_CONTEXT_FULL_RECIPES món): mô tả, nguyên liệu, gia vị, toàn bộ cách làm.
+    summary   Các món còn lại: mô tả ngắn + nguyên liệu chi tiết (đủ để LLM so nguyên liệu chính),
+              không có các bước.
+    title     Khi hết ngân sách: tên món + vài nguyên liệu đầu.
+
+Mức được gán theo thứ hạng kể cả khi còn dư ngân sách (LLM chỉ cần hướng dẫn một món). Nếu món top
+đầu không vừa ngân sách, các bước cuối bị cắt bớt; ngân sách còn thiếu nữa thì các món cuối xuống mức
+title. LLM_CONTEXT_TOKENS=0 giữ cách cũ: mọi món ở mức full.
+
+Phần thân của mỗi món (không gồm số thứ tự / điểm khớp, vốn đổi theo request) được cache theo
+(recipe id, mức) cùng số token, nên request sau chỉ còn ghép chuỗi.
+"""
+
+import os
+from dataclasses import dataclass, field
+
+from .cache import TTLLRUCache
+from .prompt_tokens import estimate_tokens
+
+SUMMARY_DESCRIPTION_CHARS = 160
+TITLE_INGREDIENTS = 5
+
+
+@dataclass
+class RecipeContext:
+    text: str
+    tokens: int
+    levels: list[str] = field(default_factory=list)
+    # Số token nếu mọi món đều ở mức full (cách dựng context trước đây)
+    full_tokens: int = 0
+
+
+def _join(items, default: str = "Không có thông tin") -> str:
+    return ", ".join(items) or default
+
+
+def _header(rank: int, recipe: dict) -> str:
+    return f"{rank + 1}. Tên món: {recipe['ten_mon']} (Độ khớp: {recipe['match_score']:.2f})\n"
+
+
+def _step_lines(steps: list[str]) -> str:
+    if not steps:
+        return "     + Không có thông tin"
+    return "\n".join(f"     + {step}" for step in steps)
+
+
+def render_block(recipe: dict, level: str, max_steps: int | None = None) -> str:
+    """
+    Thân của một món ở mức `level` (không gồm dòng tiêu đề).
+    """
+    if level == "full":
+        steps = recipe.get("cach_lam", [])
+        shown = steps if max_steps is None else steps[:max_steps]
+        step_text = _step_lines(shown)
+        if len(shown) < len(steps):
+            step_text += f"\n     + ... (còn {len(steps) - len(shown)} bước)"
+        return (
+            f"   - Mô tả: {recipe.get('mo_ta', '')}\n"
+            f"   - Nguyên liệu chi tiết: {_join(recipe.get('nguyen_lieu_chi_tiet', []))}\n"
+            f"   - Gia vị: {_join(recipe.get('gia_vi', []))}\n"
+            f"   - Cách làm:\n{step_text}\n\n"
+        )
+    if level == "summary":
+        description = recipe.get("mo_ta", "")
+        if len(description) > SUMMARY_DESCRIPTION_CHARS:
+            description = description[:SUMMARY_DESCRIPTION_CHARS].rsplit(" ", 1)[0] + "..."
+        return (
+            f"   - Mô tả: {description}\n"
+            f"   - Nguyên liệu chi tiết: {_join(recipe.get('nguyen_lieu_chi_tiet', []))}\n"
+            f"   - Cách làm: {len(recipe.get('cach_lam', []))} bước (đã lược bớt)\n\n"
+        )
+    if level == "title":
+        ingredients = recipe.get("nguyen_lieu_chi_tiet", [])
+        more = ", ..." if len(ingredients) > TITLE_INGREDIENTS else ""
+        return f"   - Nguyên liệu chính: {_join(ingredients[:TITLE_INGREDIENTS])}{more}\n\n"
+    raise ValueError(f"Unknown context level: {level}")
+
+
+class RecipeContextBuilder:
+    """
+    Args:
+        budget (int | None): Ngân sách token cho toàn bộ context; None = mọi món ở mức full.
+        full_recipes (int): Số món top đầu được ưu tiên mức full.
+        cache_size (int): Số block (recipe, mức) tối đa trong cache.
+        ttl (float | None): Thời gian sống của block (giây), để nội dung công thức sửa trong DB được cập nhật.
+    """
+    def __init__(self, budget: int | None = 1500, full_recipes: int = 1, cache_size: int = 2048,
+                 ttl: float | None = 3600.0):
+        self.budget = budget
+        self.full_recipes = full_recipes
+        self.cache = TTLLRUCache(max_items=cache_size, ttl=ttl, sizeof=lambda v: len(v[0]))
+
+    @classmethod
+    def from_env(cls) -> "RecipeContextBuilder":
+        return cls(
+            budget=int(os.getenv("LLM_CONTEXT_TOKENS", "1500")) or None,
+            full_recipes=int(os.getenv("LLM_CONTEXT_FULL_RECIPES", "1")),
+            cache_size=int(os.getenv("LLM_CONTEXT_CACHE_SIZE", "2048")),
+            ttl=float(os.getenv("LLM_CONTEXT_CACHE_TTL", "3600")) or None,
+        )
+
+    @property
+    def signature(self) -> str:
+        """
+        Mô tả cấu hình, đưa vào key của response cache (cấu hình khác -> prompt khác).
+        """
+        return f"ctx:{self.budget}:{self.full_recipes}"
+
+    def block(self, recipe: dict, level: str) -> tuple[str, int]:
+        """
+        (thân block, số token) của món ở mức `level`, qua cache nếu món có id.
+        """
+        recipe_id = recipe.get("id")
+        key = (recipe_id, level)
+        if recipe_id is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        text = render_block(recipe, level)
+        value = (text, estimate_tokens(text))
+        if recipe_id is not None:
+            self.cache.set(key, value)
+        return value
+
+    def build(self, recipes: list[dict]) -> RecipeContext:
+        headers = [_header(i, r) for i, r in enumerate(recipes)]
+        header_tokens = sum(estimate_tokens(h) for h in headers)
+        full = [self.block(r, "full") for r in recipes]
+        full_tokens = header_tokens + sum(tokens for _, tokens in full)
+
+        if self.budget is None:
+            text = "".join(h + body for h, (body, _) in zip(headers, full))
+            return RecipeContext(text, full_tokens, ["full"] * len(recipes), full_tokens)
+
+        # Mọi món bắt đầu ở mức title, sau đó nâng cấp theo thứ hạng khi còn ngân sách
+        bodies = [self.block(r, "title") for r in recipes]
+        levels = ["title"] * len(recipes)
+        used = header_tokens + sum(tokens for _, tokens in bodies)
+        for i, recipe in enumerate(recipes):
+            remaining = self.budget - used + bodies[i][1]
+            candidates = [("full", full[i])] if i < self.full_recipes else []
+            candidates.append(("summary", self.block(recipe, "summary")))
+            for level, (body, tokens) in candidates:
+                if tokens <= remaining:
+                    break
+                if level == "full":
+                    truncated = self._truncated_full(recipe, remaining)
+                    if truncated is not None:
+                        level, (body, tokens) = "full", truncated
+                        break
+            else:
+                continue
+            used += tokens - bodies[i][1]
+            bodies[i] = (body, tokens)
+            levels[i] = level
+
+        text = "".join(h + body for h, (body, _) in zip(headers, bodies))
+        return RecipeContext(text, estimate_tokens(text), levels, full_tokens)
+
+    @staticmethod
+    def _truncated_full(recipe: dict, budget: int) -> tuple[str, int] | None:
+        """
+        Mức full với số bước nhiều nhất vừa `budget`; None nếu không giữ được bước nào.
+        """
+        best = None
+        for n in range(1, len(recipe.get("cach_lam", []))):
+            text = render_block(recipe, "full", max_steps=n)
+            tokens = estimate_tokens(text)
+            if tokens > budget:
+                break
+            best = (text, tokens)
+        return best
+
+    def stats(self) -> dict:
+        return {"budget": self.budget, "full_recipes": self.full_recipes, "cache": self.cache.stats()}
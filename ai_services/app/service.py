@@ -11,12 +11,37 @@ Quy trình `suggest_recipes`:
 
 Quy trình `chat`:
 - Quản lý hội thoại ngữ cảnh lỏng (Contextual Conversation) thông qua LLM Service.
+
+Các phương thức `a*` (`asuggest_recipes`, `achat`, ...) là phiên bản async dùng cho API:
+- Stage CPU-bound (decode, YOLO, embedding) chạy trên executor có giới hạn số worker.
+- Stage I/O (Qdrant, Postgres, LLM) dùng client async.
+- Mỗi stage có timeout riêng (STAGE_TIMEOUT_VISION / _RETRIEVAL / _LLM, đơn vị giây).
+
+`astream_suggest_recipes` / `astream_chat` trả kết quả Vision + RAG ngay khi có, sau đó stream
+từng đoạn text của LLM (dùng cho các endpoint SSE).
+
+`/predict` một ảnh đi qua `ImageResultCache` (exact + perceptual hash): ảnh gửi lại / chụp lại gần giống
+dùng lại detections (và công thức nếu IMAGE_CACHE_RETRIEVAL=1), chỉ còn bước LLM.
+Bước LLM có cache riêng theo (nguyên liệu, recipe id), `use_cache=False` để bỏ qua cả hai cache.
+
+RECIPE_SELECTION=local: món được chọn ngay sau RAG bằng quy tắc xác định (`RecipeRAGService.select_recipe`,
+trả về trong `selection`), LLM chỉ viết hướng dẫn cho món đó. Mặc định (`llm`) LLM tự chọn trong danh sách.
+
+LLM lỗi (đã retry) hoặc circuit breaker mở: `llm_suggestion` là công thức đã tìm được, không có lời dẫn
+của AI (`LLMService.fallback_suggestion`), kèm `llm_fallback=True`.
 """
 
-from .Vison.yolo_service import YoloIngredientService
+from .Vison.yolo_service import YoloIngredientService, summarize_detections
+from .Vison.micro_batcher import YoloMicroBatcher
+from .Vison.image_cache import ImageResultCache
 from .RAG.rag_service import RecipeRAGService
 from .llm_service import LLMService
+from . import db
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
 import logging
+import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -30,41 +55,76 @@ class SmartChefService:
         rag_service (RecipeRAGService): Service truy vấn công thức.
         llm_service (LLMService): Service xử lý ngôn ngữ và sinh nội dung.
     """
-    def __init__(self):
+    def __init__(self, yolo_service=None, rag_service=None, llm_service=None):
+        """
+        Các service có thể được truyền vào (benchmark, fake service); mặc định tự khởi tạo.
+        """
         logger.info("Initializing SmartChef AI Services...")
-        try:
-            self.yolo_service = YoloIngredientService()
-            logger.info("Yolo Service initialized.")
-        except Exception as e:
-            logger.error(f"Failed to init Yolo Service: {e}")
-            self.yolo_service = None
+        self.yolo_service = yolo_service or self._init_service("Yolo", YoloIngredientService)
 
-        try:
-            self.rag_service = RecipeRAGService()
-            logger.info("RAG Service initialized.")
-        except Exception as e:
-            logger.error(f"Failed to init RAG Service: {e}")
-            self.rag_service = None
+        # Micro-batching cho /predict; YOLO_BATCH_WINDOW_MS=0 để tắt
+        self.yolo_batcher = None
+        window_ms = float(os.getenv("YOLO_BATCH_WINDOW_MS", "10"))
+        if self.yolo_service and window_ms > 0:
+            self.yolo_batcher = YoloMicroBatcher(
+                self.yolo_service,
+                window_ms=window_ms,
+                max_batch=int(os.getenv("YOLO_MAX_BATCH", "8"))
+            )
+            logger.info(f"Yolo micro-batcher enabled (window={window_ms}ms).")
 
-        try:
-            self.llm_service = LLMService()
-            logger.info("LLM Service initialized.")
-        except Exception as e:
-            logger.error(f"Failed to init LLM Service: {e}")
-            self.llm_service = None
+        # Cache kết quả theo ảnh; IMAGE_CACHE_SIZE=0 để tắt
+        self.image_cache = None
+        cache_size = int(os.getenv("IMAGE_CACHE_SIZE", "512"))
+        if self.yolo_service and cache_size > 0:
+            self.image_cache = ImageResultCache(
+                max_items=cache_size,
+                max_bytes=int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(32 * 2**20))),
+                ttl=float(os.getenv("IMAGE_CACHE_TTL", "600")),
+                max_distance=int(os.getenv("IMAGE_CACHE_HAMMING", "6")),
+                cache_retrieval=os.getenv("IMAGE_CACHE_RETRIEVAL", "1") == "1"
+            )
+
+        self.rag_service = rag_service or self._init_service("RAG", RecipeRAGService)
+        self.llm_service = llm_service or self._init_service("LLM", LLMService)
+
+        # Executor giới hạn cho các stage CPU-bound của luồng async
+        self.cpu_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("CPU_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1)))),
+            thread_name_prefix="smartchef-cpu"
+        )
+        self.stage_timeouts = {
+            "vision": float(os.getenv("STAGE_TIMEOUT_VISION", "10")),
+            "retrieval": float(os.getenv("STAGE_TIMEOUT_RETRIEVAL", "10")),
+            "llm": float(os.getenv("STAGE_TIMEOUT_LLM", "60")),
+        }
+        self.recipe_selection = os.getenv("RECIPE_SELECTION", "llm")
+        logger.info(f"Recipe selection mode: {self.recipe_selection}.")
             
         logger.info("SmartChef AI Services initialized.")
 
-    def suggest_recipes(self, image_bytes: bytes, session_id: str = "default") -> dict:
+    @staticmethod
+    def _init_service(name: str, factory):
+        try:
+            service = factory()
+            logger.info(f"{name} Service initialized.")
+            return service
+        except Exception as e:
+            logger.error(f"Failed to init {name} Service: {e}")
+            return None
+
+    def suggest_recipes(self, image_bytes: bytes, session_id: str = "default", use_cache: bool = True) -> dict:
         """
         Thực hiện quy trình đầy đủ: Nhận diện -> Tìm kiếm -> Tư vấn.
 
         Args:
             image_bytes (bytes): Dữ liệu ảnh dạng byte.
             session_id (str): ID phiên làm việc của người dùng.
+            use_cache (bool): False để bỏ qua image cache và cache câu trả lời LLM.
 
         Returns:
-            dict: Kết quả bao gồm nguyên liệu, danh sách công thức và lời khuyên từ AI.
+            dict: Kết quả bao gồm nguyên liệu, detections (box theo tọa độ ảnh gốc),
+            thống kê theo nguyên liệu, danh sách công thức và lời khuyên từ AI.
         """
         result = {
             "detected_ingredients": [],
@@ -74,9 +134,8 @@ class SmartChefService:
 
         if self.yolo_service:
             try:
-                ingredients = self.yolo_service.detect_ingredients(image_bytes)
-                result["detected_ingredients"] = ingredients
-                logger.info(f"Detected ingredients: {ingredients}")
+                cached, fp = self._detect_cached(image_bytes, result, use_cache)
+                logger.info(f"Detected ingredients: {result['detected_ingredients']}")
             except Exception as e:
                 logger.error(f"Error in Yolo detection: {e}")
                 return {"error": f"Yolo Error: {str(e)}"}
@@ -84,33 +143,458 @@ class SmartChefService:
              logger.warning("Yolo Service not available.")
              return {"error": "Yolo Service not available"}
 
+        result = self._suggest_from_ingredients(
+            result, session_id, cached.recipes if cached else None, use_cache=use_cache
+        )
+        self._store_cached(fp, cached, result)
+        return result
+
+    def suggest_recipes_batch(self, images: list[bytes], session_id: str = "default",
+                              use_cache: bool = True) -> dict:
+        """
+        Quy trình đầy đủ cho nhiều ảnh trong cùng một phiên: YOLO chạy một batch duy nhất,
+        tập nguyên liệu được gộp lại trước bước RAG.
+
+        Args:
+            images (list[bytes]): Danh sách ảnh dạng byte.
+            session_id (str): ID phiên làm việc của người dùng.
+
+        Returns:
+            dict: Như `suggest_recipes`; `detections` là danh sách theo từng ảnh (cùng thứ tự đầu vào).
+        """
+        result = {
+            "detected_ingredients": [],
+            "recipes": [],
+            "llm_suggestion": ""
+        }
+
+        if self.yolo_service:
+            try:
+                result.update(self._detect(images, batch=True))
+                logger.info(f"Detected ingredients from {len(images)} images: {result['detected_ingredients']}")
+            except Exception as e:
+                logger.error(f"Error in Yolo detection: {e}")
+                return {"error": f"Yolo Error: {str(e)}"}
+        else:
+             logger.warning("Yolo Service not available.")
+             return {"error": "Yolo Service not available"}
+
+        return self._suggest_from_ingredients(result, session_id, use_cache=use_cache)
+
+    def _detect(self, images, batch: bool) -> dict:
+        """
+        Vision stage: detections, tập nguyên liệu và thống kê (count, max_confidence) theo nguyên liệu.
+        """
+        if batch:
+            per_image = self.yolo_service.detect_objects_batch(images)
+        else:
+            detector = self.yolo_batcher or self.yolo_service
+            per_image = [detector.detect_objects(images)]
+        return self._vision_result(per_image, batch)
+
+    def _vision_result(self, per_image: list[list[dict]], batch: bool) -> dict:
+        detections = [d for image_detections in per_image for d in image_detections]
+        return {
+            "detected_ingredients": self.yolo_service.normalize_ingredients(detections),
+            "ingredient_summary": summarize_detections(detections),
+            "detections": per_image if batch else per_image[0],
+        }
+
+    def _detect_cached(self, image_bytes: bytes, result: dict, use_cache: bool = True):
+        """
+        Vision stage cho một ảnh, qua `image_cache` nếu bật. Ghi kết quả vào `result`.
+
+        Returns:
+            tuple: (CachedResult | None, fingerprint | None) để dùng lại ở `_store_cached`.
+        """
+        if not self.image_cache or not use_cache:
+            result.update(self._detect(image_bytes, batch=False))
+            return None, None
+
+        cached, fp = self.image_cache.lookup(image_bytes)
+        if cached:
+            result.update(cached.vision)
+            result["image_cache"] = cached.match
+        else:
+            result.update(self._detect(image_bytes, batch=False))
+            result["image_cache"] = "miss"
+        return cached, fp
+
+    async def _adetect(self, image_bytes: bytes) -> dict:
+        """
+        `_detect` cho một ảnh trên luồng async. Với micro-batcher, chỉ bước decode + letterbox chạy trên
+        `cpu_executor`; việc chờ batch được await trên event loop nên không giữ thread của executor.
+        """
+        loop = asyncio.get_running_loop()
+        if not self.yolo_batcher:
+            return await loop.run_in_executor(self.cpu_executor, partial(self._detect, image_bytes, False))
+
+        future = await loop.run_in_executor(self.cpu_executor, self.yolo_batcher.submit, image_bytes)
+        detections = await asyncio.wrap_future(future)
+        return self._vision_result([detections], batch=False)
+
+    async def _adetect_cached(self, image_bytes: bytes, result: dict, use_cache: bool = True):
+        """
+        Phiên bản async của `_detect_cached`.
+        """
+        if not self.image_cache or not use_cache:
+            result.update(await self._adetect(image_bytes))
+            return None, None
+
+        loop = asyncio.get_running_loop()
+        cached, fp = await loop.run_in_executor(self.cpu_executor, self.image_cache.lookup, image_bytes)
+        if cached:
+            result.update(cached.vision)
+            result["image_cache"] = cached.match
+        else:
+            result.update(await self._adetect(image_bytes))
+            result["image_cache"] = "miss"
+        return cached, fp
+
+    def _store_cached(self, fp, cached, result: dict):
+        if not self.image_cache or fp is None or "error" in result:
+            return
+        # Trúng exact hit thì không cần ghi lại; near hit thì lưu thêm ảnh mới cho lần gửi lại y hệt
+        if cached and cached.match == "exact":
+            return
+        vision = {key: result[key] for key in ("detected_ingredients", "ingredient_summary", "detections")}
+        self.image_cache.store(fp, vision, result["recipes"] if result["recipes"] else None)
+
+    def _suggest_from_ingredients(self, result: dict, session_id: str, recipes: list | None = None,
+                                  use_cache: bool = True) -> dict:
+        """
+        Retrieval + Generation từ danh sách nguyên liệu đã có trong `result`.
+        `recipes` (từ image cache) thay cho bước retrieval nếu có.
+        """
+        ingredients = result["detected_ingredients"]
         if not ingredients:
             result["llm_suggestion"] = "Không tìm thấy nguyên liệu nào trong ảnh."
             return result
 
-        if self.rag_service:
+        if recipes is not None:
+            result["recipes"] = recipes
+            logger.info(f"Reused {len(recipes)} cached recipes.")
+        elif self.rag_service:
             try:
                 recipes = self.rag_service.retrieve(ingredients)
                 result["recipes"] = recipes
                 logger.info(f"Retrieved {len(recipes)} recipes.")
             except Exception as e:
                 logger.error(f"Error in RAG retrieval: {e}")
-                
+
+        selection = self._select_recipe(result)
         if self.llm_service:
             try:
                 suggestion = self.llm_service.generate_suggestion(
                     session_id,
                     result["detected_ingredients"],
-                    result["recipes"]
+                    result["recipes"],
+                    use_cache=use_cache,
+                    selection=selection
                 )
                 result["llm_suggestion"] = suggestion
                 logger.info("LLM suggestion generated.")
             except Exception as e:
-                logger.error(f"Error in LLM generation: {e}")
-                result["llm_suggestion"] = "Lỗi khi tạo gợi ý từ AI."
+                self._fallback(result, selection, e)
 
         return result
 
+    def _select_recipe(self, result: dict):
+        """
+        Chọn món bằng quy tắc xác định khi RECIPE_SELECTION=local; ghi vào `result["selection"]`.
+
+        Returns:
+            RecipeSelection | None: None khi để LLM tự chọn (chế độ `llm` hoặc không có RAG service).
+        """
+        if self.recipe_selection != "local" or not self.rag_service:
+            return None
+        selection = self.rag_service.select_recipe(result["detected_ingredients"], result["recipes"])
+        result["selection"] = selection.to_dict()
+        logger.info(f"Selected recipe: {result['selection']['ten_mon']} ({selection.reason}).")
+        return selection
+
+    def _fallback(self, result: dict, selection, error: Exception):
+        """
+        Bước LLM thất bại: trả về công thức đã tìm được thay cho lời khuyên của AI.
+        """
+        logger.error(f"Error in LLM generation, returning recipes without narration: {error!r}")
+        result["llm_suggestion"] = self.llm_service.fallback_suggestion(
+            result["detected_ingredients"], result["recipes"], selection
+        )
+        result["llm_fallback"] = True
+
+    async def asuggest_recipes(self, image_bytes: bytes, session_id: str = "default",
+                               use_cache: bool = True) -> dict:
+        """
+        Phiên bản async của `suggest_recipes`.
+        """
+        return await self._asuggest(image_bytes, session_id, batch=False, use_cache=use_cache)
+
+    async def asuggest_recipes_batch(self, images: list[bytes], session_id: str = "default",
+                                     use_cache: bool = True) -> dict:
+        """
+        Phiên bản async của `suggest_recipes_batch`.
+        """
+        return await self._asuggest(images, session_id, batch=True, use_cache=use_cache)
+
+    async def achat(self, session_id: str, message: str) -> dict:
+        """
+        Phiên bản async của `chat`.
+        """
+        if self.llm_service:
+            try:
+                reply = await self._stage("llm", self.llm_service.achat(session_id, message))
+                return {"reply": reply}
+            except Exception as e:
+                logger.error(f"Error in Chat: {e}")
+                return {"error": str(e)}
+        return {"error": "LLM Service not available"}
+
+    async def _asuggest(self, images, session_id: str, batch: bool, use_cache: bool = True) -> dict:
+        result = await self._aprepare(images, batch, use_cache)
+        if "error" in result or not result["detected_ingredients"]:
+            return result
+
+        selection = self._select_recipe(result)
+        if not self.llm_service:
+            return result
+        try:
+            suggestion = await self._stage(
+                "llm",
+                self.llm_service.agenerate_suggestion(
+                    session_id, result["detected_ingredients"], result["recipes"], use_cache=use_cache,
+                    selection=selection
+                )
+            )
+            result["llm_suggestion"] = suggestion
+            logger.info("LLM suggestion generated.")
+        except Exception as e:
+            self._fallback(result, selection, e)
+
+        return result
+
+    async def _aprepare(self, images, batch: bool, use_cache: bool = True) -> dict:
+        """
+        Vision + Retrieval của luồng async (mọi thứ trước bước LLM).
+        """
+        result = {
+            "detected_ingredients": [],
+            "recipes": [],
+            "llm_suggestion": ""
+        }
+        cached, fp = None, None
+
+        if self.yolo_service:
+            try:
+                loop = asyncio.get_running_loop()
+                if batch:
+                    vision = await self._stage(
+                        "vision", loop.run_in_executor(self.cpu_executor, partial(self._detect, images, True))
+                    )
+                    result.update(vision)
+                else:
+                    cached, fp = await self._stage("vision", self._adetect_cached(images, result, use_cache))
+                logger.info(f"Detected ingredients: {result['detected_ingredients']}")
+            except Exception as e:
+                logger.error(f"Error in Yolo detection: {e}")
+                return {"error": f"Yolo Error: {str(e)}"}
+        else:
+             logger.warning("Yolo Service not available.")
+             return {"error": "Yolo Service not available"}
+
+        ingredients = result["detected_ingredients"]
+        if not ingredients:
+            result["llm_suggestion"] = "Không tìm thấy nguyên liệu nào trong ảnh."
+            self._store_cached(fp, cached, result)
+            return result
+
+        if cached and cached.recipes is not None:
+            result["recipes"] = cached.recipes
+            logger.info(f"Reused {len(cached.recipes)} cached recipes.")
+        elif self.rag_service:
+            try:
+                recipes = await self._stage(
+                    "retrieval", self.rag_service.aretrieve(ingredients, executor=self.cpu_executor)
+                )
+                result["recipes"] = recipes
+                logger.info(f"Retrieved {len(recipes)} recipes.")
+            except Exception as e:
+                logger.error(f"Error in RAG retrieval: {e}")
+
+        # Ghi cache trước bước LLM: request lặp lại đến trong lúc chờ LLM cũng được hưởng
+        self._store_cached(fp, cached, result)
+        return result
+
+    async def astream_suggest_recipes(self, image_bytes: bytes, session_id: str = "default",
+                                      use_cache: bool = True):
+        """
+        Phiên bản streaming của `asuggest_recipes`, yield các cặp (event, data):
+        - "result": nguyên liệu, detections, công thức (và `selection`) ngay khi Vision + RAG xong
+          (`llm_suggestion` rỗng).
+        - "token": {"text": ...} từng đoạn lời khuyên từ LLM.
+        - "done": {"llm_suggestion": ...} toàn bộ lời khuyên (đã được ghi vào history của session);
+          LLM không khả dụng trước token đầu tiên thì là công thức đã tìm được, kèm `llm_fallback`.
+        - "error": {"error": ...} thay cho các event còn lại nếu có lỗi.
+        """
+        result = await self._aprepare(image_bytes, batch=False, use_cache=use_cache)
+        if "error" in result:
+            yield "error", result
+            return
+        selection = self._select_recipe(result) if result["detected_ingredients"] else None
+        yield "result", result
+
+        if not result["detected_ingredients"] or not self.llm_service:
+            yield "done", {"llm_suggestion": result["llm_suggestion"]}
+            return
+
+        chunks = []
+        try:
+            async for chunk in self._stage_stream("llm", self.llm_service.astream_suggestion(
+                session_id, result["detected_ingredients"], result["recipes"], use_cache=use_cache,
+                selection=selection
+            )):
+                chunks.append(chunk)
+                yield "token", {"text": chunk}
+        except Exception as e:
+            if chunks:
+                logger.error(f"Error in LLM generation: {e}")
+                yield "error", {"error": "Lỗi khi tạo gợi ý từ AI."}
+                return
+            # Chưa gửi token nào: trả về công thức thay cho lời khuyên của AI
+            self._fallback(result, selection, e)
+            yield "token", {"text": result["llm_suggestion"]}
+            yield "done", {"llm_suggestion": result["llm_suggestion"], "llm_fallback": True}
+            return
+        logger.info("LLM suggestion streamed.")
+        yield "done", {"llm_suggestion": "".join(chunks)}
+
+    async def astream_chat(self, session_id: str, message: str):
+        """
+        Phiên bản streaming của `achat`: các event "token" rồi "done" ({"reply": ...}) hoặc "error".
+        """
+        if not self.llm_service:
+            yield "error", {"error": "LLM Service not available"}
+            return
+
+        chunks = []
+        try:
+            async for chunk in self._stage_stream("llm", self.llm_service.astream_chat(session_id, message)):
+                chunks.append(chunk)
+                yield "token", {"text": chunk}
+        except Exception as e:
+            logger.error(f"Error in Chat: {e}")
+            yield "error", {"error": str(e)}
+            return
+        yield "done", {"reply": "".join(chunks)}
+
+    async def _stage(self, stage: str, awaitable):
+        """
+        Chờ một stage với timeout cấu hình riêng.
+        """
+        timeout = self.stage_timeouts[stage]
+        try:
+            return await asyncio.wait_for(awaitable, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Stage '{stage}' timed out after {timeout}s") from None
+
+    async def _stage_stream(self, stage: str, stream):
+        """
+        Như `_stage` cho async generator: timeout tính trên toàn bộ stream.
+        Generator chạy trong task riêng và đẩy từng phần qua queue, nên khi hết thời gian chỉ cần
+        hủy task đó (không cắt ngang generator giữa hai lần `await` từ task khác).
+        """
+        timeout = self.stage_timeouts[stage]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        queue = asyncio.Queue()
+        end = object()
+
+        async def produce():
+            try:
+                async for item in stream:
+                    await queue.put(item)
+                await queue.put(end)
+            except Exception as e:
+                await queue.put(e)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"Stage '{stage}' timed out after {timeout}s") from None
+                if item is end:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            producer.cancel()
+
+    def metrics(self) -> dict:
+        """
+        Thu thập metrics vận hành của các thành phần (phục vụ tuning).
+        """
+        # RAG service thay thế (benchmark, fake) có thể không có embedding cache / bảng retrieval
+        embedding = getattr(self.rag_service, "embedding", None)
+        retrieval_table = getattr(self.rag_service, "retrieval_table", None)
+        return {
+            "yolo_batcher": self.yolo_batcher.stats() if self.yolo_batcher else None,
+            "image_cache": self.image_cache.stats() if self.image_cache else None,
+            "llm": (
+                self.llm_service.llm_stats()
+                if self.llm_service and hasattr(self.llm_service, "llm_stats") else None
+            ),
+            "llm_cache": (
+                self.llm_service.cache_stats()
+                if self.llm_service and hasattr(self.llm_service, "cache_stats") else None
+            ),
+            "sessions": (
+                self.llm_service.session_stats()
+                if self.llm_service and hasattr(self.llm_service, "session_stats") else None
+            ),
+            "prompt_tokens": (
+                self.llm_service.prompt_stats()
+                if self.llm_service and hasattr(self.llm_service, "prompt_stats") else None
+            ),
+            "db_pool": db.pool_metrics(),
+            "recipe_cache": db.recipe_cache_metrics(),
+            "embedding_cache": embedding.stats() if embedding is not None else None,
+            "retrieval_table": retrieval_table.stats() if retrieval_table is not None else None,
+        }
+
+    async def astart(self):
+        """
+        Khởi tạo tài nguyên async (pool Postgres, ...) khi ứng dụng start.
+        """
+        if self.rag_service:
+            try:
+                await self.rag_service.astart()
+            except Exception as e:
+                logger.error(f"Failed to open Postgres pool: {e}")
+
+    async def aclose(self):
+        """
+        Đóng graceful các tài nguyên async và nền khi ứng dụng shutdown.
+        """
+        if self.rag_service:
+            try:
+                await self.rag_service.aclose()
+            except Exception as e:
+                logger.error(f"Error closing RAG resources: {e}")
+        self.close()
+
+    def close(self):
+        """
+        Giải phóng tài nguyên nền (worker thread, ...).
+        """
+        if self.yolo_batcher:
+            self.yolo_batcher.close()
+        if self.llm_service and hasattr(self.llm_service, "close"):
+            self.llm_service.close()
+        self.cpu_executor.shutdown(wait=False)
+
     def chat(self, session_id: str, message: str) -> dict:
         """
         Xử lý hội thoại tiếp diễn với người dùng.
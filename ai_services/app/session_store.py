@@ -0,0 +1,330 @@
+"""
+Module: Session History Store
+===========================
+
+Lưu lịch sử hội thoại theo `session_id` cho `LLMService`, thay cho dict toàn cục
+(không giới hạn, mất khi restart, không chia sẻ được giữa các worker).
+
+- Idle TTL: session không được đọc/ghi trong SESSION_TTL giây bị xóa.
+- Giới hạn số session (SESSION_MAX) và tổng dung lượng message (SESSION_MAX_BYTES), vượt thì
+  xóa session dùng lâu nhất (LRU).
+- Dung lượng mỗi message = kích thước JSON của nó (`message_to_dict`), cộng dồn theo session.
+- `compact`: thay các message cũ nhất bằng một message tóm tắt (xem `llm_history`).
+
+Backend (SESSION_STORE_BACKEND):
+    memory   dict có thứ tự trong process (mặc định)
+    sqlite   file SQLite (SESSION_STORE_PATH, WAL) dùng chung giữa các uvicorn worker, giữ qua restart
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from .config import paths
+
+
+def _serialize(message: BaseMessage) -> str:
+    return json.dumps(message_to_dict(message), ensure_ascii=False)
+
+
+class SessionHistory(BaseChatMessageHistory):
+    """
+    View lịch sử của một session trên store; mọi thao tác đi thẳng xuống store.
+    """
+    def __init__(self, store, session_id: str):
+        self.store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> list[BaseMessage]:
+        return self.store.get_messages(self.session_id)
+
+    def add_messages(self, messages) -> None:
+        self.store.append(self.session_id, list(messages))
+
+    def clear(self) -> None:
+        self.store.delete(self.session_id)
+
+
+class MemorySessionStore:
+    """
+    Store trong bộ nhớ. `OrderedDict` theo thứ tự truy cập -> session hết hạn / LRU luôn ở đầu.
+    """
+    def __init__(self, max_sessions: int | None = 10000, ttl: float | None = 3600.0,
+                 max_bytes: int | None = None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        # session_id -> [messages, bytes, last_access, kích thước từng message]
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_messages(self, session_id: str) -> list[BaseMessage]:
+        with self._lock:
+            self._expire_locked(time.monotonic())
+            entry = self._touch_locked(session_id)
+            return list(entry[0]) if entry else []
+
+    def append(self, session_id: str, messages: list[BaseMessage]):
+        sizes = [len(_serialize(m).encode("utf-8")) for m in messages]
+        with self._lock:
+            now = time.monotonic()
+            self._expire_locked(now)
+            entry = self._touch_locked(session_id)
+            if entry is None:
+                entry = self._sessions[session_id] = [[], 0, now, []]
+            entry[0].extend(messages)
+            entry[3].extend(sizes)
+            entry[1] += sum(sizes)
+            self._bytes += sum(sizes)
+            self._evict_locked()
+
+    def compact(self, session_id: str, replaced: list[BaseMessage], summary: BaseMessage) -> bool:
+        """
+        Thay các message đầu tiên của session (phải trùng với `replaced`) bằng `summary`.
+        Trả về False nếu session đã đổi (hết hạn, bị compact bởi nơi khác, ...).
+        Không tính là một lần truy cập (không đổi thứ tự LRU).
+        """
+        size = len(_serialize(summary).encode("utf-8"))
+        expected = [_serialize(m) for m in replaced]
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            count = len(expected)
+            if entry is None or [_serialize(m) for m in entry[0][:count]] != expected:
+                return False
+            delta = size - sum(entry[3][:count])
+            entry[0][:count] = [summary]
+            entry[3][:count] = [size]
+            entry[1] += delta
+            self._bytes += delta
+            return True
+
+    def delete(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry:
+                self._bytes -= entry[1]
+
+    def _touch_locked(self, session_id: str):
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            entry[2] = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return entry
+
+    def _expire_locked(self, now: float):
+        if self.ttl is None:
+            return
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if entry[2] + self.ttl > now:
+                break
+            del self._sessions[session_id]
+            self._bytes -= entry[1]
+            self.expirations += 1
+
+    def _evict_locked(self):
+        while self._sessions and (
+            (self.max_sessions is not None and len(self._sessions) > self.max_sessions)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, entry = self._sessions.popitem(last=False)
+            self._bytes -= entry[1]
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire_locked(time.monotonic())
+            sizes = [entry[1] for entry in self._sessions.values()]
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "messages": sum(len(entry[0]) for entry in self._sessions.values()),
+                "bytes": self._bytes,
+                "max_session_bytes": max(sizes, default=0),
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SQLiteSessionStore:
+    """
+    Store trên file SQLite. Bảng `sessions` giữ thời điểm truy cập cuối và tổng dung lượng,
+    bảng `messages` giữ từng message dạng JSON theo thứ tự ghi.
+    """
+    def __init__(self, path, max_sessions: int | None = 10000, ttl: float | None = 3600.0,
+                 max_bytes: int | None = None):
+        self.path = Path(path)
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL,
+                bytes INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);
+        """)
+        self._conn.commit()
+
+        # Các hàm ghi chạy trong `with self._lock, self._conn:` -> commit khi xong, rollback khi lỗi giữa chừng
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_messages(self, session_id: str) -> list[BaseMessage]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT last_access FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return []
+            if self.ttl is not None and row[0] + self.ttl <= now:
+                self._delete_locked([session_id])
+                self.expirations += 1
+                return []
+            rows = self._conn.execute(
+                "SELECT data FROM messages WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+            self._conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+        return messages_from_dict([json.loads(data) for (data,) in rows])
+
+    def append(self, session_id: str, messages: list[BaseMessage]):
+        rows = [(session_id, _serialize(m)) for m in messages]
+        size = sum(len(data.encode("utf-8")) for _, data in rows)
+        now = time.time()
+        with self._lock, self._conn:
+            self._expire_locked(now)
+            self._conn.execute("""
+                INSERT INTO sessions (session_id, last_access, bytes) VALUES (?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET last_access = excluded.last_access,
+                                                       bytes = bytes + excluded.bytes
+            """, (session_id, now, size))
+            self._conn.executemany("INSERT INTO messages (session_id, data) VALUES (?, ?)", rows)
+            self._evict_locked()
+
+    def compact(self, session_id: str, replaced: list[BaseMessage], summary: BaseMessage) -> bool:
+        """
+        Như `MemorySessionStore.compact`; so khớp nội dung nên an toàn khi nhiều worker cùng compact.
+        """
+        data = _serialize(summary)
+        expected = [_serialize(m) for m in replaced]
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, data FROM messages WHERE session_id = ? ORDER BY id LIMIT ?",
+                (session_id, len(expected))
+            ).fetchall()
+            if not rows or [row[1] for row in rows] != expected:
+                return False
+            self._conn.executemany("DELETE FROM messages WHERE id = ?", [(row[0],) for row in rows])
+            # Giữ id nhỏ nhất để bản tóm tắt vẫn đứng đầu session
+            self._conn.execute(
+                "INSERT INTO messages (id, session_id, data) VALUES (?, ?, ?)", (rows[0][0], session_id, data)
+            )
+            delta = len(data.encode("utf-8")) - sum(len(row[1].encode("utf-8")) for row in rows)
+            self._conn.execute("UPDATE sessions SET bytes = bytes + ? WHERE session_id = ?", (delta, session_id))
+            return True
+
+    def delete(self, session_id: str):
+        with self._lock, self._conn:
+            self._delete_locked([session_id])
+
+    def _delete_locked(self, session_ids: list[str]):
+        for session_id in session_ids:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _expire_locked(self, now: float):
+        if self.ttl is None:
+            return
+        expired = [row[0] for row in self._conn.execute(
+            "SELECT session_id FROM sessions WHERE last_access <= ?", (now - self.ttl,)
+        )]
+        self._delete_locked(expired)
+        self.expirations += len(expired)
+
+    def _evict_locked(self):
+        evicted = set()
+        if self.max_sessions is not None:
+            evicted.update(row[0] for row in self._conn.execute(
+                "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                (self.max_sessions,)
+            ))
+        if self.max_bytes is not None:
+            evicted.update(row[0] for row in self._conn.execute("""
+                SELECT session_id FROM (
+                    SELECT session_id, SUM(bytes) OVER (ORDER BY last_access DESC) AS cumulative
+                    FROM sessions
+                ) WHERE cumulative > ?
+            """, (self.max_bytes,)))
+        self._delete_locked(list(evicted))
+        self.evictions += len(evicted)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions, size, max_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0), COALESCE(MAX(bytes), 0) FROM sessions"
+            ).fetchone()
+            (messages,) = self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()
+            return {
+                "backend": "sqlite",
+                "path": str(self.path),
+                "sessions": sessions,
+                "messages": messages,
+                "bytes": size,
+                "max_session_bytes": max_size,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                # Bộ đếm của process hiện tại (các worker khác cũng có thể evict)
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def create_session_store():
+    """
+    Tạo store theo biến môi trường.
+    """
+    backend = os.getenv("SESSION_STORE_BACKEND", "memory")
+    options = {
+        "max_sessions": int(os.getenv("SESSION_MAX", "10000")) or None,
+        "ttl": float(os.getenv("SESSION_TTL", "3600")) or None,
+        "max_bytes": int(os.getenv("SESSION_MAX_BYTES", str(256 * 2**20))) or None,
+    }
+    if backend == "memory":
+        return MemorySessionStore(**options)
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_STORE_PATH", str(paths.SESSION_STORE_PATH)), **options)
+    raise ValueError(f"Unknown SESSION_STORE_BACKEND: {backend}")